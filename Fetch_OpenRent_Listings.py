@@ -1,63 +1,147 @@
-import requests
-from bs4 import BeautifulSoup
-import time
+import argparse
+import asyncio
 import csv
+import os
+from urllib.parse import urlsplit
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-}
-
-
-def fetch_listings(base_url, max_pages=10):
-    listings = []
-    page = 1
+from bs4 import BeautifulSoup
 
-    while page <= max_pages:
-        url = f"{base_url}?page={page}"
-        response = requests.get(url, headers=HEADERS)
+from fetch_engine import FetchEngine, FetchError, HostLimits, run_all
+import metrics
+from metrics import METRICS, Progress
+from response_cache import CacheMiss, ResponseCache
 
-        if response.status_code != 200:
-            print(f"Failed to fetch page {page}")
-            break
+SOURCE = "openrent"
+OUTPUT_FILE = "openrent_listings.csv"
+FIELDS = ["title", "price", "location", "link"]
+BASE_URLS = ["https://www.openrent.co.uk/properties-to-rent/london"]
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+# Pages are fetched WINDOW at a time over one keep-alive session, at most
+# OPENRENT_RATE requests per second (the old loop slept 2s per page)
+WINDOW = int(os.environ.get("OPENRENT_WINDOW", "4"))
+OPENRENT_RATE = float(os.environ.get("OPENRENT_RATE", "1"))
+# Concurrency per host adapts between 1 and this, starting at WINDOW
+OPENRENT_MAX_CONCURRENCY = int(os.environ.get("OPENRENT_MAX_CONCURRENCY", "8"))
 
-        # Update these selectors based on actual page inspection
-        listing_cards = soup.find_all('div', class_='property-item')  # Hypothetical class
 
-        if not listing_cards:
-            break  # No more listings
+def page_url(base_url, page):
+    return f"{base_url}?page={page}"
 
-        for card in listing_cards:
-            title = card.find('h2', class_='title').text.strip()
-            price = card.find('div', class_='price').text.strip()
-            location = card.find('span', class_='location').text.strip()
-            link = card.find('a')['href'].strip()
 
-            listings.append({
-                "title": title,
-                "price": price,
-                "location": location,
-                "link": link
-            })
+def parse_listings(html):
+    soup = BeautifulSoup(html, 'html.parser')
 
-        print(f"Page {page} fetched. Total listings: {len(listings)}")
-        page += 1
-        time.sleep(2)  # Avoid overwhelming the server
+    # Update these selectors based on actual page inspection
+    listing_cards = soup.find_all('div', class_='property-item')  # Hypothetical class
 
+    listings = []
+    for card in listing_cards:
+        listings.append({
+            "title": card.find('h2', class_='title').text.strip(),
+            "price": card.find('div', class_='price').text.strip(),
+            "location": card.find('span', class_='location').text.strip(),
+            "link": card.find('a')['href'].strip()
+        })
     return listings
 
 
-if __name__ == "__main__":
-    # Example URL (adjust parameters as needed)
-    BASE_URL = "https://www.openrent.co.uk/properties-to-rent/london"
-
-    listings = fetch_listings(BASE_URL, max_pages=5)
+async def fetch_page(engine, url, cache):
+    """Page HTML from the cache or the network; None when it cannot be fetched."""
+    try:
+        html = cache.get(url, source=SOURCE)
+    except CacheMiss:
+        return None
+    if html is not None:
+        METRICS.inc("cache_hits_total", source=SOURCE)
+        return html
+    try:
+        html = await engine.get(url, label=url, source=SOURCE)
+    except FetchError:
+        return None
+    cache.put(url, html, source=SOURCE)
+    return html
+
+
+class ListingWriter:
+    """Appends new listings to the CSV as they arrive, skipping any link already written in this or an earlier run."""
+
+    def __init__(self, path):
+        self.seen = set()
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with open(path, newline='', encoding='utf-8') as f:
+                self.seen = {row["link"] for row in csv.DictReader(f)}
+        self.file = open(path, 'a', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+        if not exists:
+            self.writer.writeheader()
+        self.written = 0
+
+    def write(self, listings):
+        new = [row for row in listings if row["link"] not in self.seen]
+        for row in new:
+            self.seen.add(row["link"])
+        self.writer.writerows(new)
+        self.file.flush()
+        self.written += len(new)
+        return len(new)
+
+    def close(self):
+        self.file.close()
+
+
+async def crawl_city(engine, base_url, writer, cache, max_pages=10, window=WINDOW, progress=None):
+    """Crawl one city's result pages a window at a time; stops at the first short, empty or failed page."""
+    full_page = 0
+    page = 1
+    while page <= max_pages:
+        pages = range(page, min(page + window, max_pages + 1))
+        bodies = await asyncio.gather(*(fetch_page(engine, page_url(base_url, p), cache) for p in pages))
+        for p, html in zip(pages, bodies):
+            if progress:
+                progress.tick()
+            if html is None:
+                print(f"Failed to fetch page {p} of {base_url}")
+                return
+            with METRICS.time(SOURCE, "parse"):
+                listings = parse_listings(html)
+            if not listings:
+                return  # No more listings
+            with METRICS.time(SOURCE, "write"):
+                added = writer.write(listings)
+            print(f"Page {p} of {base_url} fetched: {len(listings)} listings, {added} new. Total written: {writer.written}")
+            # The first page sets the page size; a shorter page is the last one
+            full_page = full_page or len(listings)
+            if len(listings) < full_page:
+                return
+        page += window
+
+
+async def crawl(base_urls, output_file=OUTPUT_FILE, max_pages=10, window=WINDOW, cache=None):
+    cache = cache or ResponseCache()
+    hosts = {urlsplit(url).netloc for url in base_urls}
+    limits = HostLimits(overrides={host: (window, OPENRENT_RATE, window) for host in hosts},
+                        max_concurrency=OPENRENT_MAX_CONCURRENCY)
+    writer = ListingWriter(output_file)
+    # Upper bound: cities that stop early finish ahead of the ETA
+    progress = Progress(SOURCE, len(base_urls) * max_pages)
+    metrics.start()
+    try:
+        async with FetchEngine(limits) as engine:
+            await run_all(base_urls, lambda url: crawl_city(engine, url, writer, cache, max_pages, window, progress))
+    finally:
+        writer.close()
+        metrics.finish()
+    return writer.written
 
-    # Save to CSV
-    with open('openrent_listings.csv', 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=["title", "price", "location", "link"])
-        writer.writeheader()
-        writer.writerows(listings)
 
-    print(f"Saved {len(listings)} listings to CSV.")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl OpenRent result pages into a CSV, skipping listings already saved.")
+    parser.add_argument("base_urls", nargs="*", default=BASE_URLS, help="one or more city result URLs")
+    parser.add_argument("--max-pages", type=int, default=5)
+    parser.add_argument("--window", type=int, default=WINDOW, help="pages fetched concurrently per city")
+    parser.add_argument("--out", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    written = asyncio.run(crawl(args.base_urls, args.out, args.max_pages, args.window))
+    print(f"Saved {written} new listings to {args.out}.")
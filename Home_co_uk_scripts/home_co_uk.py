@@ -1,45 +1,54 @@
-import requests
-from bs4 import BeautifulSoup
-import re
-import json
+import argparse
 import os
+import sys
+import asyncio
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
-
-# Load previously scraped data
-existing_file = "postcodes_data_20250524_221647.json"
-if os.path.exists(existing_file):
-    with open(existing_file, "r", encoding="utf-8") as f:
-        results = json.load(f)
-        scraped_locations = {entry["location"] for entry in results}
-else:
-    results = []
-    scraped_locations = set()
-
-lock = Lock()
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fetch_engine import FetchEngine, HostLimits
+from response_cache import ResponseCache
+from html_tables import extract_tables
+import labels
+from result_store import ResultSink
+from job_queue import JobQueue, drain
+from refresh_scheduler import DAY, RefreshState
+from change_detection import PageState, Unchanged, fetch_changed
+from snapshot_store import SnapshotStore
+import metrics
+from metrics import METRICS, Progress
+from parse_pool import ParsePool
+
+# Outputs live next to this script whatever the working directory
+OUTPUT_DIR = os.environ.get("HOME_CO_UK_OUTPUT_DIR", os.path.dirname(os.path.abspath(__file__)))
+existing_file = os.path.join(OUTPUT_DIR, "postcodes_data_20250524_221647.json")
+results_file = os.path.join(OUTPUT_DIR, "postcodes_data_20250524_221647.jsonl")
+SOURCE = "home_co_uk_sale"
+# New postcodes to add to the job queue; everything already queued is picked up on its own
 postcodes_to_scrape = ['B3', 'BS16', 'CO2', 'LIVERPOOL','PE30', 'PL29', 'SG15', 'SG2', 'TF12', 'WR4', 'WV9', 'YO12']
 
-postcodes = [p for p in postcodes_to_scrape if p not in scraped_locations]
-
-print(f"🔁 Resuming scrape for {len(postcodes)} new postcodes using 2 threads...")
+# ScraperAPI concurrency and request rate; raise these to match the plan's limits
+HOST_CONCURRENCY = int(os.environ.get("HOME_CO_UK_CONCURRENCY", "4"))
+HOST_RATE = float(os.environ.get("HOME_CO_UK_RATE", "4"))
+# In-flight requests start at HOST_CONCURRENCY and adapt up to this while ScraperAPI stays healthy
+HOST_MAX_CONCURRENCY = int(os.environ.get("HOME_CO_UK_MAX_CONCURRENCY", "16"))
+# Processes parsing fetched pages (default: one per core; 0 parses on the event loop)
+PARSE_WORKERS = int(os.environ["HOME_CO_UK_PARSE_WORKERS"]) if os.environ.get("HOME_CO_UK_PARSE_WORKERS") else None
 
-def clean_days(value):
-    match = re.search(r"(\d+)", value)
-    return int(match.group(1)) if match else None
+# Refresh mode: re-queue outcodes fetched more than this many days ago, most
+# volatile first, at most REFRESH_BUDGET of them per run (0 = no limit)
+REFRESH_DAYS = os.environ.get("HOME_CO_UK_REFRESH_DAYS")
+REFRESH_BUDGET = int(os.environ.get("HOME_CO_UK_REFRESH_BUDGET", "0"))
 
 def parse_table_rows(table, label_field):
-    rows = table.find_all("tr")[1:]
+    rows = table[1:]
     data = []
-    for row in rows:
-        cells = row.find_all("td")
+    for cells in rows:
         if len(cells) < 4:
             continue
-        label = cells[0].get_text(strip=True)
-        props = int(cells[1].get_text(strip=True))
-        mean = clean_days(cells[2].get_text(strip=True))
-        median = clean_days(cells[3].get_text(strip=True))
+        label = cells[0]
+        props = int(cells[1])
+        mean = labels.days(cells[2])
+        median = labels.days(cells[3])
         data.append({
             label_field: label,
             "properties": props,
@@ -48,110 +57,156 @@ def parse_table_rows(table, label_field):
         })
     return data
 
-def scrape_postcode(postcode, retries=3):
-    payload = {
-        'api_key': os.environ['SCRAPER_API_KEY'],
-        'url': f'https://www.home.co.uk/selling/{postcode.lower()}/time_to_sell/?location={postcode}',
-        'render': 'true'
+def parse_page(html, postcode, backend=None):
+    tables = extract_tables(html, "table", container_class="homeco_pr_content", backend=backend)
+
+    overall = {}
+    if len(tables) > 0:
+        cells = tables[0][1]
+        overall = {
+            "total_properties": int(cells[1]),
+            "mean_days": labels.days(cells[2]),
+            "median_days": labels.days(cells[3])
+        }
+
+    by_price_band = []
+    if len(tables) > 1:
+        raw_rows = parse_table_rows(tables[1], "label")
+        for row in raw_rows:
+            label = row["label"]
+            min_price, max_price = labels.price_band(label)
+
+            by_price_band.append({
+                "price_range": {
+                    "min": min_price,
+                    "max": max_price,
+                    "display": label
+                },
+                "properties": row["properties"],
+                "mean_days": row["mean_days"],
+                "median_days": row["median_days"]
+            })
+
+    by_bedrooms = []
+    if len(tables) > 2:
+        raw_rows = parse_table_rows(tables[2], "label")
+        for row in raw_rows:
+            row["bedrooms"] = labels.bedrooms(row["label"])
+            if row["bedrooms"] is None:
+                continue
+            del row["label"]
+            by_bedrooms.append(row)
+
+    by_property_type = parse_table_rows(tables[3], "type") if len(tables) > 3 else []
+    for row in by_property_type:
+        row["category"] = labels.property_type(row["type"])
+
+    return {
+        "location": postcode.upper(),
+        "currency": "GBP",
+        "overall": overall,
+        "by_price_band": by_price_band,
+        "by_bedrooms": by_bedrooms,
+        "by_property_type": by_property_type
     }
 
-    for attempt in range(retries):
+def sale_url(postcode):
+    return f'https://www.home.co.uk/selling/{postcode.lower()}/time_to_sell/?location={postcode}'
+
+async def scrape_postcode(engine, postcode, parser=None, pages=None):
+    # Network errors are retried inside the engine and raised as FetchError.
+    # A parse error means the page came back incomplete: its cached copy is
+    # dropped and the error raised, so the job queue fetches it again after
+    # a backoff rather than stacking another retry loop on the engine's.
+    # With a ParsePool the page is parsed in a worker process. With a
+    # PageState, a page whose stats tables have not changed raises Unchanged
+    # before it is parsed.
+    html = await fetch_changed(engine, sale_url(postcode), pages, "table", "homeco_pr_content",
+                               render=True, label=postcode, source=SOURCE)
+    try:
+        if parser is not None:
+            return await parser.parse(parse_page, html, postcode)
+        with METRICS.time(SOURCE, "parse"):
+            return parse_page(html, postcode)
+    except Exception as e:
+        engine.invalidate(sale_url(postcode), render=True)
+        METRICS.error("failures_total", SOURCE, e)
+        raise ValueError(f"Unparseable page for {postcode}: {e}") from e
+
+async def main(postcodes=None):
+    metrics.start()
+    # Results are appended to the JSONL sink as they arrive; its key index seeds a fresh job queue
+    first_run = not os.path.exists(results_file)
+    sink = ResultSink(results_file, "location")
+    if first_run and os.path.exists(existing_file):
+        sink.import_legacy(existing_file)
+
+    queue = JobQueue()
+    if not queue.counts(SOURCE):
+        queue.mark_done(SOURCE, sorted(sink.keys()))
+    queue.enqueue(SOURCE, postcodes_to_scrape if postcodes is None else postcodes)
+    refresh = RefreshState()
+    pages = PageState()
+    # Every changed result also lands in the delta history, so overwriting existing_file loses nothing
+    history = SnapshotStore()
+    if REFRESH_DAYS:
+        due = refresh.due(SOURCE, queue.postcodes(SOURCE, "done"), float(REFRESH_DAYS) * DAY, REFRESH_BUDGET or None)
+        queue.requeue(SOURCE, due)
+        print(f"♻️ {len(due)} outcodes due for refresh")
+    counts = queue.counts(SOURCE)
+    print(f"🔁 Resuming scrape: {counts.get('pending', 0)} queued, {counts.get('done', 0)} done, {HOST_CONCURRENCY} in flight...")
+
+    done = 0
+    progress = Progress(SOURCE, counts.get("pending", 0))
+
+    async def worker(postcode):
+        nonlocal done
         try:
-            response = requests.get("https://api.scraperapi.com/", params=payload, timeout=30)
-            response.raise_for_status()
-            html = response.text
-
-            soup = BeautifulSoup(html, "html.parser")
-            content = soup.find("div", class_="homeco_pr_content") or soup
-            tables = content.find_all("table", class_="table") if content else []
-
-            overall = {}
-            if len(tables) > 0:
-                cells = tables[0].find_all("tr")[1].find_all("td")
-                overall = {
-                    "total_properties": int(cells[1].get_text(strip=True)),
-                    "mean_days": clean_days(cells[2].get_text(strip=True)),
-                    "median_days": clean_days(cells[3].get_text(strip=True))
-                }
-
-            by_price_band = []
-            if len(tables) > 1:
-                raw_rows = parse_table_rows(tables[1], "label")
-                for row in raw_rows:
-                    label = row["label"]
-                    prices = list(map(lambda x: int(x.replace(',', '')), re.findall(r"\d{1,3}(?:,\d{3})*", label)))
-                    if "under" in label.lower():
-                        min_price, max_price = 0, prices[0] if prices else None
-                    elif "over" in label.lower():
-                        min_price, max_price = prices[0] if prices else None, None
-                    else:
-                        min_price = prices[0] if len(prices) > 0 else None
-                        max_price = prices[1] if len(prices) > 1 else None
-
-                    by_price_band.append({
-                        "price_range": {
-                            "min": min_price,
-                            "max": max_price,
-                            "display": label
-                        },
-                        "properties": row["properties"],
-                        "mean_days": row["mean_days"],
-                        "median_days": row["median_days"]
-                    })
-
-            by_bedrooms = []
-            if len(tables) > 2:
-                raw_rows = parse_table_rows(tables[2], "label")
-                for row in raw_rows:
-                    label = row["label"].lower()
-                    if "studio" in label:
-                        row["bedrooms"] = 0
-                    elif "one" in label or "1" in label:
-                        row["bedrooms"] = 1
-                    elif "two" in label or "2" in label:
-                        row["bedrooms"] = 2
-                    elif "three" in label or "3" in label:
-                        row["bedrooms"] = 3
-                    elif "four" in label or "4" in label:
-                        row["bedrooms"] = 4
-                    elif "five" in label or "5" in label:
-                        row["bedrooms"] = 5
-                    elif "six" in label or "6" in label:
-                        row["bedrooms"] = 6
-                    else:
-                        continue
-                    del row["label"]
-                    by_bedrooms.append(row)
-
-            by_property_type = parse_table_rows(tables[3], "type") if len(tables) > 3 else []
-
-            result = {
-                "location": postcode.upper(),
-                "currency": "GBP",
-                "overall": overall,
-                "by_price_band": by_price_band,
-                "by_bedrooms": by_bedrooms,
-                "by_property_type": by_property_type
-            }
-
-            with lock:
-                results.append(result)
-
+            result = await scrape_postcode(engine, postcode, parser=parser, pages=pages)
+        except Unchanged:
+            # Same stats tables as last time: nothing parsed, nothing written
+            refresh.touch(SOURCE, postcode)
+            done += 1
+            print(f"[{done}] Unchanged {postcode}")
             return
-
-        except Exception as e:
-            print(f"⚠️ Retry {attempt+1}/{retries} failed for {postcode}: {e}")
-
-    print(f"❌ Failed all attempts for {postcode}")
-
-total = len(postcodes)
-with ThreadPoolExecutor(max_workers=2) as executor:
-    futures = {executor.submit(scrape_postcode, postcode): postcode for postcode in postcodes}
-    for i, future in enumerate(as_completed(futures), 1):
-        future.result()
-        print(f"[{i}/{total}] Completed")
-
-with open(existing_file, "w", encoding="utf-8") as f:
-    json.dump(results, f, indent=2, ensure_ascii=False)
-
-print(f"✅ All postcode data updated in {existing_file}")
+        finally:
+            progress.tick()
+        done += 1
+        # Only changed content goes downstream
+        with METRICS.time(SOURCE, "write"):
+            changed = refresh.check(SOURCE, postcode, result, result["overall"].get("total_properties"))
+            if changed:
+                sink.write(result)
+                history.record(SOURCE, postcode, result)
+            # The hash is stored only once the result is safely written
+            refresh.commit(SOURCE, postcode)
+            pages.commit(sale_url(postcode))
+        print(f"[{done}] {'Completed' if changed else 'Unchanged'} {postcode}")
+
+    limits = HostLimits(concurrency=HOST_CONCURRENCY, rate=HOST_RATE, burst=HOST_CONCURRENCY,
+                        max_concurrency=HOST_MAX_CONCURRENCY)
+    async with FetchEngine(limits=limits, cache=ResponseCache()) as engine, \
+            ParsePool(SOURCE, PARSE_WORKERS) as parser:
+        await drain(queue, SOURCE, worker, batch_size=HOST_MAX_CONCURRENCY * 4)
+
+    sink.compact(existing_file)
+    sink.close()
+    counts = queue.counts(SOURCE)
+    queue.close()
+    refresh.close()
+    pages.close()
+    history.close()
+    metrics.finish()
+
+    print(f"✅ All postcode data updated in {existing_file}")
+    if counts.get("pending") or counts.get("failed"):
+        print(f"⏳ {counts.get('pending', 0)} postcodes waiting to retry, {counts.get('failed', 0)} failed for good")
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Scrape home.co.uk time-to-sell stats for queued outcodes.")
+    parser.add_argument("postcodes", nargs="*", help="outcodes to add to the queue (default: postcodes_to_scrape)")
+    args = parser.parse_args(argv)
+    asyncio.run(main(args.postcodes or None))
+
+if __name__ == "__main__":
+    cli()
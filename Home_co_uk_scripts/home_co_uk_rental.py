@@ -1,171 +1,230 @@
-import requests
-from bs4 import BeautifulSoup
-import json
-import re
+import argparse
 from datetime import datetime
 import os
-import time
+import re
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fetch_engine import FetchEngine, HostLimits
+from response_cache import ResponseCache
+from html_tables import extract_tables
+import labels
+from result_store import ResultSink, read_records
+from job_queue import JobQueue, drain
+from snapshot_store import SnapshotStore
+from change_detection import PageState, Unchanged, fetch_changed
+import metrics
+from metrics import METRICS, Progress
+from parse_pool import ParsePool
 
 # Global config
-CURRENCY_SYMBOL = "£"
-SCRAPERAPI_KEY = os.environ['SCRAPER_API_KEY']
-SCRAPERAPI_URL = "http://api.scraperapi.com/"
-MAX_RETRIES = 3
-RETRY_DELAY = 5  # seconds between retries
-
-def clean(text):
-    return (
-        text.replace("\u00a3", "")
-            .replace(CURRENCY_SYMBOL, "")
-            .replace("pcm", "")
-            .replace(",", "")
-            .strip()
-    )
+SOURCE = "home_co_uk_rental"
+MAX_RETRIES = 3  # fetch attempts per page, made by the engine
+RETRY_DELAY = 5  # seconds before the engine's first retry, doubled for each one after
+HOST_CONCURRENCY = int(os.environ.get("HOME_CO_UK_CONCURRENCY", "4"))
+HOST_RATE = float(os.environ.get("HOME_CO_UK_RATE", "4"))
+# In-flight requests start at HOST_CONCURRENCY and adapt up to this while ScraperAPI stays healthy
+HOST_MAX_CONCURRENCY = int(os.environ.get("HOME_CO_UK_MAX_CONCURRENCY", "16"))
+# Processes parsing fetched pages (default: one per core; 0 parses on the event loop)
+PARSE_WORKERS = int(os.environ["HOME_CO_UK_PARSE_WORKERS"]) if os.environ.get("HOME_CO_UK_PARSE_WORKERS") else None
+# Outputs live next to this script whatever the working directory
+OUTPUT_DIR = os.environ.get("HOME_CO_UK_OUTPUT_DIR", os.path.dirname(os.path.abspath(__file__)))
+# Outcodes whose stats tables have not changed since the last run are not
+# parsed again; their record is carried over from the newest earlier snapshot,
+# so every run's snapshot holds every outcode.
+SNAPSHOT_NAME = re.compile(r"home_co_uk_rental_(\d{8}_\d{6})\.jsonl?")
 
 def convert_price_ranges(raw_ranges):
     structured = []
     for entry in raw_ranges:
-        label = entry["range"].replace("pcm", "").strip()
-        count = entry["number_of_properties"]
-
-        prices = re.findall(r"\d[\d,]*", label)
-        prices = [int(p.replace(",", "")) for p in prices]
-
-        if "under" in label.lower():
-            structured.append({
-                "range_label": f"Under {CURRENCY_SYMBOL}{prices[0]}",
-                "min": 0,
-                "max": prices[0],
-                "count": count
-            })
-        elif "over" in label.lower():
-            structured.append({
-                "range_label": f"Over {CURRENCY_SYMBOL}{prices[0]}",
-                "min": prices[0],
-                "max": None,
-                "count": count
-            })
-        elif len(prices) == 2:
-            structured.append({
-                "range_label": f"{CURRENCY_SYMBOL}{prices[0]}–{CURRENCY_SYMBOL}{prices[1]}",
-                "min": prices[0],
-                "max": prices[1],
-                "count": count
-            })
-        else:
-            structured.append({
-                "range_label": label,
-                "min": None,
-                "max": None,
-                "count": count
-            })
+        range_label, low, high = labels.rent_band(entry["range"])
+        structured.append({
+            "range_label": range_label,
+            "min": low,
+            "max": high,
+            "count": entry["number_of_properties"]
+        })
     return structured
 
-def scrape_postcode(postcode):
-    target_url = f"https://www.home.co.uk/for_rent/{postcode.lower()}/current_rents?location={postcode}"
-    params = {
-        "api_key": SCRAPERAPI_KEY,
-        "url": target_url,
-        "render": "false"
+def rental_url(postcode):
+    return f"https://www.home.co.uk/for_rent/{postcode.lower()}/current_rents?location={postcode}"
+
+def parse_page(html, postcode, backend=None):
+    tables = extract_tables(html, "table--plain", strip_nodes=False, backend=backend)
+    if len(tables) < 4:
+        raise ValueError("Expected tables not found in HTML")
+
+    summary_rows = tables[0]
+    summary = {
+        "total_properties": int(summary_rows[0][1]),
+        "new_in_14_days": int(summary_rows[1][1]),
+        "average_rent_pcm": labels.amount(summary_rows[2][1]),
+        "median_rent_pcm": labels.amount(summary_rows[3][1]),
     }
 
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            response = requests.get(SCRAPERAPI_URL, params=params, timeout=20)
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            tables = soup.find_all("table", class_="table--plain")
-            if len(tables) < 4:
-                raise ValueError("Expected tables not found in HTML")
-
-            summary_rows = tables[0].find_all("tr")
-            summary = {
-                "total_properties": int(summary_rows[0].find_all("td")[1].text.strip()),
-                "new_in_14_days": int(summary_rows[1].find_all("td")[1].text.strip()),
-                "average_rent_pcm": int(clean(summary_rows[2].find_all("td")[1].text)),
-                "median_rent_pcm": int(clean(summary_rows[3].find_all("td")[1].text)),
-            }
-
-            raw_price_data = []
-            for row in tables[1].find_all("tr")[1:]:
-                cells = row.find_all("td")
-                if len(cells) == 2:
-                    raw_price_data.append({
-                        "range": cells[0].text.strip(),
-                        "number_of_properties": int(cells[1].text.strip())
-                    })
-            structured_price_data = convert_price_ranges(raw_price_data)
-
-            bedroom_data = []
-            for row in tables[2].find_all("tr")[1:]:
-                cells = row.find_all("td")
-                bedroom_data.append({
-                    "bedroom_category": cells[0].text.strip(),
-                    "number_of_properties": int(cells[1].text.strip()),
-                    "average_rent_pcm": int(clean(cells[2].text)),
-                    "median_rent_pcm": int(clean(cells[3].text))
-                })
-
-            type_data = []
-            for row in tables[3].find_all("tr")[1:]:
-                cells = row.find_all("td")
-                type_data.append({
-                    "property_type": cells[0].text.strip(),
-                    "number_of_properties": int(cells[1].text.strip()),
-                    "average_rent_pcm": int(clean(cells[2].text)),
-                    "median_rent_pcm": int(clean(cells[3].text))
-                })
-
-            return {
-                "postcode": postcode,
-                "summary": summary,
-                "rents_by_price_range": structured_price_data,
-                "rents_by_bedroom": bedroom_data,
-                "rents_by_property_type": type_data
-            }
-
-        except Exception as e:
-            print(f"⚠️ Attempt {attempt}/{MAX_RETRIES} failed for {postcode}: {e}")
-            if attempt < MAX_RETRIES:
-                time.sleep(RETRY_DELAY)
-            else:
-                return None
+    raw_price_data = []
+    for cells in tables[1][1:]:
+        if len(cells) == 2:
+            raw_price_data.append({
+                "range": cells[0],
+                "number_of_properties": int(cells[1])
+            })
+    structured_price_data = convert_price_ranges(raw_price_data)
+
+    bedroom_data = []
+    for cells in tables[2][1:]:
+        bedroom_data.append({
+            "bedroom_category": cells[0],
+            "bedrooms": labels.bedrooms(cells[0]),
+            "number_of_properties": int(cells[1]),
+            "average_rent_pcm": labels.amount(cells[2]),
+            "median_rent_pcm": labels.amount(cells[3])
+        })
+
+    type_data = []
+    for cells in tables[3][1:]:
+        type_data.append({
+            "property_type": cells[0],
+            "category": labels.property_type(cells[0]),
+            "number_of_properties": int(cells[1]),
+            "average_rent_pcm": labels.amount(cells[2]),
+            "median_rent_pcm": labels.amount(cells[3])
+        })
+
+    return {
+        "postcode": postcode,
+        "summary": summary,
+        "rents_by_price_range": structured_price_data,
+        "rents_by_bedroom": bedroom_data,
+        "rents_by_property_type": type_data
+    }
+
+async def scrape_postcode(engine, postcode, parser=None, pages=None, full=False):
+    # Network errors are retried inside the engine and raised as FetchError.
+    # A parse error means the page came back incomplete: its cached copy is
+    # dropped and the error raised, so the job queue fetches it again after
+    # a backoff rather than stacking another retry loop on the engine's.
+    # With a ParsePool the page is parsed in a worker process. With a
+    # PageState, a page whose stats tables have not changed raises Unchanged
+    # before it is parsed, unless `full` asks for every page.
+    html = await fetch_changed(engine, rental_url(postcode), pages, "table--plain",
+                               render=False, label=postcode, source=SOURCE, full=full)
+    try:
+        if parser is not None:
+            return await parser.parse(parse_page, html, postcode)
+        with METRICS.time(SOURCE, "parse"):
+            return parse_page(html, postcode)
+    except Exception as e:
+        engine.invalidate(rental_url(postcode), render=False)
+        METRICS.error("failures_total", SOURCE, e)
+        raise ValueError(f"Unparseable page for {postcode}: {e}") from e
+
+def previous_records(outcodes, run):
+    """{outcode: its record in the newest snapshot before `run` that has it}, for the outcodes given."""
+    snapshots = {}
+    for name in os.listdir(OUTPUT_DIR):
+        match = SNAPSHOT_NAME.fullmatch(name)
+        # A run's .jsonl and its compacted .json hold the same records
+        if match and match.group(1) < run and (name.endswith(".jsonl") or match.group(1) not in snapshots):
+            snapshots[match.group(1)] = name
+    wanted = set(outcodes)
+    found = {}
+    for timestamp in sorted(snapshots, reverse=True):
+        if not wanted:
+            break
+        latest = {}
+        for record in read_records(os.path.join(OUTPUT_DIR, snapshots[timestamp])):
+            if record["postcode"] in wanted:
+                latest[record["postcode"]] = record
+        found.update(latest)
+        wanted -= latest.keys()
+    return found
 
 # ----------- MAIN -----------
 postcodes = ["BR1", "BR2"]  # Replace with up to 2000 postcodes if needed
-all_results = []
-failed_postcodes = []
-
-total = len(postcodes)
-success_count = 0
-fail_count = 0
-
-for idx, postcode in enumerate(postcodes, start=1):
-    print(f"\n🔄 Processing {idx} of {total}: {postcode}")
-    result = scrape_postcode(postcode)
-    if result:
-        all_results.append(result)
+# Set to the timestamp of an interrupted run (e.g. 20250527_080028) to resume it
+RESUME_RUN = os.environ.get("HOME_CO_UK_RENTAL_RUN")
+
+async def main(outcodes=None, run=None):
+    outcodes = postcodes if outcodes is None else outcodes
+    metrics.start()
+    timestamp = run or RESUME_RUN or datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Each run is its own snapshot, so it gets its own queue source
+    source = f"home_co_uk_rental_{timestamp}"
+    output_filename = os.path.join(OUTPUT_DIR, f"home_co_uk_rental_{timestamp}.json")
+    sink = ResultSink(os.path.join(OUTPUT_DIR, f"home_co_uk_rental_{timestamp}.jsonl"), "postcode")
+    queue = JobQueue()
+    queue.enqueue(source, outcodes)
+    # Only values that moved since the last run are kept in the history
+    history = SnapshotStore()
+    pages = PageState()
+    run_date = datetime.strptime(timestamp, "%Y%m%d_%H%M%S").date()
+    # Only outcodes with a record to carry over may be skipped as unchanged
+    previous = previous_records(outcodes, timestamp)
+
+    total = len(outcodes)
+    success_count = 0
+    unchanged_count = 0
+    pending = queue.counts(source).get('pending', 0)
+    print(f"\n🔄 Processing {pending} of {total} postcodes, {HOST_CONCURRENCY} in flight...")
+    progress = Progress(SOURCE, pending)
+
+    async def worker(postcode):
+        nonlocal success_count, unchanged_count
+        try:
+            result = await scrape_postcode(engine, postcode, parser=parser, pages=pages,
+                                           full=postcode not in previous)
+        except Unchanged:
+            with METRICS.time(SOURCE, "write"):
+                sink.write(previous[postcode])
+            unchanged_count += 1
+            print(f"➖ Unchanged: {postcode}")
+            return
+        finally:
+            progress.tick()
+        with METRICS.time(SOURCE, "write"):
+            # History first, so a record in the sink always has its deltas. A resumed
+            # older run leaves history alone once a newer run has recorded the outcode.
+            latest = history.latest(SOURCE, postcode)
+            if latest is None or latest <= run_date.isoformat():
+                history.record(SOURCE, postcode, result, run_date)
+            sink.write(result)
+            pages.commit(rental_url(postcode))
         success_count += 1
         print(f"✅ Success: {postcode} ({success_count} successful)")
-    else:
-        failed_postcodes.append(postcode)
-        fail_count += 1
-        print(f"❌ Failed after {MAX_RETRIES} attempts: {postcode} ({fail_count} failed)")
-
-# Save results
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-output_filename = f"home_co_uk_rental_{timestamp}.json"
-with open(output_filename, "w", encoding="utf-8") as f:
-    json.dump(all_results, f, indent=2, ensure_ascii=False)
-print(f"\n📁 Data saved to: {output_filename}")
-
-# Save failed postcodes
-if failed_postcodes:
-    fail_filename = f"home_co_uk_rental_failed_{timestamp}.txt"
-    with open(fail_filename, "w") as f:
-        for p in failed_postcodes:
-            f.write(p + "\n")
-    print(f"📝 Failed postcodes logged to: {fail_filename}")
-
-# Final summary
-print(f"\n🎯 Scraping complete — {success_count} succeeded, {fail_count} failed, out of {total} postcodes.")
+
+    limits = HostLimits(concurrency=HOST_CONCURRENCY, rate=HOST_RATE, burst=HOST_CONCURRENCY,
+                        max_concurrency=HOST_MAX_CONCURRENCY)
+    async with FetchEngine(limits=limits, retries=MAX_RETRIES, backoff=RETRY_DELAY, cache=ResponseCache()) as engine, \
+            ParsePool(SOURCE, PARSE_WORKERS) as parser:
+        await drain(queue, source, worker, batch_size=HOST_MAX_CONCURRENCY * 4)
+
+    # Export the legacy pretty JSON snapshot
+    sink.compact(output_filename)
+    sink.close()
+    print(f"\n📁 Data saved to: {output_filename}")
+
+    # Save failed postcodes
+    fail_filename = os.path.join(OUTPUT_DIR, f"home_co_uk_rental_failed_{timestamp}.txt")
+    fail_count = queue.export_failed(source, fail_filename)
+    if fail_count:
+        print(f"📝 Failed postcodes logged to: {fail_filename} (rerun with HOME_CO_UK_RENTAL_RUN={timestamp} to retry)")
+
+    # Final summary
+    counts = queue.counts(source)
+    queue.close()
+    history.close()
+    pages.close()
+    metrics.finish()
+    print(f"\n🎯 Scraping complete — {counts.get('done', 0)} succeeded ({unchanged_count} unchanged), {fail_count} failed, out of {total} postcodes.")
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Scrape home.co.uk current rents into a timestamped snapshot.")
+    parser.add_argument("postcodes", nargs="*", help="outcodes to scrape (default: the postcodes list)")
+    parser.add_argument("--resume", metavar="RUN", help="timestamp of an interrupted run, e.g. 20250527_080028")
+    args = parser.parse_args(argv)
+    asyncio.run(main(args.postcodes or None, args.resume))
+
+if __name__ == "__main__":
+    cli()
@@ -1,7 +1,6 @@
+import argparse
 from math import radians, cos, sin, sqrt, atan2
 
-import requests
-
 
 def haversine(coord1, coord2):
     """Calculate distance (in km) between two latitude/longitude coordinates."""
@@ -15,40 +14,39 @@ def haversine(coord1, coord2):
     return R * c
 
 def nearest_station(lat, lon, radius=10000):
-    """Find stations within `radius` meters using OpenStreetMap."""
-    overpass_url = "https://overpass-api.de/api/interpreter"
-    query = f"""
-    [out:json];
-    (
-      node[railway=station](around:{radius},{lat},{lon});
-      node[railway=subway_entrance](around:{radius},{lat},{lon});
-      way[railway=station](around:{radius},{lat},{lon});
-      relation[railway=station](around:{radius},{lat},{lon});
-    );
-    out center;
-    """
-    response = requests.post(overpass_url, data={'data': query})
-    if response.status_code == 200:
-        stations = []
-        for element in response.json().get('elements', []):
-            if 'tags' in element and 'name' in element['tags']:
-                # Extract coordinates
-                if element['type'] == 'node':
-                    station_lat = element['lat']
-                    station_lon = element['lon']
-                else:
-                    station_lat = element['center']['lat']
-                    station_lon = element['center']['lon']
-                # Calculate distance
-                distance = haversine((lat, lon), (station_lat, station_lon))
-                stations.append({
-                    'name': element['tags']['name'],
-                    'distance_km': round(distance, 2),
-                    'coordinates': (station_lat, station_lon)
-                })
-        # Sort by distance
-        return sorted(stations, key=lambda x: x['distance_km'])
-    else:
-        raise ConnectionError("Overpass API request failed.")
-
-print(nearest_station(51.36743, 0.05634, 3000))
\ No newline at end of file
+    """Find stations within `radius` meters, using the local station index."""
+    from station_index import default_index
+
+    index = default_index()
+    distances, indices = index.within(lat, lon, radius / 1000)[0]
+    return [
+        {
+            'name': index.names[i],
+            'distance_km': round(float(d), 2),
+            'coordinates': (float(index.lats[i]), float(index.lons[i]))
+        }
+        for d, i in zip(distances, indices)
+    ]
+
+def nearest_stations_many(lats, lons, k=1):
+    """Nearest `k` stations for a whole batch of coordinates in one query: (distances_km, names), shaped (n, k)."""
+    from station_index import default_index
+
+    index = default_index()
+    distances, indices = index.nearest(lats, lons, k)
+    return distances, [[index.names[i] for i in row] for row in indices]
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Stations near a coordinate, from the local station index.")
+    parser.add_argument("lat", type=float, nargs="?", default=51.36743)
+    parser.add_argument("lon", type=float, nargs="?", default=0.05634)
+    parser.add_argument("--radius", type=float, default=3000, help="metres")
+    parser.add_argument("--import-stations", action="store_true", help="download the station file from Overpass first")
+    args = parser.parse_args(argv)
+    if args.import_stations:
+        from station_index import import_stations
+        print(f"🚉 {len(import_stations())} stations saved")
+    print(nearest_station(args.lat, args.lon, args.radius))
+
+if __name__ == "__main__":
+    cli()
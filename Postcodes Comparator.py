@@ -1,29 +1,57 @@
-import requests
-from bs4 import BeautifulSoup
-import re
+import argparse
 import json
 import os
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
 
-# Load fetched postcode data
-with open("Home_co_uk_scripts/postcodes_data_20250524_221647.json") as f:
-    fetched_data = json.load(f)
+from job_queue import JobQueue
+from outcode_registry import OutcodeRegistry
 
-fetched_postcodes = set(entry["location"].upper() for entry in fetched_data)
+SOURCE = "home_co_uk_sale"
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Home_co_uk_scripts")
+FETCHED_FILE = os.path.join(SCRIPTS_DIR, "postcodes_data_20250524_221647.json")
+FETCHED_KEYS = os.path.join(SCRIPTS_DIR, "postcodes_data_20250524_221647.jsonl.keys")
 
-# Load all postcodes from reference file
-with open("uk_postcode_england_wales.json") as f:
-    all_postcodes = json.load(f)
 
-reference_postcodes = set(entry["postcode"].upper() for entry in all_postcodes)
+def fetched_locations():
+    if os.path.exists(FETCHED_KEYS):
+        with open(FETCHED_KEYS) as f:
+            return {line.strip() for line in f if line.strip()}
+    if os.path.exists(FETCHED_FILE):
+        with open(FETCHED_FILE) as f:
+            return {entry["location"].upper() for entry in json.load(f)}
+    return set()
 
-# Find postcodes in reference that are missing in the fetched data
-missing_postcodes = sorted(reference_postcodes - fetched_postcodes)
 
-print(f"Total fetched postcodes: {len(fetched_postcodes)}")
-print(f"Total reference postcodes: {len(reference_postcodes)}")
-print(f"Missing postcodes: {len(missing_postcodes)}")
-print("List of missing postcodes:")
-print(missing_postcodes)
+def compare(enqueue=False):
+    """Reference outcodes not fetched yet; with `enqueue`, also queue them for the next sale run."""
+    # Load all postcodes from the reference registry
+    reference_postcodes = OutcodeRegistry.open().outcodes()
+
+    queue = JobQueue()
+    fetched_postcodes = set(queue.postcodes(SOURCE, "done")) | fetched_locations()
+
+    # Find postcodes in reference that are missing in the fetched data
+    missing_postcodes = sorted(reference_postcodes - fetched_postcodes)
+
+    added = 0
+    if enqueue:
+        if not queue.counts(SOURCE):
+            # First use of the queue: record what the existing output already holds
+            queue.mark_done(SOURCE, sorted(fetched_locations()))
+        # Every render fetch costs credits, so this only happens on request
+        added = queue.enqueue(SOURCE, missing_postcodes)
+    counts = queue.counts(SOURCE)
+    queue.close()
+
+    print(f"Total fetched postcodes: {len(fetched_postcodes)}")
+    print(f"Total reference postcodes: {len(reference_postcodes)}")
+    print(f"Missing postcodes: {len(missing_postcodes)} ({added} newly queued, {counts.get('failed', 0)} failed for good)")
+    print("List of missing postcodes:")
+    print(missing_postcodes)
+    return missing_postcodes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List reference outcodes missing from the home.co.uk sale data.")
+    parser.add_argument("--enqueue", action="store_true", help=f"add the missing outcodes to the {SOURCE} job queue")
+    args = parser.parse_args()
+    compare(args.enqueue)
@@ -1,27 +1,35 @@
-import requests
 from bs4 import BeautifulSoup
+import argparse
+import asyncio
 import json
-import time
-
-# Mapping postcode areas to countries (partial list for non-England areas)
-postcode_area_to_country = {
-    "BT": "Northern Ireland",
-    "AB": "Scotland", "DD": "Scotland", "DG": "Scotland", "EH": "Scotland",
-    "FK": "Scotland", "G": "Scotland", "HS": "Scotland", "IV": "Scotland",
-    "KA": "Scotland", "KW": "Scotland", "KY": "Scotland", "ML": "Scotland",
-    "PA": "Scotland", "PH": "Scotland", "TD": "Scotland", "ZE": "Scotland",
-    "CF": "Wales", "CH": "Wales", "LL": "Wales", "LD": "Wales",
-    "NP": "Wales", "SA": "Wales", "SY": "Wales"
-}
-
-def get_country(postcode):
-    area = ''.join([c for c in postcode if not c.isdigit()])
-    return postcode_area_to_country.get(area, "England")
-
-def extract_postcode_data(url):
-    print(f"🔎 Extracting from: {url}")
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, "html.parser")
+import os
+from urllib.parse import urlsplit
+
+from fetch_engine import FetchEngine, FetchError, HostLimits
+from job_queue import JobQueue, drain
+import metrics
+from metrics import METRICS, Progress
+from outcode_registry import get_country
+from result_store import ResultSink
+from rightmove_ids import TYPEAHEAD_SOURCE, TYPEAHEAD_URL, IdCache, RightmoveIdResolver
+
+ID_SOURCE = "rightmove_id"
+AREA_SOURCE = "wikipedia"
+ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_FILE = os.path.join(ROOT, "uk_postcode_england_wales.json")
+PARTIAL_FILE = os.path.join(ROOT, "uk_postcode_england_wales.partial.jsonl")
+FAILED_FILE = os.path.join(ROOT, "failed_postcodes.txt")
+HEADERS = {"User-Agent": "dealsourcr/1.0 (postcode reference builder)"}
+
+# Area pages are fetched a few at a time; typeahead lookups are rate limited
+# instead of sleeping 0.5s between calls
+AREA_CONCURRENCY = 4
+TYPEAHEAD_CONCURRENCY = 4
+TYPEAHEAD_RATE = 4.0  # requests per second
+LOOKUP_WORKERS = 8
+
+def parse_postcode_table(html):
+    soup = BeautifulSoup(html, "html.parser")
     tables = soup.find_all("table", {"class": "wikitable"})
 
     data = []
@@ -41,22 +49,25 @@ def extract_postcode_data(url):
             break
     return data
 
-def get_rightmove_id(postcode, retries=3, delay=1.0):
-    api_url = f"https://los.rightmove.co.uk/typeahead?query={postcode}&limit=10&exclude=STREET"
-    for attempt in range(retries):
-        try:
-            response = requests.get(api_url)
-            if response.status_code == 200:
-                results = response.json().get("matches", [])
-                for item in results:
-                    if item.get("displayName", "").upper() == postcode.upper():
-                        return item.get("id")
-        except Exception as e:
-            print(f"[{postcode}] Error: {e}")
-        time.sleep(delay * (attempt + 1))
-    print(f"❌ Failed to fetch ID for: {postcode}")
-    failed_postcodes.append(postcode)
-    return None
+async def extract_postcode_data(engine, url):
+    print(f"🔎 Extracting from: {url}")
+    html = await engine.get(url, source=AREA_SOURCE)
+    with METRICS.time(AREA_SOURCE, "parse"):
+        return parse_postcode_table(html)
+
+async def get_rightmove_id(resolver, postcode):
+    """The typeahead match for `postcode`, from the ID cache when it has been seen before."""
+    try:
+        match = await resolver.resolve(postcode)
+    except (FetchError, ValueError) as e:
+        print(f"[{postcode}] Error: {e}")
+        if not isinstance(e, FetchError):
+            METRICS.error("failures_total", TYPEAHEAD_SOURCE, e)
+        match = None
+    if match is None:
+        print(f"❌ Failed to fetch ID for: {postcode}")
+        METRICS.inc("unmatched_total", source=TYPEAHEAD_SOURCE)
+    return match
 
 postcode_areas = [
     "AB", "AL", "B", "BA", "BB", "BD", "BH", "BL", "BN", "BR", "BS", "BT", "CA", "CB", "CF",
@@ -70,33 +81,144 @@ postcode_areas = [
 ]
 urls = [f"https://en.wikipedia.org/wiki/{area}_postcode_area" for area in postcode_areas]
 
-final_data = []
-failed_postcodes = []
+def merge_reference(path, data):
+    """The reference in `path` with `data` in place of the entries for the same outcodes; new ones go last.
 
-for url in urls:
+    An outcode whose lookup failed this time keeps the ID it already had.
+    """
     try:
-        area_data = extract_postcode_data(url)
-        for entry in area_data:
-            postcode = entry["postcode"]
-            country = entry["country"]
-            if country not in ["England", "Wales"]:
+        with open(path, "r") as f:
+            reference = json.load(f)
+    except FileNotFoundError:
+        return data
+    updates = {entry["postcode"]: entry for entry in data}
+    merged = []
+    for entry in reference:
+        update = updates.pop(entry["postcode"], None)
+        merged.append(entry if update is None or (update["id"] is None and entry.get("id")) else update)
+    return merged + [entry for entry in data if entry["postcode"] in updates]
+
+async def main(area_urls=None):
+    # A run over some areas only updates their outcodes in the reference
+    partial = area_urls is not None
+    area_urls = area_urls or urls
+    metrics.start()
+    # Resolved entries are appended to the partial file as they arrive, so a
+    # rerun only looks up outcodes that are still missing an ID
+    sink = ResultSink(PARTIAL_FILE, "postcode")
+    resolved = {r["postcode"]: r for r in sink.records() if r.get("id")}
+    # Lookups are claimed from the job queue: each parsed area queues its
+    # unresolved outcodes, failed lookups come back after their backoff, and
+    # a killed run picks up its leftovers on the next one
+    queue = JobQueue()
+    done_before = set(queue.postcodes(ID_SOURCE, "done"))
+    entries = {}
+    order = {}
+    queued = asyncio.Event()
+    areas_done = asyncio.Event()
+    # The total grows as each area page is parsed
+    progress = Progress(TYPEAHEAD_SOURCE)
+
+    async def area_stage(area_index, url):
+        try:
+            area_data = await extract_postcode_data(engine, url)
+        except Exception as e:
+            print(f"⚠️ Error processing {url}: {e}")
+            if not isinstance(e, FetchError):
+                METRICS.error("failures_total", AREA_SOURCE, e)
+            return
+        todo = []
+        for row_index, entry in enumerate(area_data):
+            if entry["country"] not in ["England", "Wales"]:
                 continue
-            time.sleep(0.5)
-            entry["id"] = get_rightmove_id(postcode)
-            print(f"→ {postcode} ({country}): {entry['id']}")
-        final_data.extend([entry for entry in area_data if entry["country"] in ["England", "Wales"]])
-    except Exception as e:
-        print(f"⚠️ Error processing {url}: {e}")
-
-# Save filtered data
-with open("uk_postcode_england_wales.json", "w") as f:
-    json.dump(final_data, f, indent=2)
-
-# Save failed lookups
-if failed_postcodes:
-    with open("failed_postcodes.txt", "w") as f:
-        for code in failed_postcodes:
-            f.write(code + "\n")
-    print(f"⚠️ {len(failed_postcodes)} postcodes failed and were saved to failed_postcodes.txt")
-
-print("✅ England & Wales data saved to uk_postcode_england_wales.json")
+            postcode = entry["postcode"]
+            order[postcode] = (area_index, row_index)
+            entries[postcode] = entry
+            progress.add(1)
+            if postcode in resolved:
+                entry["id"] = resolved[postcode]["id"]
+                if "idType" in resolved[postcode]:
+                    entry["idType"] = resolved[postcode]["idType"]
+                with METRICS.time(TYPEAHEAD_SOURCE, "write"):
+                    sink.write(entry)
+                progress.tick()
+            else:
+                entry["id"] = None
+                todo.append(postcode)
+        queue.enqueue(ID_SOURCE, todo)
+        # Done in an earlier run but missing from the partial file: look it up again
+        queue.requeue(ID_SOURCE, [p for p in todo if p in done_before])
+        queued.set()
+
+    async def lookup(postcode):
+        entry = entries.get(postcode)
+        try:
+            match = await get_rightmove_id(resolver, postcode)
+            if entry is None:
+                # Left over from an earlier run over other areas; the ID cache keeps the answer
+                if match is None:
+                    raise LookupError("no matching typeahead result")
+                return
+            entry["id"] = match.id if match else None
+            # Names that only resolve to a REGION need that type in the search URL
+            if match and match.type != "OUTCODE":
+                entry["idType"] = match.type
+            print(f"→ {postcode} ({entry['country']}): {entry['id']}")
+            with METRICS.time(TYPEAHEAD_SOURCE, "write"):
+                sink.write(entry)
+            if not entry["id"]:
+                raise LookupError("no matching typeahead result")
+        finally:
+            if entry is not None:
+                progress.tick()
+
+    async def lookup_stage():
+        # Drain whatever is due, then wait for the next area; one last pass once every area is in
+        while not areas_done.is_set():
+            queued.clear()
+            await drain(queue, ID_SOURCE, lookup, batch_size=LOOKUP_WORKERS)
+            await queued.wait()
+        await drain(queue, ID_SOURCE, lookup, batch_size=LOOKUP_WORKERS)
+
+    async def area_stages():
+        await asyncio.gather(*(area_stage(i, url) for i, url in enumerate(area_urls)))
+        areas_done.set()
+        queued.set()
+
+    limits = HostLimits(overrides={
+        urlsplit(area_urls[0]).netloc: (AREA_CONCURRENCY, AREA_CONCURRENCY, AREA_CONCURRENCY),
+        urlsplit(TYPEAHEAD_URL).netloc: (TYPEAHEAD_CONCURRENCY, TYPEAHEAD_RATE, TYPEAHEAD_CONCURRENCY),
+    })
+    async with FetchEngine(limits=limits, headers=HEADERS) as engine:
+        resolver = RightmoveIdResolver(engine, IdCache(), url=TYPEAHEAD_URL)
+        await asyncio.gather(area_stages(), lookup_stage())
+        resolver.cache.close()
+
+    # Same order and schema as the old serial walk: area by area, table row by table row.
+    # Outcodes still waiting on a retry keep id None until a later run resolves them.
+    final_data = [entries[postcode] for postcode in sorted(order, key=order.get)]
+    sink.close()
+    if partial:
+        final_data = merge_reference(OUTPUT_FILE, final_data)
+
+    # Save filtered data
+    with open(OUTPUT_FILE, "w") as f:
+        json.dump(final_data, f, indent=2)
+
+    # Save failed lookups
+    failed_count = queue.export_failed(ID_SOURCE, FAILED_FILE)
+    if failed_count:
+        print(f"⚠️ {failed_count} postcodes failed and were saved to {FAILED_FILE}")
+
+    metrics.finish()
+    print(f"✅ England & Wales data saved to {OUTPUT_FILE}")
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Build the England & Wales outcode reference with Rightmove IDs.")
+    parser.add_argument("--areas", nargs="*", help="only refresh these postcode areas in the reference, e.g. BR CF (default: all)")
+    args = parser.parse_args(argv)
+    area_urls = [f"https://en.wikipedia.org/wiki/{area.upper()}_postcode_area" for area in args.areas] if args.areas else None
+    asyncio.run(main(area_urls))
+
+if __name__ == "__main__":
+    cli()
@@ -1,20 +1,32 @@
-import requests
-
-payload = {
-    'api_key': '85b8fd8da923bb4b2ca41280890d54cc',
-    'url': 'https://www.home.co.uk/selling/br6/time_to_sell/?location=br6',
-    'render': 'true'
-}
-
-try:
-    print("⏳ Fetching Home.co.uk via ScraperAPI...")
-    response = requests.get("https://api.scraperapi.com/", params=payload, timeout=30)
-    response.raise_for_status()
-    html = response.text
-
-    with open("br6_debug_rest.html", "w", encoding="utf-8") as f:
-        f.write(html)
-
-    print("✅ HTML saved to br6_debug_rest.html")
-except Exception as e:
-    print("❌ ScraperAPI request failed:", e)
+from http_client import Client
+from response_cache import ResponseCache
+
+# The ScraperAPI key comes from SCRAPER_API_KEY (or the key file), see http_client.py
+target_url = 'https://www.home.co.uk/selling/br6/time_to_sell/?location=br6'
+
+
+def fetch_debug_page(url=target_url, path="br6_debug_rest.html"):
+    cache = ResponseCache()
+
+    try:
+        html = cache.get(url, render=True, source="home_co_uk_sale")
+        if html is None:
+            print("⏳ Fetching Home.co.uk via ScraperAPI...")
+            with Client() as client:
+                response = client.scraperapi(url, render=True)
+            response.raise_for_status()
+            html = response.text
+            cache.put(url, html, render=True, source="home_co_uk_sale")
+        else:
+            print("📦 Using cached Home.co.uk page")
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+
+        print(f"✅ HTML saved to {path}")
+    except Exception as e:
+        print("❌ ScraperAPI request failed:", e)
+
+
+if __name__ == "__main__":
+    fetch_debug_page()
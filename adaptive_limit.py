@@ -0,0 +1,116 @@
+import asyncio
+import os
+import time
+
+# Throttling responses: back off multiplicatively and honour Retry-After
+THROTTLE_STATUSES = {429, 503}
+CREDIT_BUDGET = os.environ.get("DEALSOURCR_CREDIT_BUDGET")
+
+
+class BudgetExhausted(Exception):
+    pass
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit for one host, used in place of a fixed semaphore.
+
+    Every healthy response (latency within `latency_factor` of the best
+    smoothed latency seen) grows the limit by 1/limit, i.e. by about one slot
+    per round of requests. A throttling response or timeout cuts it by
+    `decrease` at most once per smoothed latency, so a burst of 429s from
+    one overload counts as a single signal. Retry-After pauses every new
+    request to the host until it has passed.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, decrease=0.5, latency_factor=2.0, smoothing=0.2):
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.latency = None
+        self.best_latency = None
+        self.paused_until = 0.0
+        self.last_cut = 0.0
+        self._condition = None
+
+    @property
+    def condition(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def __aenter__(self):
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return self
+            async with self.condition:
+                await self.condition.wait()
+
+    async def __aexit__(self, *exc):
+        self.in_flight -= 1
+        async with self.condition:
+            self.condition.notify_all()
+
+    def on_success(self, latency):
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+        self.best_latency = self.latency if self.best_latency is None else min(self.best_latency, self.latency)
+        # Slower than usual means the upstream is queueing: hold instead of growing
+        if self.latency <= self.best_latency * self.latency_factor:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_throttle(self, retry_after=None):
+        now = time.monotonic()
+        if now - self.last_cut >= (self.latency or 1.0):
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self.last_cut = now
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+
+
+class CreditBudget:
+    """Caps ScraperAPI credits spent by this process; None means unlimited.
+
+    Credits are reserved before a request goes out, so concurrent requests
+    cannot overshoot, and refunded when it fails (ScraperAPI only bills
+    successful requests).
+    """
+
+    def __init__(self, total=None):
+        self.total = None if total is None else float(total)
+        self.spent = 0.0
+
+    def reserve(self, credits):
+        if self.total is not None and self.spent + credits > self.total:
+            raise BudgetExhausted(f"Credit budget of {self.total:g} spent ({self.spent:g} used)")
+        self.spent += credits
+
+    def refund(self, credits):
+        self.spent -= credits
+
+
+CREDITS = CreditBudget(CREDIT_BUDGET)
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or an HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from geo_distance import distance_matrix, top_k
+from Populate_Nearest_UK_Train_Station import haversine
+
+# Scalar haversine vs the vectorised distance matrix / top-k over random
+# points inside the England & Wales bounding box:
+#   python benchmarks/bench_haversine.py --a 2000 --b 3000
+
+
+def random_points(rng, n):
+    return rng.uniform(49.9, 55.8, n), rng.uniform(-5.7, 1.8, n)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark scalar vs vectorised haversine.")
+    parser.add_argument("--a", type=int, default=2000, help="number of origin points (outcode centroids)")
+    parser.add_argument("--b", type=int, default=3000, help="number of target points (stations, listings)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--scalar-rows", type=int, default=100, help="origin rows to time with the scalar version")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    lats_a, lons_a = random_points(rng, args.a)
+    lats_b, lons_b = random_points(rng, args.b)
+    targets = list(zip(lats_b.tolist(), lons_b.tolist()))
+
+    rows = min(args.scalar_rows, args.a)
+    scalar_time, scalar = timed(lambda: [[haversine((lat, lon), t) for t in targets]
+                                         for lat, lon in zip(lats_a[:rows].tolist(), lons_a[:rows].tolist())])
+    scalar_full = scalar_time * args.a / rows
+    print(f"📊 {args.a} x {args.b} = {args.a * args.b:,} distances")
+    print(f"   scalar haversine      : {scalar_full:8.3f} s (extrapolated from {rows} rows)")
+
+    matrix_time, matrix = timed(lambda: distance_matrix(lats_a, lons_a, lats_b, lons_b))
+    error = np.abs(matrix[:rows] - np.array(scalar)).max()
+    print(f"   distance_matrix f64   : {matrix_time:8.3f} s  ({scalar_full / matrix_time:.0f}x, max error {error:.2e} km)")
+
+    f32_time, matrix32 = timed(lambda: distance_matrix(lats_a, lons_a, lats_b, lons_b, float32=True))
+    print(f"   distance_matrix f32   : {f32_time:8.3f} s  (max error {np.abs(matrix32 - matrix).max():.2e} km)")
+
+    sort_time, _ = timed(lambda: np.sort(matrix, axis=1)[:, :args.k])
+    topk_time, (distances, _) = timed(lambda: top_k(lats_a, lons_a, lats_b, lons_b, args.k))
+    print(f"   top_k={args.k} (argpartition): {topk_time:8.3f} s  vs matrix + full sort {matrix_time + sort_time:.3f} s")
+    assert np.allclose(distances, np.sort(matrix, axis=1)[:, :args.k])
@@ -0,0 +1,100 @@
+import argparse
+import glob
+import gzip
+import os
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from html_tables import available_backends
+from Home_co_uk_scripts import home_co_uk, home_co_uk_rental
+from response_cache import CACHE_DIR
+
+PARSERS = {
+    "sale": home_co_uk.parse_page,
+    "rental": home_co_uk_rental.parse_page,
+}
+CACHE_SOURCES = {
+    "home_co_uk_sale": "sale",
+    "home_co_uk_rental": "rental",
+}
+
+# Times every available parser backend over a corpus of saved pages and checks
+# they all produce the same dicts. Pages come from the response cache by
+# default, or from explicit files:
+#   python benchmarks/bench_parsers.py
+#   python benchmarks/bench_parsers.py --kind sale saved/*.html
+
+
+def read_page(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return f.read()
+
+
+def corpus_from_cache(cache_dir):
+    index = os.path.join(cache_dir, "index.sqlite")
+    if not os.path.exists(index):
+        return []
+    db = sqlite3.connect(index)
+    rows = db.execute("SELECT key, source FROM entries").fetchall()
+    db.close()
+    pages = []
+    for key, source in rows:
+        path = os.path.join(cache_dir, key[:2], key + ".html.gz")
+        if source in CACHE_SOURCES and os.path.exists(path):
+            pages.append((CACHE_SOURCES[source], read_page(path)))
+    return pages
+
+
+def parse_or_error(parse, html, backend):
+    try:
+        return parse(html, "BENCH", backend=backend)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+
+def bench(pages, backends, repeat):
+    reference = None
+    timings = {}
+    for backend in backends:
+        outputs = [parse_or_error(PARSERS[kind], html, backend) for kind, html in pages]
+        if reference is None:
+            reference = outputs
+        mismatches = sum(1 for a, b in zip(reference, outputs) if a != b)
+
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for kind, html in pages:
+                parse_or_error(PARSERS[kind], html, backend)
+            best = min(best, time.perf_counter() - start)
+        timings[backend] = best
+        print(f"{backend:>10}: {best * 1000 / len(pages):8.3f} ms/page  mismatches vs {backends[0]}: {mismatches}")
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare HTML parser backends on saved home.co.uk pages.")
+    parser.add_argument("files", nargs="*", help="saved pages (.html or .html.gz); defaults to the response cache")
+    parser.add_argument("--kind", choices=sorted(PARSERS), default="sale")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.files:
+        paths = [p for pattern in args.files for p in glob.glob(pattern)]
+        pages = [(args.kind, read_page(p)) for p in paths]
+    else:
+        pages = corpus_from_cache(args.cache_dir)
+    if not pages:
+        sys.exit("No pages to benchmark.")
+
+    backends = ["bs4"] + [b for b in available_backends() if b != "bs4"]
+    print(f"📊 {len(pages)} pages, best of {args.repeat} runs")
+    timings = bench(pages, backends, args.repeat)
+    for backend in backends[1:]:
+        print(f"⚡ {backend} is {timings['bs4'] / timings[backend]:.1f}x faster than bs4")
@@ -0,0 +1,218 @@
+import argparse
+import asyncio
+import contextlib
+import glob
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Offline benchmark and regression suite over the committed fixture corpus:
+#   * parse time per fixture page (home.co.uk sale/rental, Wikipedia, typeahead)
+#   * end-to-end throughput of each scraper pipeline against the local stub server
+#   * peak Python memory of each pipeline (tracemalloc)
+# Parsed output is also checked against fixtures/expected.json.
+#
+#   python benchmarks/run_benchmarks.py --update-baseline   # on the reference commit
+#   python benchmarks/run_benchmarks.py                     # after a change; exits 1 on regression
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+FIXTURES = os.path.join(BENCH_DIR, "fixtures")
+EXPECTED_FILE = os.path.join(FIXTURES, "expected.json")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+
+# Everything the pipelines write (job queue, cache, history, results) goes to a scratch dir
+WORK_DIR = tempfile.mkdtemp(prefix="dealsourcr-bench-")
+os.environ["DEALSOURCR_JOBS_DB"] = os.path.join(WORK_DIR, "jobs.sqlite")
+os.environ["DEALSOURCR_CACHE_DIR"] = os.path.join(WORK_DIR, "cache")
+os.environ["DEALSOURCR_HISTORY_DB"] = os.path.join(WORK_DIR, "market_history.sqlite")
+os.environ["HOME_CO_UK_OUTPUT_DIR"] = WORK_DIR
+os.environ["HOME_CO_UK_RATE"] = "10000"
+os.environ["HOME_CO_UK_CONCURRENCY"] = "8"
+os.environ.setdefault("SCRAPER_API_KEY", "bench")
+sys.path.insert(0, ROOT)
+
+import fetch_engine
+import rightmove_ids
+import stub_server
+import Scape_Postcodes
+from Home_co_uk_scripts import home_co_uk, home_co_uk_rental
+
+def typeahead_id(text, name="BR1"):
+    match = rightmove_ids.exact_match(rightmove_ids.parse_matches(text), name)
+    return match.id if match else None
+
+
+PARSERS = {
+    "home_co_uk_sale": lambda text: home_co_uk.parse_page(text, "BENCH"),
+    "home_co_uk_rental": lambda text: home_co_uk_rental.parse_page(text, "BENCH"),
+    "wikipedia": Scape_Postcodes.parse_postcode_table,
+    "rightmove_typeahead": typeahead_id,
+}
+
+
+def fixture_pages():
+    for kind in sorted(PARSERS):
+        for path in sorted(glob.glob(os.path.join(FIXTURES, kind, "*"))):
+            with open(path, encoding="utf-8") as f:
+                yield kind, os.path.relpath(path, FIXTURES), f.read()
+
+
+def bench_parsers(repeat):
+    metrics, outputs = {}, {}
+    for kind, name, text in fixture_pages():
+        parse = PARSERS[kind]
+        outputs[name] = parse(text)
+        # Time batches of at least ~10ms so tiny pages are not lost in timer noise
+        start = time.perf_counter()
+        parse(text)
+        loops = max(1, int(0.01 / max(time.perf_counter() - start, 1e-6)))
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(loops):
+                parse(text)
+            best = min(best, (time.perf_counter() - start) / loops)
+        metrics[f"parse_ms/{name}"] = best * 1000
+    return metrics, outputs
+
+
+@contextlib.contextmanager
+def stub_pages(pages):
+    """Serve {slug: body} from a temporary directory; yields the base URL."""
+    pages_dir = tempfile.mkdtemp(dir=WORK_DIR)
+    for name, body in pages.items():
+        with open(os.path.join(pages_dir, name), "w", encoding="utf-8") as f:
+            f.write(body)
+    server = stub_server.serve(pages_dir)
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/"
+    finally:
+        server.shutdown()
+
+
+def run_pipeline(name, coroutine_fn, items):
+    """Run one pipeline quietly in its own working dir; returns throughput and peak memory metrics."""
+    run_dir = tempfile.mkdtemp(dir=WORK_DIR)
+    cwd = os.getcwd()
+    os.chdir(run_dir)
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(coroutine_fn())
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        os.chdir(cwd)
+    return {
+        f"throughput_per_s/{name}": items / elapsed,
+        f"peak_mb/{name}": peak / (1024 * 1024),
+    }
+
+
+def fixture_text(relpath):
+    with open(os.path.join(FIXTURES, relpath), encoding="utf-8") as f:
+        return f.read()
+
+
+def bench_pipelines(items):
+    metrics = {}
+    postcodes = [f"ZZ{i}" for i in range(items)]
+
+    with stub_pages({"default.html": fixture_text("home_co_uk_sale/br1.html")}) as url:
+        fetch_engine.SCRAPERAPI_URL = url
+        home_co_uk.postcodes_to_scrape = postcodes
+        metrics.update(run_pipeline("home_co_uk_sale", home_co_uk.main, items))
+
+    with stub_pages({"default.html": fixture_text("home_co_uk_rental/br1.html")}) as url:
+        fetch_engine.SCRAPERAPI_URL = url
+        home_co_uk_rental.postcodes = postcodes
+        metrics.update(run_pipeline("home_co_uk_rental", home_co_uk_rental.main, items))
+
+    areas = [f"A{i}" for i in range(max(1, items // 20))]
+    wiki = fixture_text("wikipedia/CF_postcode_area.html")
+    pages = {stub_server.page_slug(f"/wiki/{area}_postcode_area"): wiki for area in areas}
+    pages["typeahead.html"] = fixture_text("rightmove_typeahead/cf10.json")
+    with stub_pages(pages) as url:
+        Scape_Postcodes.urls = [f"{url}wiki/{area}_postcode_area" for area in areas]
+        Scape_Postcodes.OUTPUT_FILE = os.path.join(WORK_DIR, "uk_postcode_england_wales.json")
+        Scape_Postcodes.PARTIAL_FILE = os.path.join(WORK_DIR, "uk_postcode_england_wales.partial.jsonl")
+        Scape_Postcodes.FAILED_FILE = os.path.join(WORK_DIR, "failed_postcodes.txt")
+        Scape_Postcodes.TYPEAHEAD_URL = f"{url}typeahead"
+        Scape_Postcodes.TYPEAHEAD_RATE = 10000
+        outcodes = len(Scape_Postcodes.parse_postcode_table(wiki)) * len(areas)
+        metrics.update(run_pipeline("scape_postcodes", Scape_Postcodes.main, outcodes))
+    return metrics
+
+
+def lower_is_better(metric):
+    return not metric.startswith("throughput")
+
+
+def compare(metrics, baseline, tolerance):
+    regressions = []
+    for metric, value in sorted(metrics.items()):
+        before = baseline.get(metric)
+        note = ""
+        if before:
+            change = (value - before) / before
+            worse = change > tolerance if lower_is_better(metric) else change < -tolerance
+            note = f"{change:+7.1%}" + ("  ❌ REGRESSION" if worse else "")
+            if worse:
+                regressions.append(metric)
+        print(f"{metric:<55} {value:10.3f}  {note}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark and regression suite.")
+    parser.add_argument("--repeat", type=int, default=20, help="parse repetitions per page (best is kept)")
+    parser.add_argument("--items", type=int, default=200, help="postcodes per pipeline run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown before failing")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--update-expected", action="store_true", help="accept current parser output as correct")
+    args = parser.parse_args()
+
+    try:
+        metrics, outputs = bench_parsers(args.repeat)
+        metrics.update(bench_pipelines(args.items))
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    failed = False
+    if args.update_expected or not os.path.exists(EXPECTED_FILE):
+        with open(EXPECTED_FILE, "w", encoding="utf-8") as f:
+            json.dump(outputs, f, indent=2, ensure_ascii=False, sort_keys=True)
+        print(f"📝 Expected parser output written to {EXPECTED_FILE}")
+    else:
+        with open(EXPECTED_FILE, encoding="utf-8") as f:
+            expected = json.load(f)
+        for name, output in sorted(outputs.items()):
+            if expected.get(name) != json.loads(json.dumps(output)):
+                print(f"❌ Parser output changed for {name}")
+                failed = True
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(metrics, baseline, args.tolerance)
+
+    if args.update_baseline or not baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(metrics, f, indent=2, sort_keys=True)
+        print(f"📝 Baseline written to {args.baseline}")
+    if regressions:
+        print(f"❌ {len(regressions)} metrics regressed by more than {args.tolerance:.0%}")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("✅ No regressions")
@@ -0,0 +1,186 @@
+import argparse
+import hashlib
+import re
+import sqlite3
+import time
+
+from job_queue import JOBS_DB
+from metrics import METRICS
+
+# Per-URL change detection, kept next to the job queue:
+#
+#   page_state (url) -> source, etag, last_modified, fingerprint, checked_at, changed_at
+#
+# ETag / Last-Modified are sent back as If-None-Match / If-Modified-Since,
+# so an origin that supports them can answer 304 instead of the page. The
+# fingerprint covers only the stats tables, normalised to their text, so
+# ads, timestamps and scripts elsewhere on the page do not count as a
+# change. It is taken with a plain string scan rather than a parse, and a
+# page whose fingerprint matches the last stored one is never parsed or
+# written. New state is held back until commit(), i.e. until the caller
+# has written the result, so a crash never marks unwritten content as seen.
+#
+# After a parser change, `python change_detection.py forget <source>` makes
+# the next run parse every page again.
+
+_TABLE = re.compile(r"<table\b[^>]*>", re.IGNORECASE)
+_TABLE_TAG = re.compile(r"<(/?)table\b[^>]*>", re.IGNORECASE)
+_CLASS = re.compile(r"""\bclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+_TAG = re.compile(r"<[^>]*>")
+_SPACES = re.compile(r"\s+")
+
+
+class Unchanged(Exception):
+    """The page is the same as at its last recorded fetch; nothing to parse or write."""
+
+
+def _table_end(html, position):
+    """(start, end) of the </table> that closes a table opened just before `position`, nested tables included."""
+    depth = 1
+    for tag in _TABLE_TAG.finditer(html, position):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            return tag.start(), tag.end()
+    return len(html), len(html)
+
+
+def stats_fingerprint(html, table_class, container_class=None):
+    """Digest of the text of every <table> with `table_class` (after `container_class`, if found); None without any.
+
+    Tags are dropped and whitespace collapsed, so markup-only changes keep the fingerprint.
+    """
+    start = html.find(container_class) if container_class else 0
+    position = max(start, 0)
+    digest = hashlib.blake2b(digest_size=16)
+    tables = 0
+    while True:
+        table = _TABLE.search(html, position)
+        if table is None:
+            break
+        position = table.end()
+        classes = _CLASS.search(table.group())
+        if classes is None or table_class not in "".join(c or "" for c in classes.groups()).split():
+            continue
+        end, position = _table_end(html, table.end())
+        text = _SPACES.sub(" ", _TAG.sub(" ", html[table.end():end])).strip()
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\x1e")
+        tables += 1
+    return digest.hexdigest() if tables else None
+
+
+class PageState:
+    def __init__(self, path=JOBS_DB):
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS page_state ("
+            " url TEXT PRIMARY KEY, source TEXT, etag TEXT, last_modified TEXT, fingerprint TEXT,"
+            " checked_at REAL NOT NULL, changed_at REAL)"
+        )
+        self.pending = {}
+
+    def _row(self, url):
+        return self.db.execute(
+            "SELECT etag, last_modified, fingerprint FROM page_state WHERE url = ?", (url,)
+        ).fetchone()
+
+    def validators(self, url):
+        """Conditional request headers for `url`; empty when its origin sent no ETag or Last-Modified."""
+        row = self._row(url)
+        headers = {}
+        if row and row[0]:
+            headers["If-None-Match"] = row[0]
+        if row and row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def not_modified(self, url):
+        """Note a 304 for `url`."""
+        self.db.execute("UPDATE page_state SET checked_at = ? WHERE url = ?", (time.time(), url))
+
+    def unchanged(self, url, fingerprint, etag=None, last_modified=None, source=None):
+        """True when `fingerprint` matches the stored one; otherwise the new state waits for commit(url)."""
+        row = self._row(url)
+        if fingerprint is not None and row is not None and row[2] == fingerprint:
+            self.db.execute(
+                "UPDATE page_state SET checked_at = ?, etag = COALESCE(?, etag),"
+                " last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (time.time(), etag, last_modified, url),
+            )
+            return True
+        self.seen(url, fingerprint, etag, last_modified, source)
+        return False
+
+    def seen(self, url, fingerprint, etag=None, last_modified=None, source=None):
+        """Hold `url`'s new state for commit(url) without comparing it to the stored one."""
+        self.pending[url] = (source, etag, last_modified, fingerprint)
+
+    def commit(self, url):
+        """Store the state held back by unchanged() once the page's result has been written."""
+        if url not in self.pending:
+            return
+        source, etag, last_modified, fingerprint = self.pending.pop(url)
+        now = time.time()
+        # A page served from the response cache has no validators; keep the stored ones
+        self.db.execute(
+            "INSERT INTO page_state (url, source, etag, last_modified, fingerprint, checked_at, changed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (url) DO UPDATE SET source = excluded.source,"
+            " etag = COALESCE(excluded.etag, etag), last_modified = COALESCE(excluded.last_modified, last_modified),"
+            " fingerprint = excluded.fingerprint, checked_at = excluded.checked_at, changed_at = excluded.changed_at",
+            (url, source, etag, last_modified, fingerprint, now, now),
+        )
+
+    def forget(self, source):
+        """Drop every stored page of `source`, so its next run fetches and parses everything in full."""
+        before = self.db.total_changes
+        self.db.execute("DELETE FROM page_state WHERE source = ?", (source,))
+        return self.db.total_changes - before
+
+    def counts(self, source):
+        return self.db.execute(
+            "SELECT COUNT(*), COUNT(etag), COUNT(last_modified) FROM page_state WHERE source = ?", (source,)
+        ).fetchone()
+
+    def close(self):
+        self.db.close()
+
+
+async def fetch_changed(engine, url, pages, table_class, container_class=None, render=False, label=None, source=None,
+                        full=False):
+    """The body of `url` fetched through ScraperAPI; raises Unchanged when `pages` has seen its stats tables already.
+
+    Without `pages` this is a plain engine.get_scraperapi(). With `full` the
+    body is always returned, but its state is still held for pages.commit(),
+    so the next fetch can tell whether it changed.
+    """
+    if pages is None:
+        return await engine.get_scraperapi(url, render=render, label=label, source=source)
+    page = await engine.get_scraperapi_page(url, render=render, label=label, source=source,
+                                            validators=None if full else pages.validators(url))
+    if full:
+        pages.seen(url, stats_fingerprint(page.body, table_class, container_class), page.etag, page.last_modified, source)
+        return page.body
+    if page.not_modified:
+        pages.not_modified(url)
+    elif not pages.unchanged(url, stats_fingerprint(page.body, table_class, container_class),
+                             page.etag, page.last_modified, source):
+        return page.body
+    METRICS.inc("unchanged_total", source=source)
+    raise Unchanged(label or url)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or reset per-page change detection state.")
+    parser.add_argument("command", choices=["status", "forget"])
+    parser.add_argument("source")
+    parser.add_argument("--db", default=JOBS_DB)
+    args = parser.parse_args()
+
+    state = PageState(args.db)
+    if args.command == "forget":
+        print(f"🧹 Forgot {state.forget(args.source)} pages of {args.source}")
+    else:
+        pages, etags, last_modified = state.counts(args.source)
+        print(f"📋 {args.source}: {pages} pages, {etags} with ETag, {last_modified} with Last-Modified")
+    state.close()
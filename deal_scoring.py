@@ -0,0 +1,256 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+from result_store import read_records
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CENTROIDS_FILE = os.path.join(ROOT, "outcode_centroids.json")
+FEATURES_FILE = os.path.join(ROOT, "deal_features.npz")
+POSTCODES_IO_URL = "https://api.postcodes.io/outcodes/{}"
+
+DEFAULT_WEIGHTS = {"yield": 0.5, "liquidity": 0.3, "connectivity": 0.2}
+METRICS = ("yield", "liquidity", "connectivity")
+# +1 when a higher raw value is a better deal, -1 when lower is better
+DIRECTIONS = np.array([1.0, -1.0, -1.0])
+
+# Joins the separate scraper outputs by outcode into one feature matrix:
+#   yield        gross yield, 12 * median_rent_pcm / typical sale price (median of the price bands)
+#   liquidity    overall median_days to sell
+#   connectivity km from the outcode centroid to the nearest station
+# Each column is turned into a percentile rank once, so scoring with new
+# weights is a single matrix-vector product over every outcode. A saved
+# matrix records the input files it was built from (path, size, mtime) and
+# is rebuilt when they differ.
+
+
+def _band_midpoints(mins, maxs):
+    # "Under £X" bands start at 0 and "Over £X" bands have no upper bound
+    mids = (mins + maxs) / 2
+    mids = np.where(np.isnan(maxs), mins * 1.25, mids)
+    return np.where(mins == 0, maxs / 2, mids)
+
+
+def typical_prices(records, index):
+    """Median sale price per outcode, read off the property counts in each price band."""
+    bands, cells = {}, []
+    for record in records:
+        row = index.get(record.get("location", "").upper())
+        if row is None:
+            continue
+        for band in record.get("by_price_band", []):
+            edges = (band["price_range"]["min"], band["price_range"]["max"])
+            column = bands.setdefault(edges, len(bands))
+            cells.append((row, column, band["properties"]))
+
+    prices = np.full(len(index), np.nan)
+    if not bands:
+        return prices
+    edges = np.array([(np.nan if lo is None else lo, np.nan if hi is None else hi) for lo, hi in bands], dtype=np.float64)
+    order = np.argsort(np.nan_to_num(edges[:, 0], nan=np.inf))
+    counts = np.zeros((len(index), len(bands)))
+    rows, columns, values = np.array(cells).T
+    counts[rows.astype(np.intp), columns.astype(np.intp)] = values
+    counts, mids = counts[:, order], _band_midpoints(edges[order, 0], edges[order, 1])
+
+    cumulative = np.cumsum(counts, axis=1)
+    total = cumulative[:, -1]
+    median_band = np.argmax(cumulative >= total[:, None] / 2, axis=1)
+    return np.where(total > 0, mids[median_band], np.nan)
+
+
+def percentile_ranks(values):
+    """Rank of every value in [0, 1]; NaNs stay NaN and ties share the lower rank."""
+    ranks = np.full(values.shape, np.nan)
+    present = ~np.isnan(values)
+    if present.sum() > 1:
+        known = values[present]
+        ranks[present] = np.searchsorted(np.sort(known), known, side="left") / (len(known) - 1)
+    elif present.any():
+        ranks[present] = 0.5
+    return ranks
+
+
+class DealFeatures:
+    """Outcode-aligned metric arrays plus a precomputed outcode -> row lookup.
+
+    Build once from the scraper outputs (or reopen a saved .npz), then call
+    score() / rank() as often as needed; neither touches the JSON files again.
+    """
+
+    def __init__(self, outcodes, raw):
+        self.outcodes = np.asarray(outcodes)
+        self.raw = np.asarray(raw, dtype=np.float64)  # (n, len(METRICS)), NaN where unknown
+        self.index = {outcode: i for i, outcode in enumerate(self.outcodes.tolist())}
+        oriented = self.raw * DIRECTIONS
+        self.ranks = np.column_stack([percentile_ranks(oriented[:, j]) for j in range(len(METRICS))])
+        self.known = ~np.isnan(self.ranks)
+        self.filled = np.where(self.known, self.ranks, 0.0)
+
+    @classmethod
+    def build(cls, sale_files=(), rental_files=(), centroids=None, stations=None):
+        sale = [r for path in sale_files for r in read_records(path)]
+        rental = [r for path in rental_files for r in read_records(path)]
+        outcodes = sorted({r["location"].upper() for r in sale} | {r["postcode"].upper() for r in rental})
+        index = {outcode: i for i, outcode in enumerate(outcodes)}
+        raw = np.full((len(outcodes), len(METRICS)), np.nan)
+
+        rents = np.full(len(outcodes), np.nan)
+        for record in rental:
+            rent = record["summary"].get("median_rent_pcm")
+            if rent:
+                rents[index[record["postcode"].upper()]] = rent
+        prices = typical_prices(sale, index)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            raw[:, 0] = np.where(prices > 0, 12 * rents / prices, np.nan)
+
+        for record in sale:
+            median = (record.get("overall") or {}).get("median_days")
+            if median is not None:
+                raw[index[record["location"].upper()], 1] = median
+
+        if centroids:
+            rows = [index[o] for o in centroids if o in index]
+            if rows:
+                if stations is None:
+                    from station_index import default_index
+                    stations = default_index()
+                coords = np.array([centroids[outcodes[i]] for i in rows], dtype=np.float64)
+                distances, _ = stations.nearest(coords[:, 0], coords[:, 1], k=1)
+                raw[rows, 2] = distances[:, 0]
+        return cls(outcodes, raw)
+
+    @classmethod
+    def open(cls, path=FEATURES_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["outcodes"], data["raw"])
+
+    def save(self, path=FEATURES_FILE, inputs=()):
+        """Write the matrix to `path`, noting the `inputs` signature (see input_signature) it was built from."""
+        np.savez(path, outcodes=self.outcodes.astype(str), raw=self.raw, inputs=np.array(inputs, dtype=str))
+
+    def __len__(self):
+        return len(self.outcodes)
+
+    def score(self, weights=None):
+        """Weighted mean of the percentile ranks for every outcode; a metric an outcode lacks counts as 0.
+
+        So an outcode scores only as much as the weight it has data for allows,
+        and one known metric cannot outrank outcodes with full data. Outcodes
+        with none of the weighted metrics get NaN.
+        """
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        w = np.array([weights[m] for m in METRICS], dtype=np.float64)
+        known = self.known @ w
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(known > 0, (self.filled @ w) / w.sum(), np.nan)
+
+    def rank(self, weights=None, top=None):
+        scores = self.score(weights)
+        order = np.argsort(np.nan_to_num(-scores, nan=np.inf), kind="stable")[:top]
+        # Round and convert whole columns at once; NaN becomes None only at the end
+        columns = np.column_stack((scores[order], self.raw[order])).round(4).tolist()
+        return [
+            {"outcode": outcode, **{name: None if v != v else v for name, v in zip(("score",) + METRICS, values)}}
+            for outcode, values in zip(self.outcodes[order].tolist(), columns)
+        ]
+
+    def lookup(self, outcode):
+        return self.index.get(outcode.upper())
+
+
+def load_centroids(path=CENTROIDS_FILE):
+    """{outcode: (lat, lon)} from a saved centroid file."""
+    with open(path, "r", encoding="utf-8") as f:
+        return {item["postcode"].upper(): (item["latitude"], item["longitude"]) for item in json.load(f)}
+
+
+async def import_centroids(outcodes, path=CENTROIDS_FILE):
+    """One-time download of outcode centroids from postcodes.io into `path`."""
+    from fetch_engine import FetchEngine, FetchError, HostLimits, run_all
+
+    limits = HostLimits(concurrency=8, rate=20, burst=20)
+    centroids = []
+
+    async def fetch(outcode):
+        try:
+            body = await engine.get(POSTCODES_IO_URL.format(outcode), label=outcode)
+        except FetchError as e:
+            print(f"❌ {outcode}: {e}")
+            return
+        result = json.loads(body).get("result") or {}
+        if result.get("latitude") is not None:
+            centroids.append({"postcode": outcode, "latitude": result["latitude"], "longitude": result["longitude"]})
+
+    async with FetchEngine(limits) as engine:
+        await run_all(outcodes, fetch)
+    centroids.sort(key=lambda item: item["postcode"])
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(centroids, f, indent=2)
+    return centroids
+
+
+def input_signature(paths):
+    """One "path size mtime" entry per input file, in the order given; missing files are noted as such."""
+    signature = []
+    for path in paths:
+        path = os.path.abspath(path)
+        stat = os.stat(path) if os.path.exists(path) else None
+        signature.append(f"{path} {stat.st_size} {stat.st_mtime_ns}" if stat else f"{path} missing")
+    return signature
+
+
+def _stale(cache_path, inputs):
+    """True unless `cache_path` was built from exactly these input files, unchanged since."""
+    if not os.path.exists(cache_path):
+        return True
+    with np.load(cache_path, allow_pickle=False) as data:
+        built_from = data["inputs"].tolist() if "inputs" in data.files else None
+    return built_from != input_signature(inputs)
+
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Rank outcodes by rental yield, liquidity and station distance.")
+    parser.add_argument("--sale", nargs="*", default=[], help="home_co_uk sale output files (JSON or JSONL)")
+    parser.add_argument("--rental", nargs="*", default=[], help="home_co_uk_rental output files (JSON or JSONL)")
+    parser.add_argument("--centroids", default=CENTROIDS_FILE)
+    parser.add_argument("--import-centroids", action="store_true", help="download centroids for every scored outcode first")
+    parser.add_argument("--features", default=FEATURES_FILE, help="saved feature matrix; rebuilt when the input files change")
+    for metric, weight in DEFAULT_WEIGHTS.items():
+        parser.add_argument(f"--w-{metric}", type=float, default=weight)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--json", action="store_true", help="print the ranking as JSON")
+    args = parser.parse_args(argv)
+
+    inputs = args.sale + args.rental + [args.centroids]
+    if not (args.sale or args.rental) and os.path.exists(args.features):
+        features = DealFeatures.open(args.features)
+    elif args.import_centroids or _stale(args.features, inputs):
+        if args.import_centroids:
+            outcodes = DealFeatures.build(args.sale, args.rental).outcodes.tolist()
+            asyncio.run(import_centroids(outcodes, args.centroids))
+        centroids = load_centroids(args.centroids) if os.path.exists(args.centroids) else None
+        features = DealFeatures.build(args.sale, args.rental, centroids)
+        features.save(args.features, input_signature(inputs))
+    else:
+        features = DealFeatures.open(args.features)
+
+    weights = {metric: getattr(args, f"w_{metric}") for metric in METRICS}
+    start = time.perf_counter()
+    ranking = features.rank(weights, args.top)
+    elapsed = (time.perf_counter() - start) * 1000
+    if args.json:
+        print(json.dumps(ranking, indent=2))
+    else:
+        for position, row in enumerate(ranking, 1):
+            print(f"{position:>4}. {row['outcode']:<6} score={row['score']}  yield={row['yield']}  "
+                  f"median_days={row['liquidity']}  station_km={row['connectivity']}")
+        print(f"⏱️ Scored {len(features)} outcodes in {elapsed:.2f} ms")
+
+
+if __name__ == "__main__":
+    cli()
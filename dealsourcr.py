@@ -0,0 +1,43 @@
+import argparse
+import importlib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# One entry point for every pipeline: `python dealsourcr.py <command> [args]`.
+# Only argparse is loaded up front; each command imports its module (and with
+# it bs4, aiohttp, numpy, ...) when it runs, and hands the remaining arguments
+# to that module's cli(), so `dealsourcr.py <command> --help` shows the
+# module's own options.
+
+# command -> (module, summary)
+COMMANDS = {
+    "discover": ("Scape_Postcodes", "build the outcode reference with Rightmove IDs"),
+    "scrape-sale": ("home_co_uk", "scrape home.co.uk time-to-sell stats"),
+    "scrape-rent": ("home_co_uk_rental", "scrape home.co.uk current rents"),
+    "stations": ("Populate_Nearest_UK_Train_Station", "stations near a coordinate"),
+    "urls": ("portal_urls", "generate portal search URLs"),
+    "score": ("deal_scoring", "rank outcodes by yield, liquidity and station distance"),
+}
+
+
+def load(module):
+    for path in (ROOT, os.path.join(ROOT, "Home_co_uk_scripts")):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    return importlib.import_module(module)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="dealsourcr", description="UK property deal sourcing pipelines.")
+    sub = parser.add_subparsers(dest="command", metavar="command", required=True)
+    for name, (_, summary) in COMMANDS.items():
+        sub.add_parser(name, help=summary, add_help=False)
+    args, rest = parser.parse_known_args(argv)
+    module = load(COMMANDS[args.command][0])
+    return module.cli(rest, prog=f"dealsourcr {args.command}")
+
+
+if __name__ == "__main__":
+    main()
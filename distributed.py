@@ -0,0 +1,342 @@
+import argparse
+import asyncio
+import bisect
+import importlib
+import json
+import os
+import socket
+import sys
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from job_queue import JOBS_DB, LEASE_SECONDS, JobQueue, drain
+from outcode_registry import postcode_area
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+COORDINATOR_PORT = int(os.environ.get("DEALSOURCR_COORDINATOR_PORT", "8780"))
+POLL_SECONDS = 2.0
+BATCH_SIZE = 8
+
+# Coordinator/worker mode for sweeps too big for one ScraperAPI key.
+#
+# The coordinator owns the job queue and the output: it enqueues the
+# outcodes, shards them over the live workers with a consistent hash ring
+# (by postcode area or by outcode) and serves leases over plain HTTP. Each
+# worker runs the scraper's own scrape_postcode with its own SCRAPER_API_KEY,
+# claims a batch of its shard, and posts every result back. A worker whose
+# shard is empty takes any other due work, and leases that run out (a worker
+# died or stalled) are handed out again, so no outcode is lost. A result or
+# failure reported on a lease that has since run out is refused (409), so a
+# stalled worker never writes an outcode a second time. A sweep has its own
+# queue (<source>_distributed) and output file, separate from the scraper's
+# own runs, so neither marks work done that the other has not written.
+#
+# Locally, against the stub server:
+#   python stub_server.py pages/ --port 8765        (pages/default.html = a saved home.co.uk page)
+#   python distributed.py coordinator home_co_uk_sale --outcodes BR1 BR2 CF10 --exit-when-done
+#   SCRAPERAPI_URL=http://127.0.0.1:8765/ SCRAPER_API_KEY=stub python distributed.py worker home_co_uk_sale  (x N)
+
+# source -> (module in Home_co_uk_scripts, record key field)
+SCRAPERS = {
+    "home_co_uk_sale": ("home_co_uk", "location"),
+    "home_co_uk_rental": ("home_co_uk_rental", "postcode"),
+}
+SHARD_KEYS = {
+    "area": postcode_area,
+    "outcode": str.upper,
+}
+
+
+class LeaseLost(Exception):
+    """A worker reported on a postcode whose lease ran out or went to another worker."""
+
+
+class HashRing:
+    """Consistent hash ring: adding or removing a worker only moves the shards next to it."""
+
+    def __init__(self, nodes=(), replicas=64):
+        self.nodes = sorted(nodes)
+        points = sorted((zlib.crc32(f"{node}#{i}".encode("utf-8")), node) for node in self.nodes for i in range(replicas))
+        self.hashes = [h for h, _ in points]
+        self.owners = [node for _, node in points]
+
+    def owner(self, key):
+        if not self.owners:
+            return None
+        i = bisect.bisect(self.hashes, zlib.crc32(key.encode("utf-8"))) % len(self.hashes)
+        return self.owners[i]
+
+
+class ResultWriter:
+    """Coordinator-side output: the scraper's JSONL sink plus the delta history."""
+
+    def __init__(self, source, path, key_field):
+        from result_store import ResultSink
+        from snapshot_store import SnapshotStore
+
+        self.source = source
+        self.sink = ResultSink(path, key_field)
+        self.history = SnapshotStore()
+
+    def write(self, postcode, result):
+        self.history.record(self.source, postcode, result)
+        self.sink.write(result)
+
+    def close(self, json_path=None):
+        if json_path:
+            self.sink.compact(json_path)
+        self.sink.close()
+        self.history.close()
+
+
+class Coordinator:
+    def __init__(self, source, writer, queue=None, queue_source=None, shard_by="area",
+                 worker_timeout=LEASE_SECONDS):
+        self.source = source
+        # Its own queue, so a sweep never marks work done in the scraper's queue
+        self.queue_source = queue_source or f"{source}_distributed"
+        self.writer = writer
+        self.queue = queue or JobQueue()
+        self.shard_key = SHARD_KEYS[shard_by]
+        self.worker_timeout = worker_timeout
+        self.seen = {}
+        self.ring = HashRing()
+
+    def _heartbeat(self, worker):
+        """Note `worker` as alive and drop workers silent for longer than worker_timeout."""
+        now = time.time()
+        self.seen[worker] = now
+        for name, last in list(self.seen.items()):
+            if now - last > self.worker_timeout:
+                del self.seen[name]
+        if self.ring.nodes != sorted(self.seen):
+            self.ring = HashRing(self.seen)
+            print(f"🔀 Workers now {self.ring.nodes}")
+
+    def finished(self):
+        counts = self.queue.counts(self.queue_source)
+        return not counts.get("pending") and not counts.get("running")
+
+    def claim(self, worker, limit=BATCH_SIZE):
+        self._heartbeat(worker)
+        ring = self.ring
+        postcodes = self.queue.claim(self.queue_source, limit, worker,
+                                     only=lambda p: ring.owner(self.shard_key(p)) == worker)
+        if not postcodes:
+            # Own shard is drained (or waiting on backoff): help with the rest
+            postcodes = self.queue.claim(self.queue_source, limit, worker)
+        return {"postcodes": postcodes, "finished": not postcodes and self.finished(),
+                "lease_seconds": self.queue.lease_seconds}
+
+    def renew(self, worker, postcodes):
+        self._heartbeat(worker)
+        return {"renewed": self.queue.renew(self.queue_source, postcodes, worker)}
+
+    def _check_lease(self, worker, postcode):
+        if not self.queue.holds(self.queue_source, postcode, worker):
+            raise LeaseLost(f"{worker} no longer holds the lease on {postcode}")
+
+    def complete(self, worker, postcode, result):
+        self._heartbeat(worker)
+        self._check_lease(worker, postcode)
+        self.writer.write(postcode, result)
+        self.queue.complete(self.queue_source, postcode, worker)
+        return {}
+
+    def fail(self, worker, postcode, error):
+        self._heartbeat(worker)
+        self._check_lease(worker, postcode)
+        status = self.queue.fail(self.queue_source, postcode, f"{worker}: {error}", worker)
+        return {"status": status}
+
+    def status(self):
+        return {
+            "source": self.source,
+            "counts": self.queue.counts(self.queue_source),
+            "leases": self.queue.leases(self.queue_source),
+            "workers": self.ring.nodes,
+        }
+
+    def server(self, host="0.0.0.0", port=COORDINATOR_PORT):
+        """A single-threaded HTTP server, so the queue's SQLite connection stays on one thread."""
+        coordinator = self
+        routes = {
+            "/claim": lambda body: coordinator.claim(body["worker"], body.get("limit", BATCH_SIZE)),
+            "/renew": lambda body: coordinator.renew(body["worker"], body["postcodes"]),
+            "/complete": lambda body: coordinator.complete(body["worker"], body["postcode"], body["result"]),
+            "/fail": lambda body: coordinator.fail(body["worker"], body["postcode"], body.get("error", "")),
+        }
+
+        class Handler(BaseHTTPRequestHandler):
+            def reply(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self.reply(200, coordinator.status())
+
+            def do_POST(self):
+                route = routes.get(self.path)
+                if route is None:
+                    return self.reply(404, {"error": f"unknown endpoint {self.path}"})
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if body.get("source", coordinator.source) != coordinator.source:
+                    return self.reply(409, {"error": f"coordinator serves {coordinator.source}"})
+                try:
+                    self.reply(200, route(body))
+                except LeaseLost as e:
+                    self.reply(409, {"error": str(e)})
+                except (KeyError, ValueError) as e:
+                    self.reply(400, {"error": str(e)})
+
+            def log_message(self, format, *args):
+                pass
+
+        server = HTTPServer((host, port), Handler)
+        server.timeout = POLL_SECONDS
+        return server
+
+    def run(self, host="0.0.0.0", port=COORDINATOR_PORT, exit_when_done=False):
+        server = self.server(host, port)
+        print(f"🧭 Coordinating {self.source} on http://{host}:{server.server_port}/ {self.queue.counts(self.queue_source)}")
+        done_at = None
+        try:
+            while True:
+                server.handle_request()
+                if exit_when_done and self.finished():
+                    # Linger so polling workers hear that the sweep is over
+                    done_at = done_at or time.monotonic()
+                    if time.monotonic() - done_at > 3 * POLL_SECONDS:
+                        break
+        finally:
+            server.server_close()
+        print(f"✅ {self.source}: {self.queue.counts(self.queue_source)}")
+
+
+class RemoteQueue:
+    """The JobQueue calls drain() makes, answered by a coordinator over HTTP.
+
+    Each call is a coroutine that runs the blocking request (and its retries)
+    in a thread, so the worker's event loop keeps fetching meanwhile. The
+    handler leaves each result in `results`; complete() sends it along.
+    """
+
+    def __init__(self, url, source, worker=None, poll=POLL_SECONDS):
+        from http_client import Client
+
+        self.url = url.rstrip("/")
+        self.source = source
+        self.worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll = poll
+        self.lease_seconds = LEASE_SECONDS
+        self.client = Client()
+        self.results = {}
+
+    def _post_sync(self, path, body):
+        response = self.client.post(self.url + path, json={"source": self.source, "worker": self.worker, **body})
+        if response.status_code != 200:
+            raise RuntimeError(f"Coordinator {path} answered {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    async def _post(self, path, **body):
+        return await asyncio.to_thread(self._post_sync, path, body)
+
+    async def claim(self, source, limit=1):
+        """The next batch; waits while other workers hold the remaining leases, [] once the sweep is over."""
+        while True:
+            reply = await self._post("/claim", limit=limit)
+            self.lease_seconds = reply.get("lease_seconds", self.lease_seconds)
+            if reply["postcodes"] or reply["finished"]:
+                return reply["postcodes"]
+            await asyncio.sleep(self.poll)
+
+    async def renew(self, source, postcodes):
+        return (await self._post("/renew", postcodes=postcodes))["renewed"]
+
+    async def complete(self, source, postcode):
+        await self._post("/complete", postcode=postcode, result=self.results.pop(postcode))
+        return True
+
+    async def fail(self, source, postcode, error):
+        self.results.pop(postcode, None)
+        return (await self._post("/fail", postcode=postcode, error=str(error)))["status"]
+
+    def close(self):
+        self.client.close()
+
+
+def load_scraper(source):
+    sys.path.insert(0, os.path.join(ROOT, "Home_co_uk_scripts"))
+    return importlib.import_module(SCRAPERS[source][0])
+
+
+async def run_worker(url, source, batch_size=BATCH_SIZE, worker=None):
+    from fetch_engine import FetchEngine, HostLimits
+    from parse_pool import ParsePool
+    from response_cache import ResponseCache
+
+    scraper = load_scraper(source)
+    queue = RemoteQueue(url, source, worker)
+    print(f"🛠️ Worker {queue.worker} on {url} for {source}")
+
+    async def handle(postcode):
+        queue.results[postcode] = await scraper.scrape_postcode(engine, postcode, parser=parser)
+        print(f"✅ {postcode}")
+
+    limits = HostLimits(concurrency=scraper.HOST_CONCURRENCY, rate=scraper.HOST_RATE, burst=scraper.HOST_CONCURRENCY,
+                        max_concurrency=scraper.HOST_MAX_CONCURRENCY)
+    try:
+        async with FetchEngine(limits=limits, cache=ResponseCache()) as engine, \
+                ParsePool(source, scraper.PARSE_WORKERS) as parser:
+            await drain(queue, source, handle, batch_size=batch_size)
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape across several machines: one coordinator, many workers.")
+    sub = parser.add_subparsers(dest="role", required=True)
+    coord = sub.add_parser("coordinator", help="shard the outcodes, lease them out and collect results")
+    coord.add_argument("source", choices=sorted(SCRAPERS))
+    coord.add_argument("--outcodes", nargs="*", help="default: every reference outcode (see --areas)")
+    coord.add_argument("--areas", nargs="*", help="only outcodes in these postcode areas")
+    coord.add_argument("--shard-by", choices=sorted(SHARD_KEYS), default="area")
+    coord.add_argument("--lease", type=float, default=LEASE_SECONDS, help="seconds before an unfinished batch is reassigned")
+    coord.add_argument("--queue-source", help="job queue name (default: <source>_distributed)")
+    coord.add_argument("--out", help="JSONL results file (default: <source>_distributed.jsonl in the repo root)")
+    coord.add_argument("--json", help="also compact the results to this pretty JSON file when done")
+    coord.add_argument("--db", default=JOBS_DB)
+    coord.add_argument("--host", default="0.0.0.0")
+    coord.add_argument("--port", type=int, default=COORDINATOR_PORT)
+    coord.add_argument("--exit-when-done", action="store_true")
+    work = sub.add_parser("worker", help="scrape leased outcodes with this machine's ScraperAPI key")
+    work.add_argument("source", choices=sorted(SCRAPERS))
+    work.add_argument("--coordinator", default=f"http://127.0.0.1:{COORDINATOR_PORT}/")
+    work.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    work.add_argument("--name", help="worker name (default: host:pid)")
+    args = parser.parse_args()
+
+    if args.role == "worker":
+        asyncio.run(run_worker(args.coordinator, args.source, args.batch_size, args.name))
+    else:
+        queue = JobQueue(args.db, lease_seconds=args.lease)
+        outcodes = args.outcodes
+        if not outcodes:
+            from portal_urls import entries
+
+            outcodes = [entry.postcode for entry in entries(areas=args.areas)]
+        queue_source = args.queue_source or f"{args.source}_distributed"
+        print(f"📋 {queue.enqueue(queue_source, outcodes)} new outcodes queued")
+        out = args.out or os.path.join(ROOT, f"{args.source}_distributed.jsonl")
+        writer = ResultWriter(args.source, out, SCRAPERS[args.source][1])
+        coordinator = Coordinator(args.source, writer, queue, queue_source, args.shard_by, worker_timeout=args.lease)
+        try:
+            coordinator.run(args.host, args.port, args.exit_when_done)
+        finally:
+            writer.close(args.json)
+            queue.close()
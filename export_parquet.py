@@ -0,0 +1,166 @@
+import argparse
+import os
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from result_store import file_snapshot_date, read_records
+
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "market_stats_parquet")
+
+# Flattens the nested scraper output into one typed table per nested list:
+#
+#   <EXPORT_DIR>/<table>/source=<source>/snapshot_date=<YYYY-MM-DD>/part-<input file>.parquet
+#
+# Each input file gets its own part, so exporting it again for the same date
+# replaces only that part and never another file's rows.
+#
+# postcode and label columns are dictionary encoded. Readers open a table as a
+# hive-partitioned dataset, so filters on source/snapshot_date skip whole
+# directories and only the requested columns are decoded.
+
+POSTCODE = pa.dictionary(pa.int32(), pa.string())
+LABEL = pa.dictionary(pa.int16(), pa.string())
+PARTITIONING = ds.partitioning(pa.schema([("source", pa.string()), ("snapshot_date", pa.string())]), flavor="hive")
+
+SCHEMAS = {
+    "sale_overall": pa.schema([
+        ("postcode", POSTCODE), ("total_properties", pa.int32()),
+        ("mean_days", pa.int32()), ("median_days", pa.int32()),
+    ]),
+    "sale_by_price_band": pa.schema([
+        ("postcode", POSTCODE), ("label", LABEL), ("min_price", pa.int64()), ("max_price", pa.int64()),
+        ("properties", pa.int32()), ("mean_days", pa.int32()), ("median_days", pa.int32()),
+    ]),
+    "sale_by_bedrooms": pa.schema([
+        ("postcode", POSTCODE), ("bedrooms", pa.int8()),
+        ("properties", pa.int32()), ("mean_days", pa.int32()), ("median_days", pa.int32()),
+    ]),
+    "sale_by_property_type": pa.schema([
+        ("postcode", POSTCODE), ("label", LABEL),
+        ("properties", pa.int32()), ("mean_days", pa.int32()), ("median_days", pa.int32()),
+    ]),
+    "rental_summary": pa.schema([
+        ("postcode", POSTCODE), ("total_properties", pa.int32()), ("new_in_14_days", pa.int32()),
+        ("average_rent_pcm", pa.int32()), ("median_rent_pcm", pa.int32()),
+    ]),
+    "rental_by_price_range": pa.schema([
+        ("postcode", POSTCODE), ("label", LABEL), ("min_rent", pa.int32()), ("max_rent", pa.int32()),
+        ("count", pa.int32()),
+    ]),
+    "rental_by_bedroom": pa.schema([
+        ("postcode", POSTCODE), ("label", LABEL), ("properties", pa.int32()),
+        ("average_rent_pcm", pa.int32()), ("median_rent_pcm", pa.int32()),
+    ]),
+    "rental_by_property_type": pa.schema([
+        ("postcode", POSTCODE), ("label", LABEL), ("properties", pa.int32()),
+        ("average_rent_pcm", pa.int32()), ("median_rent_pcm", pa.int32()),
+    ]),
+}
+
+
+def flatten_sale(record):
+    postcode = record["location"]
+    overall = record.get("overall") or {}
+    if overall:
+        yield "sale_overall", (postcode, overall.get("total_properties"), overall.get("mean_days"), overall.get("median_days"))
+    for row in record.get("by_price_band", []):
+        band = row["price_range"]
+        yield "sale_by_price_band", (postcode, band["display"], band["min"], band["max"],
+                                     row["properties"], row["mean_days"], row["median_days"])
+    for row in record.get("by_bedrooms", []):
+        yield "sale_by_bedrooms", (postcode, row["bedrooms"], row["properties"], row["mean_days"], row["median_days"])
+    for row in record.get("by_property_type", []):
+        yield "sale_by_property_type", (postcode, row["type"], row["properties"], row["mean_days"], row["median_days"])
+
+
+def flatten_rental(record):
+    postcode = record["postcode"]
+    summary = record["summary"]
+    yield "rental_summary", (postcode, summary["total_properties"], summary["new_in_14_days"],
+                             summary["average_rent_pcm"], summary["median_rent_pcm"])
+    for row in record.get("rents_by_price_range", []):
+        yield "rental_by_price_range", (postcode, row["range_label"], row["min"], row["max"], row["count"])
+    for row in record.get("rents_by_bedroom", []):
+        yield "rental_by_bedroom", (postcode, row["bedroom_category"], row["number_of_properties"],
+                                    row["average_rent_pcm"], row["median_rent_pcm"])
+    for row in record.get("rents_by_property_type", []):
+        yield "rental_by_property_type", (postcode, row["property_type"], row["number_of_properties"],
+                                          row["average_rent_pcm"], row["median_rent_pcm"])
+
+
+SOURCES = {
+    "home_co_uk_sale": flatten_sale,
+    "home_co_uk_rental": flatten_rental,
+}
+
+
+def export(path, source, snapshot_date=None, out_dir=EXPORT_DIR):
+    """Write one snapshot of `path` as partitioned Parquet tables; returns rows written per table."""
+    snapshot_date = snapshot_date or file_snapshot_date(path, source)
+    flatten = SOURCES[source]
+    columns = {}
+    for record in read_records(path):
+        for table, row in flatten(record):
+            if table not in columns:
+                columns[table] = [[] for _ in SCHEMAS[table]]
+            for column, value in zip(columns[table], row):
+                column.append(value)
+
+    part = os.path.basename(path).split(".")[0]
+    written = {}
+    for table, values in columns.items():
+        schema = SCHEMAS[table]
+        arrays = [
+            pa.array(column, type=field.type.value_type).dictionary_encode().cast(field.type) if pa.types.is_dictionary(field.type)
+            else pa.array(column, type=field.type)
+            for field, column in zip(schema, values)
+        ]
+        arrow_table = pa.Table.from_arrays(arrays, schema=schema)
+        partition = os.path.join(out_dir, table, f"source={source}", f"snapshot_date={snapshot_date.isoformat()}")
+        os.makedirs(partition, exist_ok=True)
+        pq.write_table(arrow_table, os.path.join(partition, f"part-{part}.parquet"),
+                       use_dictionary=["postcode", "label"], compression="zstd")
+        written[table] = arrow_table.num_rows
+    return written
+
+
+def open_table(table, out_dir=EXPORT_DIR):
+    """A hive-partitioned dataset over every snapshot of `table`; use .to_table(columns=..., filter=...)."""
+    return ds.dataset(os.path.join(out_dir, table), format="parquet", partitioning=PARTITIONING)
+
+
+def read_table(table, columns=None, source=None, since=None, until=None, postcodes=None, out_dir=EXPORT_DIR):
+    """Read only the requested columns and partitions, e.g.
+    read_table("rental_summary", ["postcode", "median_rent_pcm"], since="2025-01-01", postcodes=["BR1"]).
+    """
+    dataset = open_table(table, out_dir)
+    conditions = []
+    if source:
+        conditions.append(ds.field("source") == source)
+    if since:
+        conditions.append(ds.field("snapshot_date") >= str(since))
+    if until:
+        conditions.append(ds.field("snapshot_date") <= str(until))
+    if postcodes:
+        conditions.append(ds.field("postcode").isin(list(postcodes)))
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+    return dataset.to_table(columns=columns, filter=condition)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export scraper JSON/JSONL output to partitioned Parquet tables.")
+    parser.add_argument("source", choices=sorted(SOURCES))
+    parser.add_argument("files", nargs="+", help="one scraper output file per snapshot")
+    parser.add_argument("--snapshot-date", help="YYYY-MM-DD; defaults to the run timestamp in a rental file's name, else the file's last write")
+    parser.add_argument("--out", default=EXPORT_DIR)
+    args = parser.parse_args()
+
+    when = date.fromisoformat(args.snapshot_date) if args.snapshot_date else None
+    for path in args.files:
+        written = export(path, args.source, when, args.out)
+        print(f"✅ {path}: " + ", ".join(f"{table}={rows}" for table, rows in sorted(written.items())))
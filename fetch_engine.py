@@ -0,0 +1,252 @@
+import asyncio
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+import http_client
+from adaptive_limit import CREDITS, THROTTLE_STATUSES, AdaptiveLimit, BudgetExhausted, parse_retry_after
+from http_client import DEFAULT_HEADERS, POOL_SIZE, PROXY, TIMEOUT, RetryPolicy, scraperapi_params
+from metrics import METRICS, SCRAPERAPI_CREDITS
+from response_cache import CacheMiss
+
+SCRAPERAPI_URL = http_client.SCRAPERAPI_URL
+DEFAULT_HOST_CONCURRENCY = 4
+DEFAULT_RATE = 5.0  # requests per second, per host
+DEFAULT_BURST = 5
+
+# A fetched page and the validators its origin sent; `not_modified` (body None) answers a conditional request
+Page = namedtuple("Page", ["body", "etag", "last_modified", "not_modified"])
+
+
+class FetchError(Exception):
+    pass
+
+
+class HTTPStatusError(FetchError):
+    def __init__(self, message, status, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class Throttled(HTTPStatusError):
+    def __init__(self, message, status=429, retry_after=None):
+        super().__init__(message, status, retryable=True, retry_after=retry_after)
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostLimits:
+    """Per-host concurrency and rate settings, with a default for unknown hosts.
+
+    With `max_concurrency` set, each host's concurrency starts at its
+    configured value and adapts (AIMD) between 1 and `max_concurrency`.
+    """
+
+    def __init__(self, concurrency=DEFAULT_HOST_CONCURRENCY, rate=DEFAULT_RATE, burst=DEFAULT_BURST, overrides=None,
+                 max_concurrency=None):
+        self.default = (concurrency, rate, burst)
+        self.overrides = overrides or {}
+        self.max_concurrency = max_concurrency
+        self.semaphores = {}
+        self.buckets = {}
+
+    def _settings(self, host):
+        return self.overrides.get(host, self.default)
+
+    def semaphore(self, host):
+        if host not in self.semaphores:
+            concurrency = self._settings(host)[0]
+            if self.max_concurrency:
+                self.semaphores[host] = AdaptiveLimit(concurrency, maximum=max(concurrency, self.max_concurrency))
+            else:
+                self.semaphores[host] = asyncio.Semaphore(concurrency)
+        return self.semaphores[host]
+
+    def adaptive(self, host):
+        """The host's AdaptiveLimit, or None when its concurrency is fixed."""
+        limit = self.semaphore(host)
+        return limit if isinstance(limit, AdaptiveLimit) else None
+
+    def bucket(self, host):
+        if host not in self.buckets:
+            _, rate, burst = self._settings(host)
+            self.buckets[host] = TokenBucket(rate, burst)
+        return self.buckets[host]
+
+
+class FetchEngine:
+    """Shared aiohttp client with per-host limits and non-blocking retry backoff.
+
+    One keep-alive connection pool serves every host; proxy, timeouts and
+    Accept-Encoding come from http_client. `retry` (a RetryPolicy, built
+    from retries/backoff/max_backoff when not given) decides which statuses
+    are retried and caps the total time spent on one request. Retries sleep
+    with `asyncio.sleep`, so a postcode that is backing off only holds its
+    own task and never a connection slot or another worker.
+    With a ResponseCache attached, ScraperAPI fetches are served from it
+    first and stored after a successful download. Every attempt is recorded
+    in `metrics` under its source (the target host unless given).
+    429/503 responses honour Retry-After and feed the host's adaptive limit;
+    ScraperAPI requests fail without being sent once `credits` is used up.
+    """
+
+    def __init__(self, limits=None, retries=3, backoff=2.0, max_backoff=30.0, timeout=TIMEOUT, headers=None, cache=None,
+                 metrics=METRICS, credits=CREDITS, retry=None, proxy=PROXY):
+        self.limits = limits or HostLimits()
+        self.retry = retry or RetryPolicy(retries, backoff=backoff, max_backoff=max_backoff)
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.headers = {**DEFAULT_HEADERS, **(headers or {})}
+        self.proxy = proxy
+        self.cache = cache
+        self.metrics = metrics
+        self.credits = credits
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=POOL_SIZE, ttl_dns_cache=300, keepalive_timeout=30)
+        self.session = aiohttp.ClientSession(timeout=self.timeout, headers=self.headers, connector=connector)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def _get_once(self, url, params, source, headers=None):
+        host = urlsplit(url).netloc
+        adaptive = self.limits.adaptive(host)
+        async with self.limits.semaphore(host):
+            await self.limits.bucket(host).acquire()
+            start = time.perf_counter()
+            try:
+                with self.metrics.time(source, "fetch"):
+                    async with self.session.get(url, params=params, headers=headers, proxy=self.proxy) as response:
+                        not_modified = response.status == 304 and bool(headers)
+                        body = None if not_modified else await response.text()
+                        if not_modified:
+                            self.metrics.inc("not_modified_total", source=source)
+                        else:
+                            if response.content_length is not None:
+                                self.metrics.inc("wire_bytes_total", response.content_length, source=source)
+                            self.metrics.inc("body_bytes_total", len(await response.read()), source=source)
+                        if response.status in THROTTLE_STATUSES:
+                            raise Throttled(f"HTTP {response.status} for {url}", response.status,
+                                            parse_retry_after(response.headers.get("Retry-After")))
+                        if response.status != 200 and not not_modified:
+                            raise HTTPStatusError(f"HTTP {response.status} for {url}", response.status,
+                                                  self.retry.retryable(response.status))
+            except Throttled as e:
+                if adaptive:
+                    adaptive.on_throttle(e.retry_after)
+                raise
+            except asyncio.TimeoutError:
+                if adaptive:
+                    adaptive.on_throttle()
+                raise
+            if adaptive:
+                adaptive.on_success(time.perf_counter() - start)
+                self.metrics.gauge("concurrency_limit", round(adaptive.limit, 2), source=source)
+            return Page(body, response.headers.get("ETag"), response.headers.get("Last-Modified"), not_modified)
+
+    async def get(self, url, params=None, label=None, source=None):
+        return (await self.get_page(url, params, label, source)).body
+
+    async def get_page(self, url, params=None, label=None, source=None, headers=None):
+        label = label or url
+        source = source or urlsplit(url).netloc
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await self._get_once(url, params, source, headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError, FetchError) as e:
+                retryable = not isinstance(e, HTTPStatusError) or e.retryable
+                delay = self.retry.next_delay(attempt, started, getattr(e, "retry_after", None)) if retryable else None
+                if delay is None:
+                    print(f"❌ Attempt {attempt}/{self.retry.attempts} failed for {label}, giving up: {e}")
+                    self.metrics.error("failures_total", source, e)
+                    raise FetchError(f"Failed all attempts for {label}") from e
+                print(f"⚠️ Attempt {attempt}/{self.retry.attempts} failed for {label}, retrying in {delay:.1f}s: {e}")
+                self.metrics.error("retries_total", source, e)
+                await asyncio.sleep(delay)
+
+    async def get_scraperapi(self, target_url, render=False, label=None, source=None):
+        return (await self.get_scraperapi_page(target_url, render, label, source)).body
+
+    async def get_scraperapi_page(self, target_url, render=False, label=None, source=None, validators=None):
+        """Fetch `target_url` through ScraperAPI as a Page.
+
+        `validators` (see change_detection.PageState.validators) are passed on
+        to the target with keep_headers, so an origin that supports them can
+        answer 304; a 304 is not counted against the credit budget or cached.
+        """
+        metric_source = source or "scraperapi"
+        if self.cache is not None:
+            try:
+                body = self.cache.get(target_url, render, source)
+            except CacheMiss:
+                raise FetchError(f"Not cached (replay only): {label or target_url}")
+            if body is not None:
+                self.metrics.inc("cache_hits_total", source=metric_source)
+                return Page(body, None, None, False)
+        credits = SCRAPERAPI_CREDITS[render]
+        try:
+            self.credits.reserve(credits)
+        except BudgetExhausted as e:
+            raise FetchError(str(e)) from e
+        params = scraperapi_params(target_url, render)
+        if validators:
+            params["keep_headers"] = "true"
+        try:
+            page = await self.get_page(SCRAPERAPI_URL, params=params, label=label or target_url, source=metric_source,
+                                       headers=validators or None)
+        except FetchError:
+            self.credits.refund(credits)
+            raise
+        if page.not_modified:
+            self.credits.refund(credits)
+            return page
+        self.metrics.inc("scraperapi_credits_total", credits, source=metric_source)
+        if self.cache is not None:
+            self.cache.put(target_url, page.body, render, source)
+        return page
+
+    def invalidate(self, target_url, render=False):
+        """Drop a cached page that turned out to be unparseable, unless replaying."""
+        if self.cache is not None and not self.cache.replay_only:
+            self.cache.discard(target_url, render)
+
+
+async def run_all(items, worker):
+    """Schedule `worker(item)` for every item at once.
+
+    Throttling is left to the engine's per-host limits, so an item sleeping in
+    backoff does not occupy a worker slot.
+    """
+    return await asyncio.gather(*(worker(item) for item in items))
@@ -0,0 +1,73 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+MEMORY_BUDGET = 64 * 1024 * 1024  # bytes of temporaries per chunk
+TEMPORARIES = 4  # full-width arrays alive at once inside _haversine
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    # Inputs are already in radians and broadcastable against each other
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    # Clip in place for arrays; scalar inputs give a NumPy scalar, which has no buffer to write into
+    a = np.clip(a, 0, 1, out=a) if isinstance(a, np.ndarray) else np.clip(a, 0, 1)
+    return (2 * EARTH_RADIUS_KM) * np.arcsin(np.sqrt(a))
+
+
+def _radians(values, dtype):
+    return np.radians(np.asarray(values, dtype=dtype))
+
+
+def haversine_many(lats1, lons1, lats2, lons2, float32=False):
+    """Element-wise haversine distance in km between two equally shaped (or broadcastable) coordinate arrays."""
+    dtype = np.float32 if float32 else np.float64
+    return _haversine(_radians(lats1, dtype), _radians(lons1, dtype),
+                      _radians(lats2, dtype), _radians(lons2, dtype))
+
+
+def _chunk_rows(n_cols, dtype, memory_budget):
+    return max(1, int(memory_budget // (max(1, n_cols) * np.dtype(dtype).itemsize * TEMPORARIES)))
+
+
+def iter_distance_chunks(lats_a, lons_a, lats_b, lons_b, float32=False, memory_budget=MEMORY_BUDGET):
+    """Yield (row_offset, block) pieces of the |A| x |B| distance matrix, each sized to fit `memory_budget`."""
+    dtype = np.float32 if float32 else np.float64
+    lat_a, lon_a = _radians(lats_a, dtype)[:, None], _radians(lons_a, dtype)[:, None]
+    lat_b, lon_b = _radians(lats_b, dtype)[None, :], _radians(lons_b, dtype)[None, :]
+    step = _chunk_rows(lat_b.shape[1], dtype, memory_budget)
+    for start in range(0, lat_a.shape[0], step):
+        stop = start + step
+        yield start, _haversine(lat_a[start:stop], lon_a[start:stop], lat_b, lon_b)
+
+
+def distance_matrix(lats_a, lons_a, lats_b, lons_b, float32=False, memory_budget=MEMORY_BUDGET):
+    """Full |A| x |B| matrix of distances in km; only the output itself is allocated at full size."""
+    dtype = np.float32 if float32 else np.float64
+    out = np.empty((len(lats_a), len(lats_b)), dtype=dtype)
+    for start, block in iter_distance_chunks(lats_a, lons_a, lats_b, lons_b, float32, memory_budget):
+        out[start:start + block.shape[0]] = block
+    return out
+
+
+def top_k(lats_a, lons_a, lats_b, lons_b, k, float32=False, memory_budget=MEMORY_BUDGET):
+    """The `k` nearest B points for every A point, as (distances_km, indices) shaped (|A|, k), nearest first.
+
+    Works chunk by chunk with argpartition, so neither a full sort nor the
+    full distance matrix is ever needed.
+    """
+    k = min(k, len(lats_b))
+    dtype = np.float32 if float32 else np.float64
+    distances = np.empty((len(lats_a), k), dtype=dtype)
+    indices = np.empty((len(lats_a), k), dtype=np.intp)
+    for start, block in iter_distance_chunks(lats_a, lons_a, lats_b, lons_b, float32, memory_budget):
+        if k < block.shape[1]:
+            part = np.argpartition(block, k - 1, axis=1)[:, :k]
+        else:
+            part = np.broadcast_to(np.arange(block.shape[1]), block.shape).copy()
+        part_d = np.take_along_axis(block, part, axis=1)
+        order = np.argsort(part_d, axis=1)
+        stop = start + block.shape[0]
+        indices[start:stop] = np.take_along_axis(part, order, axis=1)
+        distances[start:stop] = np.take_along_axis(part_d, order, axis=1)
+    return distances, indices
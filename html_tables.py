@@ -0,0 +1,110 @@
+import os
+
+# Table extraction for the home.co.uk scrapers. Each backend returns the same
+# shape: one list per matching <table>, one list per <tr>, one string per <td>.
+# selectolax and lxml are used when installed, falling back to BeautifulSoup.
+#
+# With strip_nodes=True cell text matches bs4's get_text(strip=True) (every
+# text node stripped, then joined); otherwise it matches .text.strip().
+
+BACKEND_ORDER = ["selectolax", "lxml", "bs4"]
+
+
+def _class_xpath(tag, class_name):
+    return f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+
+def _selectolax_tables(html, table_class, container_class, strip_nodes):
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    root = (tree.css_first(f"div.{container_class}") if container_class else None) or tree.root
+    if root is None:
+        return []
+
+    def text(node):
+        if strip_nodes:
+            return node.text(deep=True, separator="", strip=True)
+        return node.text(deep=True).strip()
+
+    return [
+        [[text(td) for td in tr.css("td")] for tr in table.css("tr")]
+        for table in root.css(f"table.{table_class}")
+    ]
+
+
+def _lxml_tables(html, table_class, container_class, strip_nodes):
+    import lxml.html
+
+    if not html.strip():
+        return []
+    root = lxml.html.document_fromstring(html)
+    if container_class:
+        containers = root.xpath(_class_xpath("div", container_class))
+        if containers:
+            root = containers[0]
+
+    def text(node):
+        if strip_nodes:
+            return "".join(t.strip() for t in node.itertext())
+        return "".join(node.itertext()).strip()
+
+    return [
+        [[text(td) for td in tr.iter("td")] for tr in table.iter("tr")]
+        for table in root.xpath(_class_xpath("table", table_class))
+    ]
+
+
+def _bs4_tables(html, table_class, container_class, strip_nodes):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    root = (soup.find("div", class_=container_class) if container_class else None) or soup
+
+    def text(node):
+        if strip_nodes:
+            return node.get_text(strip=True)
+        return node.text.strip()
+
+    return [
+        [[text(td) for td in tr.find_all("td")] for tr in table.find_all("tr")]
+        for table in root.find_all("table", class_=table_class)
+    ]
+
+
+BACKENDS = {
+    "selectolax": _selectolax_tables,
+    "lxml": _lxml_tables,
+    "bs4": _bs4_tables,
+}
+
+
+def available_backends():
+    found = []
+    for name, module in (("selectolax", "selectolax.lexbor"), ("lxml", "lxml.html"), ("bs4", "bs4")):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        found.append(name)
+    return found
+
+
+def default_backend():
+    forced = os.environ.get("DEALSOURCR_HTML_PARSER")
+    if forced:
+        return forced
+    found = available_backends()
+    return found[0] if found else "bs4"
+
+
+DEFAULT_BACKEND = default_backend()
+
+
+def extract_tables(html, table_class, container_class=None, strip_nodes=True, backend=None):
+    """Return the text of every <td> in tables with class `table_class`, grouped by table and row.
+
+    When `container_class` is given the search is limited to the first <div>
+    with that class, falling back to the whole document if there is none.
+    """
+    return BACKENDS[backend or DEFAULT_BACKEND](html, table_class, container_class, strip_nodes)
@@ -0,0 +1,164 @@
+import os
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from adaptive_limit import parse_retry_after
+
+try:
+    import httpx
+    import h2  # noqa: F401  (httpx only speaks HTTP/2 with h2 installed)
+except ImportError:
+    httpx = None
+
+try:
+    import brotli  # noqa: F401
+    BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        BROTLI = True
+    except ImportError:
+        BROTLI = False
+
+# One place for every network setting the scrapers share:
+#   SCRAPERAPI_URL / SCRAPER_API_KEY (or a key file)   ScraperAPI endpoint and credentials
+#   DEALSOURCR_PROXY                                   outbound proxy for every client
+#   DEALSOURCR_TIMEOUT / DEALSOURCR_TIMEOUT_BUDGET     seconds per attempt / across all retries
+# The async scrapers go through fetch_engine.FetchEngine (aiohttp, HTTP/1.1
+# keep-alive); one-off synchronous calls use Client below, which speaks
+# HTTP/2 when httpx and h2 are installed.
+
+SCRAPERAPI_URL = os.environ.get("SCRAPERAPI_URL", "https://api.scraperapi.com/")
+SCRAPERAPI_KEY_FILE = os.environ.get(
+    "DEALSOURCR_SCRAPERAPI_KEY_FILE", os.path.join(os.path.expanduser("~"), ".config", "dealsourcr", "scraperapi_key")
+)
+PROXY = os.environ.get("DEALSOURCR_PROXY")
+TIMEOUT = float(os.environ.get("DEALSOURCR_TIMEOUT", "30"))
+TIMEOUT_BUDGET = float(os.environ.get("DEALSOURCR_TIMEOUT_BUDGET", "180"))
+POOL_SIZE = int(os.environ.get("DEALSOURCR_POOL_SIZE", "32"))
+ACCEPT_ENCODING = "gzip, deflate, br" if BROTLI else "gzip, deflate"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+DEFAULT_HEADERS = {"User-Agent": USER_AGENT, "Accept-Encoding": ACCEPT_ENCODING}
+
+# Transient statuses worth another attempt; anything else non-200 fails at once
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504, 520, 522, 524})
+TRANSPORT_ERRORS = (requests.ConnectionError, requests.Timeout) + ((httpx.TransportError,) if httpx else ())
+
+
+def scraperapi_key():
+    key = os.environ.get("SCRAPER_API_KEY")
+    if not key and os.path.exists(SCRAPERAPI_KEY_FILE):
+        with open(SCRAPERAPI_KEY_FILE) as f:
+            key = f.read().strip()
+    if not key:
+        raise RuntimeError(f"Set SCRAPER_API_KEY or put the key in {SCRAPERAPI_KEY_FILE}")
+    return key
+
+
+def scraperapi_params(target_url, render=False):
+    return {"api_key": scraperapi_key(), "url": target_url, "render": "true" if render else "false"}
+
+
+class RetryPolicy:
+    """Which failures are retried and how long to wait between attempts.
+
+    The wait is exponential (`backoff` doubling up to `max_backoff`) with
+    `jitter` as the random fraction shaved off it, never shorter than a
+    server's Retry-After. No retry starts once `max_elapsed` seconds would
+    be exceeded.
+    """
+
+    def __init__(self, attempts=3, statuses=RETRY_STATUSES, backoff=2.0, max_backoff=30.0, jitter=0.5,
+                 max_elapsed=TIMEOUT_BUDGET):
+        self.attempts = attempts
+        self.statuses = frozenset(statuses)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.max_elapsed = max_elapsed
+
+    def retryable(self, status):
+        return status in self.statuses
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait after failed attempt number `attempt` (1-based)."""
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1)) * random.uniform(1 - self.jitter, 1.0)
+        return max(delay, retry_after or 0.0)
+
+    def next_delay(self, attempt, started, retry_after=None):
+        """The wait before the next attempt, or None when attempts or the time budget are used up."""
+        if attempt >= self.attempts:
+            return None
+        delay = self.delay(attempt, retry_after)
+        if self.max_elapsed is not None and time.monotonic() - started + delay > self.max_elapsed:
+            return None
+        return delay
+
+
+class Client:
+    """Blocking pooled client for one-off calls (station import, debugging scripts).
+
+    Uses httpx with HTTP/2 when available, otherwise a requests Session with
+    a keep-alive pool; both retry per `retry` and use the shared proxy and
+    timeout settings.
+    """
+
+    def __init__(self, retry=None, timeout=TIMEOUT, headers=None, proxy=PROXY):
+        self.retry = retry or RetryPolicy()
+        self.timeout = timeout
+        headers = {**DEFAULT_HEADERS, **(headers or {})}
+        if httpx is not None:
+            self.http = httpx.Client(http2=True, headers=headers, proxy=proxy, timeout=timeout,
+                                     limits=httpx.Limits(max_connections=POOL_SIZE))
+        else:
+            self.http = requests.Session()
+            self.http.headers.update(headers)
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            self.http.mount("https://", adapter)
+            self.http.mount("http://", adapter)
+            if proxy:
+                self.http.proxies = {"http": proxy, "https": proxy}
+
+    def request(self, method, url, timeout=None, **kwargs):
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            retry_after = None
+            try:
+                response = self.http.request(method, url, timeout=timeout or self.timeout, **kwargs)
+                if not self.retry.retryable(response.status_code):
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                error = f"HTTP {response.status_code}"
+            except TRANSPORT_ERRORS as e:
+                response, error = None, e
+            delay = self.retry.next_delay(attempt, started, retry_after)
+            if delay is None:
+                if response is not None:
+                    return response
+                raise error
+            print(f"⚠️ Retry {attempt}/{self.retry.attempts} for {url}: {error}")
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def scraperapi(self, target_url, render=False, **kwargs):
+        """Fetch `target_url` through ScraperAPI with the configured key."""
+        return self.get(SCRAPERAPI_URL, params=scraperapi_params(target_url, render), **kwargs)
+
+    def close(self):
+        self.http.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
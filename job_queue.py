@@ -0,0 +1,284 @@
+import argparse
+import asyncio
+import inspect
+import os
+import random
+import socket
+import sqlite3
+import time
+
+JOBS_DB = os.environ.get("DEALSOURCR_JOBS_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.sqlite"))
+MAX_ATTEMPTS = 5
+BASE_DELAY = 60  # seconds before the first retry, doubled per attempt
+MAX_DELAY = 6 * 60 * 60
+LEASE_SECONDS = 300
+
+# Persistent work queue shared by the scrapers: one row per (source, postcode).
+#
+#   pending -> running -> done
+#                      -> pending again (after backoff) -> ... -> failed
+#
+# Claims happen inside BEGIN IMMEDIATE transactions, so several worker
+# processes can drain the same database. A claim is a lease: if a worker is
+# killed, its rows become claimable again once the lease runs out. drain()
+# renews the leases of a batch while it is still working on it, and only the
+# lease holder can complete or fail a row.
+
+
+class JobQueue:
+    def __init__(self, path=JOBS_DB, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY,
+                 max_delay=MAX_DELAY, lease_seconds=LEASE_SECONDS, worker=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+        self.worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " source TEXT NOT NULL, postcode TEXT NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " last_error TEXT,"
+            " next_eligible_at REAL NOT NULL DEFAULT 0,"
+            " lease_until REAL, worker TEXT, updated_at REAL,"
+            " PRIMARY KEY (source, postcode))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (source, status, next_eligible_at)")
+
+    def enqueue(self, source, postcodes):
+        """Add postcodes that are not already queued; returns how many were new."""
+        before = self.db.total_changes
+        self.db.execute("BEGIN IMMEDIATE")
+        self.db.executemany(
+            "INSERT OR IGNORE INTO jobs (source, postcode, updated_at) VALUES (?, ?, ?)",
+            [(source, p, time.time()) for p in postcodes],
+        )
+        self.db.execute("COMMIT")
+        return self.db.total_changes - before
+
+    def mark_done(self, source, postcodes):
+        """Record work finished outside the queue, e.g. results already in an output file."""
+        self.enqueue(source, postcodes)
+        self.db.execute("BEGIN IMMEDIATE")
+        self.db.executemany(
+            "UPDATE jobs SET status = 'done', updated_at = ? WHERE source = ? AND postcode = ?",
+            [(time.time(), source, p) for p in postcodes],
+        )
+        self.db.execute("COMMIT")
+
+    def claim(self, source, limit=1, worker=None, only=None):
+        """Lease up to `limit` postcodes that are due, including ones whose lease has expired.
+
+        `worker` names the lease holder (default: this process); `only`, a
+        postcode -> bool predicate, restricts the claim to one shard.
+        """
+        now = time.time()
+        shard = ""
+        if only is not None:
+            self.db.create_function("in_shard", 1, lambda p: bool(only(p)), deterministic=True)
+            shard = " AND in_shard(postcode)"
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.db.execute(
+                "SELECT postcode FROM jobs WHERE source = ? AND ("
+                " (status = 'pending' AND next_eligible_at <= ?)"
+                " OR (status = 'running' AND lease_until < ?))" + shard +
+                " ORDER BY next_eligible_at, postcode LIMIT ?",
+                (source, now, now, limit),
+            ).fetchall()
+            postcodes = [row[0] for row in rows]
+            self.db.executemany(
+                "UPDATE jobs SET status = 'running', lease_until = ?, worker = ?, updated_at = ?"
+                " WHERE source = ? AND postcode = ?",
+                [(now + self.lease_seconds, worker or self.worker, now, source, p) for p in postcodes],
+            )
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return postcodes
+
+    def renew(self, source, postcodes, worker=None):
+        """Extend `worker`'s leases on `postcodes` by lease_seconds from now; returns how many it still held."""
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        renewed = sum(
+            self.db.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ?"
+                " WHERE source = ? AND postcode = ? AND status = 'running' AND worker = ?",
+                (now + self.lease_seconds, now, source, p, worker or self.worker),
+            ).rowcount
+            for p in postcodes
+        )
+        self.db.execute("COMMIT")
+        return renewed
+
+    def complete(self, source, postcode, worker=None):
+        """Mark `postcode` done; False when `worker` (default: this process) no longer holds it."""
+        return self.db.execute(
+            "UPDATE jobs SET status = 'done', last_error = NULL, lease_until = NULL, updated_at = ?"
+            " WHERE source = ? AND postcode = ? AND status = 'running' AND worker = ?",
+            (time.time(), source, postcode, worker or self.worker),
+        ).rowcount > 0
+
+    def holds(self, source, postcode, worker):
+        """True while `worker`'s lease on `postcode` is current, i.e. it has not run out or been handed on."""
+        row = self.db.execute(
+            "SELECT 1 FROM jobs WHERE source = ? AND postcode = ? AND status = 'running'"
+            " AND worker = ? AND lease_until >= ?",
+            (source, postcode, worker, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def fail(self, source, postcode, error, worker=None):
+        """Count a failed attempt and re-queue with jittered exponential backoff, or give up.
+
+        Returns the new status, or None when `worker` (default: this process)
+        no longer holds the lease and the row was left alone.
+        """
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        row = self.db.execute(
+            "SELECT attempts FROM jobs WHERE source = ? AND postcode = ? AND status = 'running' AND worker = ?",
+            (source, postcode, worker or self.worker),
+        ).fetchone()
+        if row is None:
+            self.db.execute("COMMIT")
+            return None
+        attempts = row[0] + 1
+        if attempts >= self.max_attempts:
+            status, next_at = "failed", now
+        else:
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            status, next_at = "pending", now + delay * random.uniform(0.75, 1.25)
+        self.db.execute(
+            "UPDATE jobs SET status = ?, attempts = ?, last_error = ?, next_eligible_at = ?,"
+            " lease_until = NULL, updated_at = ? WHERE source = ? AND postcode = ?",
+            (status, attempts, str(error)[:500], next_at, now, source, postcode),
+        )
+        self.db.execute("COMMIT")
+        return status
+
+    def requeue(self, source, postcodes):
+        """Put finished postcodes back in the queue, e.g. when their data is due for a refresh."""
+        self.db.execute("BEGIN IMMEDIATE")
+        self.db.executemany(
+            "UPDATE jobs SET status = 'pending', attempts = 0, next_eligible_at = 0, updated_at = ?"
+            " WHERE source = ? AND postcode = ? AND status != 'running'",
+            [(time.time(), source, p) for p in postcodes],
+        )
+        self.db.execute("COMMIT")
+
+    def retry_failed(self, source):
+        """Give permanently failed postcodes a fresh set of attempts."""
+        return self.db.execute(
+            "UPDATE jobs SET status = 'pending', attempts = 0, next_eligible_at = 0, updated_at = ?"
+            " WHERE source = ? AND status = 'failed'",
+            (time.time(), source),
+        ).rowcount
+
+    def postcodes(self, source, status):
+        rows = self.db.execute(
+            "SELECT postcode FROM jobs WHERE source = ? AND status = ? ORDER BY postcode", (source, status)
+        )
+        return [row[0] for row in rows]
+
+    def leases(self, source):
+        """{worker: postcodes currently leased to it}; expired leases are left out."""
+        rows = self.db.execute(
+            "SELECT worker, COUNT(*) FROM jobs WHERE source = ? AND status = 'running' AND lease_until >= ?"
+            " GROUP BY worker",
+            (source, time.time()),
+        )
+        return dict(rows.fetchall())
+
+    def counts(self, source):
+        rows = self.db.execute("SELECT status, COUNT(*) FROM jobs WHERE source = ? GROUP BY status", (source,))
+        return dict(rows.fetchall())
+
+    def export_failed(self, source, path):
+        """Write failed and not-yet-retried postcodes in the old one-per-line txt format."""
+        rows = self.db.execute(
+            "SELECT postcode FROM jobs WHERE source = ? AND attempts > 0 AND status != 'done' ORDER BY postcode",
+            (source,),
+        ).fetchall()
+        if rows:
+            with open(path, "w") as f:
+                for (postcode,) in rows:
+                    f.write(postcode + "\n")
+        return len(rows)
+
+    def close(self):
+        self.db.close()
+
+
+async def _settle(value):
+    """The result of a queue call; a remote queue answers with an awaitable."""
+    return await value if inspect.isawaitable(value) else value
+
+
+async def _renew_leases(queue, source, running):
+    """Keep extending the leases on the postcodes in `running` (a live set) before they can run out."""
+    while True:
+        await asyncio.sleep(queue.lease_seconds / 3)
+        if running:
+            try:
+                await _settle(queue.renew(source, sorted(running)))
+            except Exception as e:
+                print(f"⚠️ Could not renew leases: {e}")
+
+
+async def drain(queue, source, handle, batch_size=20):
+    """Claim due postcodes in batches and await `handle(postcode)` for each until none are due.
+
+    A postcode is completed when `handle` returns and failed (so re-queued
+    with backoff) when it or the completion raises. Leases of the batch's
+    unfinished postcodes are renewed meanwhile, however long the batch takes.
+    `queue` is a JobQueue or anything with the same claim/renew/complete/fail
+    calls, which may be coroutines.
+    """
+    while True:
+        batch = await _settle(queue.claim(source, batch_size))
+        if not batch:
+            return
+        running = set(batch)
+
+        async def run(postcode):
+            try:
+                await handle(postcode)
+                if not await _settle(queue.complete(source, postcode)):
+                    print(f"⚠️ {postcode}: lease lost before it completed; left to its new holder")
+            except Exception as e:
+                try:
+                    status = await _settle(queue.fail(source, postcode, e))
+                except Exception as lost:
+                    # Its lease runs out and the postcode is claimed again
+                    print(f"❌ {postcode}: {e} (not re-queued: {lost})")
+                    return
+                outcome = "lease lost" if status is None else "gave up" if status == "failed" else "re-queued"
+                print(f"❌ {postcode}: {e} ({outcome})")
+            finally:
+                running.discard(postcode)
+
+        renewer = asyncio.create_task(_renew_leases(queue, source, running))
+        try:
+            await asyncio.gather(*(run(p) for p in batch))
+        finally:
+            renewer.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or reset the scraper job queue.")
+    parser.add_argument("source")
+    parser.add_argument("--retry-failed", action="store_true", help="re-queue postcodes that used up their attempts")
+    parser.add_argument("--db", default=JOBS_DB)
+    args = parser.parse_args()
+
+    queue = JobQueue(args.db)
+    if args.retry_failed:
+        print(f"🔁 Re-queued {queue.retry_failed(args.source)} failed postcodes")
+    print(f"📋 {args.source}: {queue.counts(args.source)}")
+    for postcode in queue.postcodes(args.source, "failed"):
+        print(f"❌ {postcode}")
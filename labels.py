@@ -0,0 +1,100 @@
+import re
+from functools import lru_cache
+
+# Shared vocabulary for the labels home.co.uk puts in its stats tables.
+# Sale and rental pages word the same things differently ("Flat / Apartment"
+# vs "Flat", "£100,000 - £150,000" vs "£500 - £750 pcm"), and the same few
+# dozen labels repeat on every page, so each label is parsed once with
+# precompiled patterns and the structured value is memoised.
+
+CURRENCY_SYMBOL = "£"
+CACHE_SIZE = 4096
+
+BEDROOM_WORDS = {
+    "studio": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+BEDROOM_LABELS = {0: "Studio", 1: "One bedroom"}
+BEDROOM_LABELS.update({n: f"{word.capitalize()} bedrooms" for word, n in BEDROOM_WORDS.items() if n > 1})
+
+# Canonical property types, keyed by the lower-case label with runs of spaces collapsed
+PROPERTY_TYPES = {
+    "detached": "Detached", "detached house": "Detached",
+    "semi-detached": "Semi-detached", "semi-detached house": "Semi-detached",
+    "terraced": "Terraced", "terraced house": "Terraced",
+    "flat": "Flat", "flat / apartment": "Flat", "apartment": "Flat", "maisonette": "Flat",
+    "bungalow": "Bungalow",
+    "room": "Room",
+}
+
+_NUMBER = re.compile(r"\d[\d,]*")
+_DIGITS = re.compile(r"\d+")
+_BEDROOM_WORD = re.compile(r"\b(" + "|".join(BEDROOM_WORDS) + r")\b")
+_SPACES = re.compile(r"\s+")
+_AMOUNT = str.maketrans("", "", CURRENCY_SYMBOL + ",")
+
+
+def amount(text):
+    """"£2,667 pcm" -> 2667."""
+    return int(text.translate(_AMOUNT).replace("pcm", ""))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def days(text):
+    """"59 days" -> 59; None without a number."""
+    match = _DIGITS.search(text)
+    return int(match.group()) if match else None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def price_band(label):
+    """(min, max) of a band label: "Under £500" -> (0, 500), "Over £1,000,000" -> (1000000, None)."""
+    prices = [int(p.replace(",", "")) for p in _NUMBER.findall(label)]
+    lower = label.lower()
+    if "under" in lower:
+        return 0, prices[0] if prices else None
+    if "over" in lower:
+        return prices[0] if prices else None, None
+    return prices[0] if prices else None, prices[1] if len(prices) > 1 else None
+
+
+def band_label(low, high):
+    """Canonical band label: "Under £500", "£500–£750", "Over £3000"."""
+    if low == 0 and high is not None:
+        return f"Under {CURRENCY_SYMBOL}{high}"
+    if high is None:
+        return f"Over {CURRENCY_SYMBOL}{low}"
+    return f"{CURRENCY_SYMBOL}{low}–{CURRENCY_SYMBOL}{high}"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def rent_band(label):
+    """(range_label, min, max) for a rental band; labels without a usable range keep their text."""
+    label = label.replace("pcm", "").strip()
+    low, high = price_band(label)
+    lower = label.lower()
+    if "under" in lower:
+        usable = high is not None
+    elif "over" in lower:
+        usable = low is not None
+    else:
+        usable = len(_NUMBER.findall(label)) == 2
+    return (band_label(low, high), low, high) if usable else (label, None, None)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def bedrooms(label):
+    """Bedroom count of a label ("Studio" -> 0, "Two bedrooms" -> 2, "11 bedrooms" -> 11); None if unrecognised."""
+    lower = label.lower()
+    match = _DIGITS.search(lower)
+    if match:
+        return int(match.group())
+    match = _BEDROOM_WORD.search(lower)
+    return BEDROOM_WORDS[match.group(1)] if match else None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def property_type(label):
+    """Canonical property type shared by the sale and rental tables; unknown labels come back tidied."""
+    text = _SPACES.sub(" ", label).strip()
+    return PROPERTY_TYPES.get(text.lower(), text)
@@ -0,0 +1,214 @@
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Process-wide request metrics shared by every scraper:
+#   phase_seconds   latency histogram per (source, phase), phase is fetch / parse / write
+#   retries_total, failures_total   per (source, error class)
+#   wire_bytes_total   response bytes as transferred (Content-Length; responses without one are not counted)
+#   body_bytes_total   response bytes after Content-Encoding is undone
+#   cache_hits_total, scraperapi_credits_total   per source
+#   concurrency_limit   current adaptive limit per source (gauge)
+#
+# Exported as Prometheus text on DEALSOURCR_METRICS_PORT (/metrics) and/or as
+# JSONL snapshots appended to DEALSOURCR_METRICS_FILE.
+
+METRICS_PORT = os.environ.get("DEALSOURCR_METRICS_PORT")
+METRICS_FILE = os.environ.get("DEALSOURCR_METRICS_FILE")
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# ScraperAPI bills 10 credits for a JS-rendered request and 1 otherwise
+SCRAPERAPI_CREDITS = {False: 1, True: 10}
+
+
+def _labels(labels):
+    return ",".join(f'{k}="{v}"' for k, v in labels)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.started = time.time()
+
+    def observe(self, source, phase, seconds):
+        with self.lock:
+            key = (("source", source), ("phase", phase))
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(seconds)
+
+    @contextmanager
+    def time(self, source, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(source, phase, time.perf_counter() - start)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def error(self, name, source, error):
+        """Count a retry or failure under the class name of `error`."""
+        self.inc(name, source=source, error=type(error).__name__ if isinstance(error, BaseException) else str(error))
+
+    def total(self, name, **labels):
+        wanted = set(labels.items())
+        with self.lock:
+            return sum(v for (n, key), v in self.counters.items() if n == name and wanted <= set(key))
+
+    def mean(self, phase, source=None):
+        with self.lock:
+            hists = [h for key, h in self.histograms.items()
+                     if dict(key)["phase"] == phase and (source is None or dict(key)["source"] == source)]
+            count = sum(h.count for h in hists)
+            return sum(h.sum for h in hists) / count if count else 0.0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "time": time.time(),
+                "uptime_s": time.time() - self.started,
+                "phase_seconds": [
+                    {**dict(key), "count": h.count, "sum": round(h.sum, 6),
+                     "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], h.counts))}
+                    for key, h in sorted(self.histograms.items())
+                ],
+                "counters": [{"name": name, **dict(labels), "value": value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                "gauges": [{"name": name, **dict(labels), "value": value}
+                           for (name, labels), value in sorted(self.gauges.items())],
+            }
+
+    def prometheus(self):
+        lines = []
+        with self.lock:
+            lines += ["# TYPE dealsourcr_phase_seconds histogram"]
+            for key, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip([str(b) for b in BUCKETS] + ["+Inf"], h.counts):
+                    cumulative += count
+                    lines.append(f'dealsourcr_phase_seconds_bucket{{{_labels(key)},le="{bound}"}} {cumulative}')
+                lines.append(f"dealsourcr_phase_seconds_sum{{{_labels(key)}}} {h.sum}")
+                lines.append(f"dealsourcr_phase_seconds_count{{{_labels(key)}}} {h.count}")
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE dealsourcr_{name} counter")
+                for (n, labels), value in sorted(self.counters.items()):
+                    if n == name:
+                        lines.append(f"dealsourcr_{name}{{{_labels(labels)}}} {value}")
+            for name in sorted({name for name, _ in self.gauges}):
+                lines.append(f"# TYPE dealsourcr_{name} gauge")
+                for (n, labels), value in sorted(self.gauges.items()):
+                    if n == name:
+                        lines.append(f"dealsourcr_{name}{{{_labels(labels)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_jsonl(self, path=None):
+        path = path or METRICS_FILE
+        if path:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.snapshot()) + "\n")
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics in Prometheus text format on a background thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, int(port)), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+METRICS = Metrics()
+_server = None
+
+
+def start():
+    """Start the /metrics endpoint when DEALSOURCR_METRICS_PORT is set (once per process)."""
+    global _server
+    if METRICS_PORT and _server is None:
+        _server = METRICS.serve(METRICS_PORT)
+        print(f"📈 Metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
+
+
+def finish():
+    """Write a final JSONL snapshot when DEALSOURCR_METRICS_FILE is set."""
+    METRICS.write_jsonl()
+
+
+class Progress:
+    """Live one-line summary every `interval` seconds: done/total, rate, ETA and where the time goes."""
+
+    def __init__(self, label, total=0, interval=5.0, metrics=METRICS, stream=sys.stderr):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.interval = interval
+        self.metrics = metrics
+        self.stream = stream
+        self.started = self.last = time.perf_counter()
+
+    def add(self, n):
+        self.total += n
+
+    def tick(self, n=1):
+        self.done += n
+        now = time.perf_counter()
+        # Report every `interval`, plus once on the tick that reaches the total
+        if now - self.last >= self.interval or self.done - n < self.total <= self.done:
+            self.last = now
+            self.report(now)
+
+    def report(self, now=None):
+        elapsed = (now or time.perf_counter()) - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        remaining = max(self.total - self.done, 0)
+        eta = time.strftime("%H:%M:%S", time.gmtime(remaining / rate)) if rate else "--:--:--"
+        m = self.metrics
+        self.stream.write(
+            f"📊 {self.label} [{self.done}/{self.total}] {rate:.2f}/s ETA {eta} | "
+            f"fetch {m.mean('fetch', self.label):.2f}s parse {m.mean('parse', self.label) * 1000:.1f}ms "
+            f"write {m.mean('write', self.label) * 1000:.1f}ms | "
+            f"retries {m.total('retries_total', source=self.label)} failures {m.total('failures_total', source=self.label)}\n"
+        )
+        self.stream.flush()
+        m.write_jsonl()
@@ -0,0 +1,290 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections import namedtuple
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+REFERENCE_FILE = os.path.join(ROOT, "uk_postcode_england_wales.json")
+REGISTRY_FILE = os.path.join(ROOT, "uk_postcode_england_wales.registry")
+
+# Mapping postcode areas to countries (partial list for non-England areas)
+postcode_area_to_country = {
+    "BT": "Northern Ireland",
+    "AB": "Scotland", "DD": "Scotland", "DG": "Scotland", "EH": "Scotland",
+    "FK": "Scotland", "G": "Scotland", "HS": "Scotland", "IV": "Scotland",
+    "KA": "Scotland", "KW": "Scotland", "KY": "Scotland", "ML": "Scotland",
+    "PA": "Scotland", "PH": "Scotland", "TD": "Scotland", "ZE": "Scotland",
+    "CF": "Wales", "CH": "Wales", "LL": "Wales", "LD": "Wales",
+    "NP": "Wales", "SA": "Wales", "SY": "Wales"
+}
+
+
+def postcode_area(postcode):
+    area = ''
+    for c in postcode:
+        if not c.isalpha():
+            break
+        area += c
+    return area
+
+
+def get_country(postcode):
+    area = ''.join([c for c in postcode if not c.isdigit()])
+    return postcode_area_to_country.get(area, "England")
+
+
+Outcode = namedtuple("Outcode", ["postcode", "post_town", "country", "id", "area", "id_type"])
+
+# Binary layout, built once from the reference JSON and then mmapped:
+#
+#   header     MAGIC, then the element count of every section below
+#   strings    offsets (uint32, n_strings + 1) + one UTF-8 blob; every text value is stored once
+#   columns    postcode, post_town, country, area, id_type (string numbers) and id (uint32, 0 = none),
+#              one entry per record; id_type is the Rightmove location type, OUTCODE unless the
+#              ID came from a REGION fallback
+#   towns      town_starts (uint32, n_towns + 1) into town_records: record numbers grouped by post town
+#   hashes     three open-addressing tables (outcode -> record, id -> record, town -> town group)
+#
+# Hash slots hold index + 1 so that 0 marks an empty slot. Sections are read
+# through memoryview casts, so opening the file copies nothing and a lookup
+# is a CRC32 plus a probe or two.
+MAGIC = b"DSOUTC02"
+HEADER = struct.Struct("<8s8I")
+
+
+def _hash(text):
+    return zlib.crc32(text.encode("utf-8"))
+
+
+def _table_size(n):
+    size = 8
+    while size < 2 * n:
+        size *= 2
+    return size
+
+
+def _hash_table(keys):
+    """keys: [(text, value)]; the first value for a repeated key wins."""
+    table = array("I", bytes(4 * _table_size(len(keys))))
+    mask = len(table) - 1
+    seen = set()
+    for text, value in keys:
+        if text in seen:
+            continue
+        seen.add(text)
+        slot = _hash(text) & mask
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = value + 1
+    return table
+
+
+def build(source=REFERENCE_FILE, path=REGISTRY_FILE):
+    """Compile the reference JSON into the registry file at `path` (written atomically)."""
+    import json
+    with open(source, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+
+    strings, string_ids = [], {}
+
+    def intern(text):
+        if text not in string_ids:
+            string_ids[text] = len(strings)
+            strings.append(text)
+        return string_ids[text]
+
+    columns = {name: array("I") for name in ("postcode", "post_town", "country", "area", "id_type", "id")}
+    towns = {}
+    for i, entry in enumerate(entries):
+        postcode = (entry.get("postcode") or "").upper()
+        town = entry.get("postTown") or ""
+        columns["postcode"].append(intern(postcode))
+        columns["post_town"].append(intern(town))
+        columns["country"].append(intern(entry.get("country") or get_country(postcode)))
+        columns["area"].append(intern(postcode_area(postcode)))
+        columns["id_type"].append(intern(entry.get("idType") or "OUTCODE"))
+        columns["id"].append(int(entry["id"]) if entry.get("id") else 0)
+        towns.setdefault(town.upper(), []).append(i)
+
+    offsets, blob = array("I", [0]), bytearray()
+    for text in strings:
+        blob += text.encode("utf-8")
+        offsets.append(len(blob))
+    blob += bytes(-len(blob) % 4)
+
+    town_names = list(towns)
+    town_starts, town_records = array("I", [0]), array("I")
+    for name in town_names:
+        town_records.extend(towns[name])
+        town_starts.append(len(town_records))
+
+    by_outcode = _hash_table([(strings[p], i) for i, p in enumerate(columns["postcode"])])
+    by_id = _hash_table([(str(v), i) for i, v in enumerate(columns["id"]) if v])
+    by_town = _hash_table([(name, g) for g, name in enumerate(town_names)])
+
+    header = HEADER.pack(MAGIC, len(entries), len(strings), len(blob), len(town_names),
+                         len(town_records), len(by_outcode), len(by_id), len(by_town))
+    sections = [offsets, blob] + [columns[name] for name in ("postcode", "post_town", "country", "area", "id_type", "id")]
+    sections += [town_starts, town_records, by_outcode, by_id, by_town]
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        for section in sections:
+            f.write(section if isinstance(section, (bytes, bytearray)) else section.tobytes())
+    os.replace(tmp, path)
+    return len(entries)
+
+
+class OutcodeRegistry:
+    """Read-only outcode reference table over an mmapped registry file.
+
+    registry["BR1"], registry.by_id("1234") and registry.by_post_town("BROMLEY")
+    are hash lookups; iterating yields every reference entry in file order.
+    """
+
+    def __init__(self, path=REGISTRY_FILE):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, *counts = HEADER.unpack_from(view)
+        if magic != MAGIC or sys.byteorder != "little":
+            raise ValueError(f"{path} is not a registry file for this machine; rebuild it")
+        n, n_strings, blob_size, n_towns, n_town_records, n_outcode, n_id, n_town = counts
+
+        position = HEADER.size
+
+        def take(count, fmt="I"):
+            nonlocal position
+            size = count * (4 if fmt == "I" else 1)
+            section = view[position:position + size]
+            position += size
+            return section.cast(fmt) if fmt == "I" else section
+
+        self._offsets = take(n_strings + 1)
+        self._blob = take(blob_size, "B")
+        self._postcode, self._post_town, self._country, self._area, self._id_type, self._id = (take(n) for _ in range(6))
+        self._town_starts, self._town_records = take(n_towns + 1), take(n_town_records)
+        self._by_outcode, self._by_id, self._by_town = take(n_outcode), take(n_id), take(n_town)
+        self._strings = {}
+
+    @classmethod
+    def open(cls, path=REGISTRY_FILE, source=REFERENCE_FILE):
+        """Open `path`, (re)building it first when it is missing, older than `source` or from an older layout."""
+        if os.path.exists(source) and (not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source)):
+            build(source, path)
+        try:
+            return cls(path)
+        except ValueError:
+            if not os.path.exists(source):
+                raise
+            build(source, path)
+            return cls(path)
+
+    def _string(self, number):
+        text = self._strings.get(number)
+        if text is None:
+            text = bytes(self._blob[self._offsets[number]:self._offsets[number + 1]]).decode("utf-8")
+            self._strings[number] = text
+        return text
+
+    def _probe(self, table, key, matches):
+        mask = len(table) - 1
+        slot = _hash(key) & mask
+        while True:
+            value = table[slot]
+            if not value:
+                return None
+            if matches(value - 1):
+                return value - 1
+            slot = (slot + 1) & mask
+
+    def record(self, i):
+        return Outcode(
+            self._string(self._postcode[i]),
+            self._string(self._post_town[i]),
+            self._string(self._country[i]),
+            str(self._id[i]) if self._id[i] else None,
+            self._string(self._area[i]),
+            self._string(self._id_type[i]),
+        )
+
+    def __len__(self):
+        return len(self._postcode)
+
+    def __iter__(self):
+        return (self.record(i) for i in range(len(self)))
+
+    def index(self, outcode):
+        key = outcode.upper()
+        return self._probe(self._by_outcode, key, lambda i: self._string(self._postcode[i]) == key)
+
+    def get(self, outcode, default=None):
+        i = self.index(outcode)
+        return default if i is None else self.record(i)
+
+    def __getitem__(self, outcode):
+        i = self.index(outcode)
+        if i is None:
+            raise KeyError(outcode)
+        return self.record(i)
+
+    def __contains__(self, outcode):
+        return self.index(outcode) is not None
+
+    def by_id(self, rightmove_id):
+        key = str(rightmove_id)
+        i = self._probe(self._by_id, key, lambda i: str(self._id[i]) == key)
+        return None if i is None else self.record(i)
+
+    def by_post_town(self, town):
+        key = town.upper()
+        group = self._probe(self._by_town, key,
+                            lambda g: self._string(self._post_town[self._town_records[self._town_starts[g]]]).upper() == key)
+        if group is None:
+            return []
+        return [self.record(i) for i in self._town_records[self._town_starts[group]:self._town_starts[group + 1]]]
+
+    def outcodes(self):
+        """Every distinct outcode, upper case."""
+        return {self._string(p) for p in self._postcode} - {""}
+
+    def close(self):
+        for section in (self._offsets, self._blob, self._postcode, self._post_town, self._country, self._area,
+                        self._id_type, self._id, self._town_starts, self._town_records, self._by_outcode, self._by_id, self._by_town):
+            section.release()
+        self._mmap.close()
+
+
+_default_registry = None
+
+
+def default_registry():
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = OutcodeRegistry.open()
+    return _default_registry
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the outcode registry or look entries up in it.")
+    parser.add_argument("keys", nargs="*", help="outcodes to look up")
+    parser.add_argument("--id", action="store_true", help="look keys up by Rightmove id")
+    parser.add_argument("--town", action="store_true", help="look keys up by post town")
+    parser.add_argument("--source", default=REFERENCE_FILE)
+    parser.add_argument("--registry", default=REGISTRY_FILE)
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    if args.rebuild or not args.keys:
+        count = build(args.source, args.registry)
+        print(f"✅ {count} outcodes written to {args.registry}")
+    registry = OutcodeRegistry.open(args.registry, args.source)
+    for key in args.keys:
+        if args.town:
+            print(key, registry.by_post_town(key))
+        else:
+            print(key, registry.by_id(key) if args.id else registry.get(key))
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import METRICS
+
+# CPU-bound page parsing off the event loop. Fetch tasks hand raw pages to a
+# bounded queue; one dispatcher per worker process feeds them to a
+# ProcessPoolExecutor. A full queue blocks the fetchers (backpressure), and
+# parsed results come back to the calling process, which keeps sole
+# ownership of the result sink.
+
+
+def _timed(fn, args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class ParsePool:
+    """Async front end to a pool of parse processes; use as `async with ParsePool(...) as pool`.
+
+    By default every core but one parses, leaving one for the event loop;
+    `workers=0` (and a single-core machine) parses inline on the event loop.
+    """
+
+    def __init__(self, source, workers=None, queue_size=None, metrics=METRICS):
+        self.source = source
+        self.workers = (os.cpu_count() or 1) - 1 if workers is None else workers
+        self.queue = asyncio.Queue(maxsize=queue_size or max(1, self.workers) * 2)
+        self.metrics = metrics
+        self.executor = None
+        self.dispatchers = []
+
+    async def __aenter__(self):
+        if self.workers:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            self.dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        return self
+
+    async def __aexit__(self, *exc):
+        for task in self.dispatchers:
+            task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            future, fn, args = await self.queue.get()
+            try:
+                if future.cancelled():
+                    continue
+                try:
+                    result, seconds = await loop.run_in_executor(self.executor, _timed, fn, args)
+                except Exception as e:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                else:
+                    self.metrics.observe(self.source, "parse", seconds)
+                    if not future.cancelled():
+                        future.set_result(result)
+            finally:
+                self.queue.task_done()
+
+    async def parse(self, fn, *args):
+        """Run `fn(*args)` in a worker process; waits for a queue slot first when the workers are behind."""
+        if not self.workers:
+            with self.metrics.time(self.source, "parse"):
+                return fn(*args)
+        future = asyncio.get_running_loop().create_future()
+        with self.metrics.time(self.source, "parse_queue_wait"):
+            await self.queue.put((future, fn, args))
+        return await future
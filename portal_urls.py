@@ -0,0 +1,148 @@
+import argparse
+import itertools
+import sys
+
+from outcode_registry import default_registry
+
+# Search URLs for every reference outcode, produced lazily from per-portal
+# templates. Nothing is materialised: urls() is a generator, so it can feed a
+# job queue or an asyncio queue directly, and the txt files are only one
+# possible sink.
+
+
+class Portal:
+    """One search-URL template.
+
+    `template` is formatted with the registry entry fields (postcode, id,
+    id_type, post_town, area, country) plus `slug`, the lower-case outcode. Pages after
+    the first append `paging`, formatted with `number` (1-based page) and
+    `index` (first result offset, page * page_size).
+    """
+
+    def __init__(self, name, template, paging="", page_size=1, requires_id=False):
+        self.name = name
+        self.template = template
+        self.paging = paging
+        self.page_size = page_size
+        self.requires_id = requires_id
+
+    def accepts(self, entry):
+        return bool(entry.postcode) and (entry.id is not None or not self.requires_id)
+
+    def url(self, entry, page=0):
+        url = self.template.format(slug=entry.postcode.lower(), **entry._asdict())
+        if page:
+            url += self.paging.format(number=page + 1, index=page * self.page_size)
+        return url
+
+
+PORTALS = {}
+
+
+def register(portal):
+    PORTALS[portal.name] = portal
+    return portal
+
+
+register(Portal(
+    "rightmove_sale",
+    "https://www.rightmove.co.uk/property-for-sale/find.html?searchLocation={postcode}&useLocationIdentifier=true&locationIdentifier={id_type}%5E{id}&radius=0.0&_includeSSTC=on",
+    paging="&index={index}", page_size=24, requires_id=True,
+))
+register(Portal(
+    "rightmove_rent",
+    "https://www.rightmove.co.uk/property-to-rent/find.html?searchLocation={postcode}&useLocationIdentifier=true&locationIdentifier={id_type}%5E{id}&radius=0.0",
+    paging="&index={index}", page_size=24, requires_id=True,
+))
+register(Portal(
+    "zoopla_sale",
+    "https://www.zoopla.co.uk/for-sale/property/{postcode}/?q={postcode}&search_source=home",
+    paging="&pn={number}",
+))
+register(Portal(
+    "zoopla_rent",
+    "https://www.zoopla.co.uk/to-rent/property/{postcode}/?q={postcode}&search_source=home",
+    paging="&pn={number}",
+))
+register(Portal(
+    "openrent",
+    "https://www.openrent.co.uk/properties-to-rent/{slug}?term={postcode}",
+    paging="&page={number}",
+))
+
+
+def _upper_set(values):
+    return {v.upper() for v in values} if values else None
+
+
+def entries(countries=None, post_towns=None, areas=None, registry=None):
+    """Registry entries matching every given filter, in reference file order."""
+    registry = default_registry() if registry is None else registry
+    countries, areas = _upper_set(countries), _upper_set(areas)
+    if post_towns:
+        # Post town lookups go through the registry's town index instead of a full scan
+        candidates = (entry for town in dict.fromkeys(post_towns) for entry in registry.by_post_town(town))
+    else:
+        candidates = iter(registry)
+    for entry in candidates:
+        if countries and entry.country.upper() not in countries:
+            continue
+        if areas and entry.area.upper() not in areas:
+            continue
+        yield entry
+
+
+def urls(portal, pages=1, countries=None, post_towns=None, areas=None, registry=None):
+    """Yield search URLs for `portal` (a name or a Portal), `pages` per outcode."""
+    portal = PORTALS[portal] if isinstance(portal, str) else portal
+    for entry in entries(countries, post_towns, areas, registry):
+        if portal.accepts(entry):
+            for page in range(pages):
+                yield portal.url(entry, page)
+
+
+def feed(queue, source, items, batch_size=500):
+    """Stream `items` into a JobQueue in batches; returns how many were new."""
+    added = 0
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, batch_size))
+        if not batch:
+            return added
+        added += queue.enqueue(source, batch)
+
+
+def write_urls(path, items):
+    """Write one URL per line; returns how many were written."""
+    count = 0
+    with open(path, "w") as f:
+        for url in items:
+            f.write(url + "\n")
+            count += 1
+    return count
+
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Generate portal search URLs for reference outcodes.")
+    parser.add_argument("portal", choices=sorted(PORTALS))
+    parser.add_argument("--pages", type=int, default=1, help="result pages per outcode")
+    parser.add_argument("--country", action="append", help="repeatable, e.g. --country Wales")
+    parser.add_argument("--post-town", action="append")
+    parser.add_argument("--area", action="append", help="postcode area, e.g. BR")
+    parser.add_argument("--out", help="write to this file instead of stdout")
+    parser.add_argument("--enqueue", metavar="SOURCE", help="add the URLs to the job queue under SOURCE")
+    args = parser.parse_args(argv)
+
+    generated = urls(args.portal, args.pages, args.country, args.post_town, args.area)
+    if args.enqueue:
+        from job_queue import JobQueue
+        print(f"✅ {feed(JobQueue(), args.enqueue, generated)} URLs queued under {args.enqueue}")
+    elif args.out:
+        print(f"✅ {write_urls(args.out, generated)} URLs written to {args.out}")
+    else:
+        for url in generated:
+            sys.stdout.write(url + "\n")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,127 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+
+from job_queue import JOBS_DB
+
+DAY = 24 * 60 * 60
+
+# Per (source, outcode) freshness state, kept next to the job queue:
+# when it was last fetched, a hash of the parsed result, and how often the
+# result (and its headline metric) changed. Refreshes go to the stalest, most
+# volatile outcodes first, and unchanged results skip downstream writes.
+
+
+def content_hash(result):
+    return hashlib.sha256(json.dumps(result, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class RefreshState:
+    def __init__(self, path=JOBS_DB):
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS refresh_state ("
+            " source TEXT NOT NULL, outcode TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL, content_hash TEXT NOT NULL,"
+            " fetches INTEGER NOT NULL DEFAULT 1,"
+            " changes INTEGER NOT NULL DEFAULT 0,"
+            " metric REAL, metric_changes INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (source, outcode))"
+        )
+        self.pending = {}
+
+    def check(self, source, outcode, result, metric=None):
+        """True when `result` differs from the last stored fetch and should be written.
+
+        The new hash is held back until commit(), so a result that never got
+        written is not taken as seen.
+        """
+        digest = content_hash(result)
+        row = self.db.execute(
+            "SELECT content_hash, metric FROM refresh_state WHERE source = ? AND outcode = ?", (source, outcode)
+        ).fetchone()
+        changed = row is None or row[0] != digest
+        metric_changed = row is not None and metric is not None and row[1] is not None and metric != row[1]
+        self.pending[(source, outcode)] = (row is None, digest, metric, changed, metric_changed)
+        return changed
+
+    def commit(self, source, outcode):
+        """Store the fetch checked by check() once its result has been written."""
+        if (source, outcode) not in self.pending:
+            return
+        new, digest, metric, changed, metric_changed = self.pending.pop((source, outcode))
+        now = time.time()
+        if new:
+            self.db.execute(
+                "INSERT OR REPLACE INTO refresh_state (source, outcode, fetched_at, content_hash, metric)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (source, outcode, now, digest, metric),
+            )
+            return
+        self.db.execute(
+            "UPDATE refresh_state SET fetched_at = ?, content_hash = ?, fetches = fetches + 1,"
+            " changes = changes + ?, metric = ?, metric_changes = metric_changes + ?"
+            " WHERE source = ? AND outcode = ?",
+            (now, digest, int(changed), metric, int(metric_changed), source, outcode),
+        )
+
+    def record(self, source, outcode, result, metric=None):
+        """check() and commit() in one step, for callers with nothing to write in between."""
+        changed = self.check(source, outcode, result, metric)
+        self.commit(source, outcode)
+        return changed
+
+    def touch(self, source, outcode):
+        """Record a fetch that found the content unchanged without parsing it (see change_detection)."""
+        self.db.execute(
+            "UPDATE refresh_state SET fetched_at = ?, fetches = fetches + 1 WHERE source = ? AND outcode = ?",
+            (time.time(), source, outcode),
+        )
+
+    def due(self, source, outcodes, max_age, limit=None):
+        """Outcodes older than `max_age` seconds (or never recorded), most urgent first.
+
+        Urgency is age relative to `max_age` scaled by a smoothed change rate,
+        so outcodes whose headline metric keeps moving are refreshed before
+        ones that never change.
+        """
+        now = time.time()
+        state = {
+            row[0]: row[1:]
+            for row in self.db.execute(
+                "SELECT outcode, fetched_at, fetches, changes, metric_changes FROM refresh_state WHERE source = ?",
+                (source,),
+            )
+        }
+        ranked = []
+        for outcode in outcodes:
+            if outcode not in state:
+                ranked.append((float("inf"), outcode))
+                continue
+            fetched_at, fetches, changes, metric_changes = state[outcode]
+            age = now - fetched_at
+            if age < max_age:
+                continue
+            volatility = (metric_changes + 0.5 * changes + 1) / (fetches + 2)
+            ranked.append((age / max(max_age, 1) * volatility, outcode))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        return [outcode for _, outcode in ranked[:limit]]
+
+    def close(self):
+        self.db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List outcodes due for a refresh.")
+    parser.add_argument("source")
+    parser.add_argument("--max-age-days", type=float, default=7)
+    parser.add_argument("--limit", type=int)
+    args = parser.parse_args()
+
+    state = RefreshState()
+    outcodes = [row[0] for row in state.db.execute("SELECT outcode FROM refresh_state WHERE source = ?", (args.source,))]
+    for outcode in state.due(args.source, outcodes, args.max_age_days * DAY, args.limit):
+        print(outcode)
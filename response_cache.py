@@ -0,0 +1,116 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import time
+from urllib.parse import urlsplit
+
+CACHE_DIR = os.environ.get("DEALSOURCR_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".http_cache"))
+MAX_CACHE_BYTES = int(os.environ.get("DEALSOURCR_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+REPLAY_ONLY = os.environ.get("DEALSOURCR_REPLAY", "") not in ("", "0")
+
+DAY = 24 * 60 * 60
+# Seconds a cached page stays fresh, per source. Sources not listed use DEFAULT_TTL.
+SOURCE_TTLS = {
+    "home_co_uk_sale": DAY,
+    "home_co_uk_rental": DAY,
+    "openrent": 6 * 60 * 60,
+    "wikipedia": 30 * DAY,
+}
+DEFAULT_TTL = DAY
+
+
+class CacheMiss(LookupError):
+    pass
+
+
+def cache_key(url, render=False):
+    return hashlib.sha256(f"{'render' if render else 'raw'}|{url}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """On-disk cache of response bodies keyed by target URL and render mode.
+
+    Bodies are gzip files named by the key's hash; a small SQLite index holds
+    fetch time (for TTLs) and last access time (for LRU eviction once the
+    total size passes `max_bytes`). With `replay_only` set, stale entries are
+    still served and a miss raises CacheMiss instead of allowing a fetch.
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttls=None, max_bytes=MAX_CACHE_BYTES, replay_only=REPLAY_ONLY):
+        self.directory = directory
+        self.ttls = dict(SOURCE_TTLS, **(ttls or {}))
+        self.max_bytes = max_bytes
+        self.replay_only = replay_only
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, "index.sqlite"), timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, url TEXT, render INTEGER, source TEXT,"
+            " size INTEGER, fetched_at REAL, accessed_at REAL)"
+        )
+        self.db.commit()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".html.gz")
+
+    def get(self, url, render=False, source=None):
+        key = cache_key(url, render)
+        row = self.db.execute("SELECT source, fetched_at FROM entries WHERE key = ?", (key,)).fetchone()
+        path = self._path(key)
+        if row is None or not os.path.exists(path):
+            if self.replay_only:
+                raise CacheMiss(url)
+            return None
+        ttl = self.ttls.get(source or row[0], DEFAULT_TTL)
+        if not self.replay_only and time.time() - row[1] > ttl:
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            body = f.read()
+        self.db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+        return body
+
+    def put(self, url, body, render=False, source=None):
+        key = cache_key(url, render)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(tmp, path)
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, url, int(render), source or urlsplit(url).netloc, os.path.getsize(path), now, now),
+        )
+        self.db.commit()
+        self.evict()
+
+    def discard(self, url, render=False):
+        key = cache_key(url, render)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self.db.commit()
+
+    def evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
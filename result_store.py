@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import re
+import threading
+from datetime import date, datetime
+
+# Append-only JSONL result sink. Every record is written and fsynced as soon as
+# it arrives, so a crash loses at most the record being written. A sidecar
+# `<path>.keys` file holds one key per line, letting a resumed run find what is
+# already done without reading the records themselves. `compact` exports the
+# legacy pretty-printed JSON list (last record per key wins).
+
+
+def _repair_tail(path):
+    """Cut off a partially written last line left behind by a crash."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        pos = size
+        while pos > 0:
+            step = min(4096, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                f.truncate(pos + newline + 1)
+                return
+        f.truncate(0)
+
+
+def read_records(path):
+    """Records from a legacy pretty JSON list or a JSONL result file."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)
+
+
+# Sources that write a new timestamped file per run. Other outputs (the sale
+# postcodes_data_*.json) are rewritten in place, so the timestamp in their
+# name is only when the file was first created.
+PER_RUN_SOURCES = {"home_co_uk_rental"}
+
+
+def file_snapshot_date(path, source):
+    """Date of the snapshot held in `path`: the run timestamp in a per-run file name, else the file's last write."""
+    # Per-run outputs carry their run time, e.g. home_co_uk_rental_20250527_080028.json
+    match = re.search(r"(\d{8})_\d{6}", os.path.basename(path)) if source in PER_RUN_SOURCES else None
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d").date()
+    return date.fromtimestamp(os.path.getmtime(path))
+
+
+class ResultSink:
+    def __init__(self, path, key_field, fsync=True):
+        self.path = path
+        self.index_path = path + ".keys"
+        self.key_field = key_field
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        _repair_tail(self.path)
+        _repair_tail(self.index_path)
+        if os.path.exists(self.path) and not os.path.exists(self.index_path):
+            self._rebuild_index()
+        self.data = open(self.path, "a", encoding="utf-8")
+        self.index = open(self.index_path, "a", encoding="utf-8")
+
+    def _rebuild_index(self):
+        with open(self.index_path, "w", encoding="utf-8") as index:
+            for record in self.records(dedupe=False):
+                index.write(str(record[self.key_field]) + "\n")
+
+    def keys(self):
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            return {line.rstrip("\n") for line in f if line.strip()}
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.data.write(line)
+            self.data.flush()
+            if self.fsync:
+                os.fsync(self.data.fileno())
+            # The key only goes into the index once its record is on disk
+            self.index.write(str(record[self.key_field]) + "\n")
+            self.index.flush()
+
+    def records(self, dedupe=True):
+        """Stream records back from disk; with `dedupe` only the last record for each key is yielded."""
+        if dedupe:
+            last = {}
+            with open(self.path, "r", encoding="utf-8") as f:
+                offset = 0
+                for line in f:
+                    last[json.loads(line)[self.key_field]] = offset
+                    offset += 1
+        with open(self.path, "r", encoding="utf-8") as f:
+            for n, line in enumerate(f):
+                record = json.loads(line)
+                if not dedupe or last[record[self.key_field]] == n:
+                    yield record
+
+    def import_legacy(self, json_path):
+        """Seed the sink from a legacy pretty JSON list, e.g. when switching an existing dataset over."""
+        with open(json_path, "r", encoding="utf-8") as f:
+            for record in json.load(f):
+                self.write(record)
+
+    def compact(self, json_path):
+        """Write the legacy `json.dump(..., indent=2)` list format without holding every record in memory."""
+        tmp = json_path + ".tmp"
+        count = 0
+        with open(tmp, "w", encoding="utf-8") as out:
+            out.write("[")
+            for record in self.records():
+                body = json.dumps(record, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+                out.write(("," if count else "") + "\n  " + body)
+                count += 1
+            out.write("\n]" if count else "]")
+        os.replace(tmp, json_path)
+        return count
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a JSONL result file to the legacy pretty JSON format.")
+    parser.add_argument("jsonl")
+    parser.add_argument("json_out")
+    parser.add_argument("--key", default="location", help="record field that identifies a result")
+    args = parser.parse_args()
+    sink = ResultSink(args.jsonl, args.key)
+    count = sink.compact(args.json_out)
+    sink.close()
+    print(f"✅ {count} records written to {args.json_out}")
@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import difflib
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import namedtuple
+
+from fetch_engine import FetchError
+from job_queue import JOBS_DB
+from metrics import METRICS
+from refresh_scheduler import DAY
+
+TYPEAHEAD_URL = "https://los.rightmove.co.uk/typeahead"
+TYPEAHEAD_SOURCE = "rightmove_typeahead"
+# Misses are asked again after this long; found IDs are kept until POSITIVE_TTL (0 = forever)
+NEGATIVE_TTL = float(os.environ.get("RIGHTMOVE_ID_NEGATIVE_TTL_DAYS", "30")) * DAY
+POSITIVE_TTL = float(os.environ.get("RIGHTMOVE_ID_POSITIVE_TTL_DAYS", "0")) * DAY
+FUZZY_CUTOFF = 0.85
+OUTCODE_PATTERN = re.compile(r"^[A-Z]{1,2}[0-9][A-Z0-9]?$")
+
+# Outcode -> Rightmove location ID, cached in the job database. Every
+# typeahead response is harvested: each outcode-level match it lists is
+# stored, so resolving "CF1" also answers CF10, CF11, ... without more
+# requests. Names that are not outcodes (KESTON, DINAS POWYS) fall back to
+# the closest REGION match by name.
+
+Match = namedtuple("Match", ["id", "type", "display_name"])
+
+
+def normalise(name):
+    return " ".join(re.sub(r"[^A-Z0-9]+", " ", name.upper()).split())
+
+
+def is_outcode(name):
+    return bool(OUTCODE_PATTERN.match(name.upper()))
+
+
+def parse_matches(body):
+    return [
+        Match(str(item["id"]), item.get("type", ""), item.get("displayName", ""))
+        for item in json.loads(body).get("matches", [])
+        if item.get("id")
+    ]
+
+
+def exact_match(matches, name):
+    key = name.upper()
+    for match in matches:
+        if match.display_name.upper() == key:
+            return match
+    return None
+
+
+def fuzzy_match(matches, name):
+    """Closest match on the first part of the display name ("Keston, Bromley, London" -> "KESTON")."""
+    wanted = normalise(name)
+    best, best_score = None, FUZZY_CUTOFF
+    for match in matches:
+        if match.type == "OUTCODE":
+            continue
+        candidate = normalise(match.display_name.split(",")[0])
+        score = 1.0 if candidate == wanted else difflib.SequenceMatcher(None, wanted, candidate).ratio()
+        if score > best_score or (score == best_score and best is None):
+            best, best_score = match, score
+    return best
+
+
+class IdCache:
+    """Persistent name -> Match store; a row with a NULL id is a remembered miss."""
+
+    def __init__(self, path=JOBS_DB, negative_ttl=NEGATIVE_TTL, positive_ttl=POSITIVE_TTL):
+        self.negative_ttl = negative_ttl
+        self.positive_ttl = positive_ttl
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS rightmove_ids ("
+            " name TEXT PRIMARY KEY, id TEXT, type TEXT, display_name TEXT, resolved_at REAL NOT NULL)"
+        )
+
+    def lookup(self, name):
+        """(hit, match): hit is False when the name must be asked for; match is None for a cached miss."""
+        row = self.db.execute(
+            "SELECT id, type, display_name, resolved_at FROM rightmove_ids WHERE name = ?", (name.upper(),)
+        ).fetchone()
+        if row is None:
+            return False, None
+        id_, type_, display_name, resolved_at = row
+        ttl = self.positive_ttl if id_ else self.negative_ttl
+        if ttl and time.time() - resolved_at > ttl:
+            return False, None
+        return True, Match(id_, type_, display_name) if id_ else None
+
+    def store(self, name, match):
+        self.db.execute(
+            "INSERT OR REPLACE INTO rightmove_ids (name, id, type, display_name, resolved_at) VALUES (?, ?, ?, ?, ?)",
+            (name.upper(), match.id if match else None, match.type if match else None,
+             match.display_name if match else None, time.time()),
+        )
+
+    def harvest(self, matches):
+        """Store every outcode-level match; returns how many were new or changed."""
+        stored = 0
+        self.db.execute("BEGIN IMMEDIATE")
+        for match in matches:
+            if match.type == "OUTCODE" and is_outcode(match.display_name):
+                hit, known = self.lookup(match.display_name)
+                if not (hit and known == match):
+                    self.store(match.display_name, match)
+                    stored += 1
+        self.db.execute("COMMIT")
+        return stored
+
+    def names(self, found=True):
+        clause = "id IS NOT NULL" if found else "id IS NULL"
+        return [row[0] for row in self.db.execute(f"SELECT name FROM rightmove_ids WHERE {clause} ORDER BY name")]
+
+    def close(self):
+        self.db.close()
+
+
+class RightmoveIdResolver:
+    """Resolves names to Rightmove location IDs through the cache, asking the typeahead only for misses.
+
+    Concurrent requests for the same name share one fetch.
+    """
+
+    def __init__(self, engine, cache=None, url=TYPEAHEAD_URL, fuzzy=True):
+        self.engine = engine
+        self.cache = cache or IdCache()
+        self.url = url
+        self.fuzzy = fuzzy
+        self.pending = {}
+
+    async def resolve(self, name):
+        hit, match = self.cache.lookup(name)
+        if hit:
+            METRICS.inc("cache_hits_total", source=TYPEAHEAD_SOURCE)
+            return match
+        key = name.upper()
+        if key not in self.pending:
+            self.pending[key] = asyncio.ensure_future(self._fetch(name))
+        try:
+            return await asyncio.shield(self.pending[key])
+        finally:
+            if self.pending.get(key) is not None and self.pending[key].done():
+                del self.pending[key]
+
+    async def _fetch(self, name):
+        params = {"query": name, "limit": "10", "exclude": "STREET"}
+        body = await self.engine.get(self.url, params=params, label=name, source=TYPEAHEAD_SOURCE)
+        with METRICS.time(TYPEAHEAD_SOURCE, "parse"):
+            matches = parse_matches(body)
+        match = exact_match(matches, name)
+        if match is None and self.fuzzy and not is_outcode(name):
+            match = fuzzy_match(matches, name)
+        self.cache.harvest(matches)
+        self.cache.store(name, match)
+        return match
+
+    async def resolve_many(self, names):
+        """{name: Match or None}. Shortest names go first, so their responses can answer longer ones from the cache."""
+        results = {}
+        misses = []
+        for name in dict.fromkeys(names):
+            hit, match = self.cache.lookup(name)
+            if hit:
+                results[name] = match
+            else:
+                misses.append(name)
+        misses.sort(key=lambda n: (len(n), n))
+        # One wave per name length: a wave's responses often cover the next wave's names
+        for length in sorted({len(n) for n in misses}):
+            wave = [n for n in misses if len(n) == length]
+            answers = await asyncio.gather(*(self._resolve_or_none(n) for n in wave))
+            results.update(zip(wave, answers))
+        return results
+
+    async def _resolve_or_none(self, name):
+        try:
+            return await self.resolve(name)
+        except (FetchError, ValueError) as e:
+            print(f"[{name}] Error: {e}")
+            return None
+
+
+if __name__ == "__main__":
+    from fetch_engine import FetchEngine, HostLimits
+    from http_client import USER_AGENT
+
+    parser = argparse.ArgumentParser(description="Resolve outcodes or place names to Rightmove location IDs.")
+    parser.add_argument("names", nargs="*")
+    parser.add_argument("--file", help="one name per line, e.g. failed_postcodes.txt")
+    parser.add_argument("--misses", action="store_true", help="list cached misses and exit")
+    args = parser.parse_args()
+
+    cache = IdCache()
+    if args.misses:
+        print("\n".join(cache.names(found=False)))
+    else:
+        names = list(args.names)
+        if args.file:
+            with open(args.file) as f:
+                names += [line.strip() for line in f if line.strip()]
+
+        async def main():
+            limits = HostLimits(concurrency=4, rate=4, burst=4)
+            async with FetchEngine(limits, headers={"User-Agent": USER_AGENT}) as engine:
+                return await RightmoveIdResolver(engine, cache).resolve_many(names)
+
+        for name, match in asyncio.run(main()).items():
+            print(f"{name}: {match.type + '^' + match.id if match else 'not found'}")
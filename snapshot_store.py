@@ -0,0 +1,217 @@
+import argparse
+import os
+import sqlite3
+from datetime import date
+
+HISTORY_DB = os.environ.get(
+    "DEALSOURCR_HISTORY_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "market_history.sqlite")
+)
+
+# Market stats history, one delta per changed value:
+#
+#   runs     (source, date)                            every date a source recorded anything
+#   deltas   (source, outcode, metric, date) -> value  the value from that date on; NULL = gone
+#
+# A scraped record is flattened into numeric metrics such as
+# "summary.median_rent_pcm" or "rents_by_bedroom[Two bedrooms].median_rent_pcm",
+# and only metrics that differ from the outcode's previous state are stored.
+# The delta table is clustered on its key, so one outcode's history is a
+# single range scan and the view at any date is the last delta per metric.
+# Snapshots for an outcode must be recorded in date order.
+
+# Field that names each row of a nested list, tried in order
+LABEL_FIELDS = ("range_label", "bedroom_category", "property_type", "price_range", "bedrooms", "type")
+KEY_FIELDS = {"location", "postcode"}
+
+
+def _label(row):
+    for field in LABEL_FIELDS:
+        if field in row:
+            value = row[field]
+            return value.get("display") if isinstance(value, dict) else value
+    return None
+
+
+def flatten(record, prefix="", in_row=False):
+    """{metric: value} for every numeric value in a scraped record.
+
+    A list row's label field (e.g. a bedroom count) names the row and is not
+    recorded as a metric of its own.
+    """
+    metrics = {}
+    for key, value in record.items():
+        if (not prefix and key in KEY_FIELDS) or (in_row and key in LABEL_FIELDS):
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, bool) or value is None:
+            continue
+        if isinstance(value, (int, float)):
+            metrics[name] = value
+        elif isinstance(value, dict):
+            metrics.update(flatten(value, name + "."))
+        elif isinstance(value, list):
+            for i, row in enumerate(value):
+                if isinstance(row, dict):
+                    label = _label(row)
+                    metrics.update(flatten(row, f"{name}[{i if label is None else label}].", in_row=True))
+    return metrics
+
+
+def _day(when):
+    return when.isoformat()[:10] if isinstance(when, date) else str(when)[:10]
+
+
+class SnapshotStore:
+    def __init__(self, path=HISTORY_DB):
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " source TEXT NOT NULL, date TEXT NOT NULL, PRIMARY KEY (source, date)) WITHOUT ROWID"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS deltas ("
+            " source TEXT NOT NULL, outcode TEXT NOT NULL, metric TEXT NOT NULL, date TEXT NOT NULL,"
+            " value NUMERIC, PRIMARY KEY (source, outcode, metric, date)) WITHOUT ROWID"
+        )
+
+    def _state(self, source, outcode, before):
+        # SQLite takes the bare columns of a MAX() aggregate from the row holding the maximum
+        return {
+            metric: value
+            for metric, value, _ in self.db.execute(
+                "SELECT metric, value, MAX(date) FROM deltas WHERE source = ? AND outcode = ? AND date < ?"
+                " GROUP BY metric",
+                (source, outcode, before),
+            )
+            if value is not None
+        }
+
+    def latest(self, source, outcode):
+        """The last date `outcode` has history for, or None."""
+        return self.db.execute(
+            "SELECT MAX(date) FROM deltas WHERE source = ? AND outcode = ?", (source, outcode.upper())
+        ).fetchone()[0]
+
+    def record(self, source, outcode, record, when=None):
+        """Store `record` as `outcode`'s state on `when` (default today); returns how many metrics changed.
+
+        Recording the same date again replaces that date's deltas.
+        """
+        day = _day(when or date.today())
+        outcode = outcode.upper()
+        latest = self.latest(source, outcode)
+        if latest is not None and latest > day:
+            raise ValueError(f"{source}/{outcode} already has history after {day} (latest {latest})")
+
+        previous = self._state(source, outcode, day)
+        current = flatten(record)
+        changes = [(metric, value) for metric, value in current.items() if previous.get(metric) != value]
+        changes += [(metric, None) for metric in previous.keys() - current.keys()]
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            self.db.execute("INSERT OR IGNORE INTO runs (source, date) VALUES (?, ?)", (source, day))
+            self.db.execute("DELETE FROM deltas WHERE source = ? AND outcode = ? AND date = ?", (source, outcode, day))
+            self.db.executemany(
+                "INSERT INTO deltas (source, outcode, metric, date, value) VALUES (?, ?, ?, ?, ?)",
+                [(source, outcode, metric, day, value) for metric, value in changes],
+            )
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return len(changes)
+
+    def runs(self, source, last=None, since=None, until=None):
+        """Run dates for `source`, oldest first; `last` keeps only the most recent N."""
+        query, params = "SELECT date FROM runs WHERE source = ?", [source]
+        if since:
+            query, params = query + " AND date >= ?", params + [_day(since)]
+        if until:
+            query, params = query + " AND date <= ?", params + [_day(until)]
+        query += " ORDER BY date DESC"
+        if last:
+            query, params = query + " LIMIT ?", params + [int(last)]
+        return [row[0] for row in self.db.execute(query, params)][::-1]
+
+    def view(self, source, when=None, outcodes=None):
+        """{outcode: {metric: value}} as of `when` (default: latest)."""
+        query = "SELECT outcode, metric, value, MAX(date) FROM deltas WHERE source = ? AND date <= ?"
+        params = [source, _day(when) if when else "9999-12-31"]
+        if outcodes:
+            outcodes = [o.upper() for o in outcodes]
+            query += f" AND outcode IN ({','.join('?' * len(outcodes))})"
+            params += outcodes
+        result = {}
+        for outcode, metric, value, _ in self.db.execute(query + " GROUP BY outcode, metric", params):
+            if value is not None:
+                result.setdefault(outcode, {})[metric] = value
+        return result
+
+    def series(self, source, outcode, metric, last=None, since=None, until=None):
+        """[(run date, value)] for one outcode and metric: the last known value at each run, None before the first."""
+        dates = self.runs(source, last, since, until)
+        if not dates:
+            return []
+        rows = self.db.execute(
+            "SELECT date, value FROM deltas WHERE source = ? AND outcode = ? AND metric = ? AND date <= ?"
+            " ORDER BY date",
+            (source, outcode.upper(), metric, dates[-1]),
+        ).fetchall()
+        series, value, i = [], None, 0
+        for day in dates:
+            while i < len(rows) and rows[i][0] <= day:
+                value = rows[i][1]
+                i += 1
+            series.append((day, value))
+        return series
+
+    def metrics(self, source, outcode):
+        """Every metric name ever recorded for `outcode`."""
+        return [row[0] for row in self.db.execute(
+            "SELECT DISTINCT metric FROM deltas WHERE source = ? AND outcode = ? ORDER BY metric",
+            (source, outcode.upper()),
+        )]
+
+    def close(self):
+        self.db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record scraper snapshots as deltas or query their history.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="record legacy JSON/JSONL snapshot files, oldest first")
+    imp.add_argument("source", help="e.g. home_co_uk_sale or home_co_uk_rental")
+    imp.add_argument("files", nargs="+")
+    imp.add_argument("--date", help="YYYY-MM-DD; defaults to the run timestamp in a rental file's name, else the file's last write")
+    ser = sub.add_parser("series", help="one metric for one outcode across runs")
+    ser.add_argument("source")
+    ser.add_argument("outcode")
+    ser.add_argument("metric", help='e.g. "summary.median_rent_pcm"')
+    ser.add_argument("--last", type=int)
+    vw = sub.add_parser("view", help="every metric for outcodes as of a date")
+    vw.add_argument("source")
+    vw.add_argument("outcodes", nargs="*")
+    vw.add_argument("--date")
+    parser.add_argument("--db", default=HISTORY_DB)
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.db)
+    if args.command == "import":
+        from result_store import file_snapshot_date, read_records
+
+        dated = sorted((date.fromisoformat(args.date) if args.date else file_snapshot_date(p, args.source), p) for p in args.files)
+        for when, path in dated:
+            changed = 0
+            for record in read_records(path):
+                changed += store.record(args.source, record.get("location") or record["postcode"], record, when)
+            print(f"✅ {path} ({when}): {changed} values changed")
+    elif args.command == "series":
+        for day, value in store.series(args.source, args.outcode, args.metric, args.last):
+            print(day, value)
+    else:
+        for outcode, metrics in sorted(store.view(args.source, args.date, args.outcodes).items()):
+            print(outcode)
+            for metric, value in sorted(metrics.items()):
+                print(f"  {metric}: {value}")
+    store.close()
@@ -0,0 +1,128 @@
+import json
+import os
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+STATIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uk_stations.json")
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+EARTH_RADIUS_KM = 6371
+
+# Every station and subway entrance in Great Britain, fetched once and saved locally
+UK_STATIONS_QUERY = """
+[out:json][timeout:300];
+area["ISO3166-1"="GB"][admin_level=2]->.uk;
+(
+  node[railway=station](area.uk);
+  node[railway=subway_entrance](area.uk);
+  way[railway=station](area.uk);
+  relation[railway=station](area.uk);
+);
+out center;
+"""
+
+
+def import_stations(path=STATIONS_FILE):
+    """One-time download of UK station nodes from Overpass into `path`."""
+    from http_client import Client
+
+    with Client() as client:
+        response = client.post(OVERPASS_URL, data={'data': UK_STATIONS_QUERY}, timeout=600)
+    if response.status_code != 200:
+        raise ConnectionError("Overpass API request failed.")
+    stations = []
+    for element in response.json().get('elements', []):
+        if 'tags' in element and 'name' in element['tags']:
+            centre = element if element['type'] == 'node' else element['center']
+            stations.append({'name': element['tags']['name'], 'lat': centre['lat'], 'lon': centre['lon']})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(stations, f, ensure_ascii=False)
+    return stations
+
+
+def to_unit_vectors(lats, lons):
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_km(chord):
+    # Straight-line distance between unit vectors -> great-circle distance
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def km_to_chord(km):
+    return 2 * np.sin(np.asarray(km) / (2 * EARTH_RADIUS_KM))
+
+
+class StationIndex:
+    """Nearest-station lookups over a local station file.
+
+    Stations are stored as points on the unit sphere, where straight-line
+    order equals great-circle order. A KD-tree (scipy) answers whole batches
+    in one call; without scipy the same queries run as brute-force NumPy.
+    """
+
+    def __init__(self, names, lats, lons):
+        self.names = list(names)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.points = to_unit_vectors(self.lats, self.lons)
+        self.tree = cKDTree(self.points) if cKDTree is not None else None
+
+    @classmethod
+    def load(cls, path=STATIONS_FILE):
+        if not os.path.exists(path):
+            print(f"🚉 {path} not found, importing stations from Overpass...")
+            stations = import_stations(path)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                stations = json.load(f)
+        return cls([s['name'] for s in stations], [s['lat'] for s in stations], [s['lon'] for s in stations])
+
+    def __len__(self):
+        return len(self.names)
+
+    def nearest(self, lats, lons, k=1):
+        """k nearest stations for every coordinate: (distances_km, indices), both shaped (n, k)."""
+        queries = to_unit_vectors(np.atleast_1d(lats), np.atleast_1d(lons))
+        k = min(k, len(self))
+        if self.tree is not None:
+            chords, idx = self.tree.query(queries, k=k)
+            chords, idx = chords.reshape(len(queries), k), idx.reshape(len(queries), k)
+        else:
+            all_chords = np.linalg.norm(queries[:, None, :] - self.points[None, :, :], axis=2)
+            idx = np.argsort(all_chords, axis=1)[:, :k]
+            chords = np.take_along_axis(all_chords, idx, axis=1)
+        return chord_to_km(chords), idx
+
+    def within(self, lats, lons, radius_km):
+        """Stations within `radius_km` of every coordinate, as one (distances_km, indices) pair per coordinate, nearest first."""
+        queries = to_unit_vectors(np.atleast_1d(lats), np.atleast_1d(lons))
+        radius = float(km_to_chord(radius_km))
+        if self.tree is not None:
+            hits = self.tree.query_ball_point(queries, r=radius)
+        else:
+            hits = [np.flatnonzero(np.linalg.norm(self.points - q, axis=1) <= radius) for q in queries]
+        results = []
+        for q, idx in zip(queries, hits):
+            idx = np.asarray(idx, dtype=np.intp)
+            km = chord_to_km(np.linalg.norm(self.points[idx] - q, axis=1))
+            order = np.argsort(km)
+            results.append((km[order], idx[order]))
+        return results
+
+
+_default_index = None
+
+
+def default_index():
+    global _default_index
+    if _default_index is None:
+        _default_index = StationIndex.load()
+    return _default_index
@@ -0,0 +1,129 @@
+import argparse
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Local stand-in for ScraperAPI / the portals. Point a scraper at it with
+#   SCRAPERAPI_URL=http://127.0.0.1:8765/ SCRAPER_API_KEY=stub python home_co_uk.py
+# Pages are looked up by a slug of the target URL (the `url` query parameter
+# for ScraperAPI-style requests, otherwise the request path), falling back to
+# default.html. Pages carry an ETag and Last-Modified, and a matching
+# If-None-Match is answered with 304, as an origin with validators would.
+#
+# Faults can be injected to exercise retry and adaptive concurrency logic:
+#   --latency 0.05          seconds added to every response
+#   --fail-rate 0.1         fraction of requests answered with --fail-status
+#   --max-inflight 6        requests beyond this many at once get --fail-status
+#   --retry-after 1         Retry-After header sent with injected failures
+
+
+class Faults:
+    def __init__(self, latency=0.0, fail_rate=0.0, fail_status=429, max_inflight=None, retry_after=None, seed=None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.max_inflight = max_inflight
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.served = 0
+        self.failed = 0
+
+    def enter(self):
+        """Count the request in; returns True when it should get an injected failure."""
+        with self.lock:
+            self.in_flight += 1
+            self.served += 1
+            fail = (self.max_inflight is not None and self.in_flight > self.max_inflight) \
+                or self.random.random() < self.fail_rate
+            self.failed += fail
+            return fail
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+def page_slug(target):
+    return re.sub(r"[^A-Za-z0-9]+", "_", target).strip("_") + ".html"
+
+
+def make_handler(pages_dir, faults=None):
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if faults is None:
+                return self.respond()
+            try:
+                failing = faults.enter()
+                if faults.latency:
+                    time.sleep(faults.latency)
+                if failing:
+                    self.send_response(faults.fail_status)
+                    if faults.retry_after is not None:
+                        self.send_header("Retry-After", f"{faults.retry_after:g}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.respond()
+            finally:
+                faults.leave()
+
+        def respond(self):
+            parts = urlsplit(self.path)
+            target = parse_qs(parts.query).get("url", [parts.path])[0]
+            for name in (page_slug(target), "default.html"):
+                path = os.path.join(pages_dir, name)
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        body = f.read()
+                    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        return
+                    self.send_response(200)
+                    self.send_header("ETag", etag)
+                    self.send_header("Last-Modified", formatdate(os.path.getmtime(path), usegmt=True))
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+            self.send_error(404, f"No canned page for {target}")
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def serve(pages_dir, host="127.0.0.1", port=0, faults=None):
+    """Start the stub server on a background thread and return it (`server.server_port` holds the port)."""
+    server = ThreadingHTTPServer((host, port), make_handler(pages_dir, faults))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve canned HTML pages in place of ScraperAPI.")
+    parser.add_argument("pages_dir")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=429)
+    parser.add_argument("--max-inflight", type=int)
+    parser.add_argument("--retry-after", type=float)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    faults = Faults(args.latency, args.fail_rate, args.fail_status, args.max_inflight, args.retry_after, args.seed)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.pages_dir, faults))
+    print(f"🧪 Serving {args.pages_dir} on http://127.0.0.1:{args.port}/")
+    server.serve_forever()
@@ -0,0 +1,26 @@
+import pytest
+
+import stub_server
+
+
+@pytest.fixture
+def stub(tmp_path):
+    """start({slug: body}, faults=None) serves the pages with stub_server and returns its base URL.
+
+    The n-th server started in a test serves tmp_path/pages<n>, so a test can change its pages.
+    """
+    servers = []
+
+    def start(pages, faults=None):
+        pages_dir = tmp_path / f"pages{len(servers)}"
+        pages_dir.mkdir()
+        for name, body in pages.items():
+            (pages_dir / name).write_text(body, encoding="utf-8")
+        server = stub_server.serve(str(pages_dir), faults=faults)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}/"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
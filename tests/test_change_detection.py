@@ -0,0 +1,126 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import fetch_engine
+from adaptive_limit import CreditBudget
+from change_detection import PageState, Unchanged, fetch_changed, stats_fingerprint
+from fetch_engine import FetchEngine, HostLimits
+from metrics import Metrics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RENTAL = os.path.join(ROOT, "Home_co_uk_scripts", "home_co_uk_rental.py")
+RENTAL_FIXTURE = os.path.join(ROOT, "benchmarks", "fixtures", "home_co_uk_rental", "br1.html")
+TARGET = "https://www.home.co.uk/for_rent/br1/current_rents"
+
+
+def page(stats, extra="", inner="inner"):
+    return (f"<html><script>{extra}</script><div class='content'>"
+            f"<table class='stats'><tr><td>{stats}<table><tr><td>{inner}</td></tr></table> tail {stats}</td></tr></table>"
+            f"<table class='ad'><tr><td>{extra}</td></tr></table></div></html>")
+
+
+def test_fingerprint_ignores_markup_and_other_tables():
+    base = stats_fingerprint(page(1), "stats", "content")
+    assert base is not None
+    assert stats_fingerprint(page(1, extra="ad 2"), "stats", "content") == base
+    assert stats_fingerprint(page(1).replace("<td>", "<td  class='x'>"), "stats", "content") == base
+    assert stats_fingerprint(page(2), "stats", "content") != base
+
+
+def test_fingerprint_covers_text_after_a_nested_table():
+    html = page(1)
+    changed = html.replace("tail 1", "tail 9")
+    assert stats_fingerprint(changed, "stats", "content") != stats_fingerprint(html, "stats", "content")
+    assert stats_fingerprint(page(1, inner="other"), "stats", "content") != stats_fingerprint(html, "stats", "content")
+
+
+def test_fingerprint_finds_a_stats_table_nested_in_another():
+    html = "<table class='layout'><tr><td><table class='stats'><tr><td>5</td></tr></table></td></tr></table>"
+    assert stats_fingerprint(html, "stats") is not None
+    assert stats_fingerprint(html.replace("5", "6"), "stats") != stats_fingerprint(html, "stats")
+    assert stats_fingerprint("<table><tr><td>5</td></tr></table>", "stats") is None
+
+
+def test_commit_keeps_validators_a_page_did_not_send(tmp_path):
+    state = PageState(str(tmp_path / "jobs.sqlite"))
+    assert not state.unchanged("u", "f1", '"e1"', "Mon, 01 Jan 2024 00:00:00 GMT", "s")
+    state.commit("u")
+    # e.g. served from the response cache: new content, no validators
+    assert not state.unchanged("u", "f2", None, None, "s")
+    state.commit("u")
+    assert state.validators("u") == {"If-None-Match": '"e1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert state.unchanged("u", "f2")
+    state.close()
+
+
+def test_state_waits_for_commit(tmp_path):
+    state = PageState(str(tmp_path / "jobs.sqlite"))
+    assert not state.unchanged("u", "f1", '"e1"', None, "s")
+    assert not state.unchanged("u", "f1", '"e1"', None, "s")
+    state.commit("u")
+    assert state.unchanged("u", "f1")
+    state.close()
+
+
+def test_fetch_changed_against_the_stub(tmp_path, stub, monkeypatch):
+    pages_dir = tmp_path / "pages0"
+    url = stub({"default.html": page(1)})
+    monkeypatch.setattr(fetch_engine, "SCRAPERAPI_URL", url)
+    monkeypatch.setenv("SCRAPER_API_KEY", "stub")
+    state = PageState(str(tmp_path / "jobs.sqlite"))
+
+    async def fetch():
+        async with FetchEngine(HostLimits(rate=1000, burst=1000), metrics=Metrics(), credits=CreditBudget()) as engine:
+            return await fetch_changed(engine, TARGET, state, "stats", "content", source="test")
+
+    assert asyncio.run(fetch()) == page(1)
+    state.commit(TARGET)
+    assert "If-None-Match" in state.validators(TARGET)
+    # Same page: the stub answers the conditional request with 304
+    with pytest.raises(Unchanged):
+        asyncio.run(fetch())
+    # Only the script changed: new ETag, same stats
+    (pages_dir / "default.html").write_text(page(1, extra="tracking 2"), encoding="utf-8")
+    with pytest.raises(Unchanged):
+        asyncio.run(fetch())
+    (pages_dir / "default.html").write_text(page(2), encoding="utf-8")
+    assert asyncio.run(fetch()) == page(2)
+    state.close()
+
+
+def test_unchanged_rental_outcodes_stay_in_every_snapshot(tmp_path, stub):
+    with open(RENTAL_FIXTURE, encoding="utf-8") as f:
+        url = stub({"default.html": f.read()})
+    out = tmp_path / "out"
+    out.mkdir()
+    env = {
+        **os.environ,
+        "SCRAPERAPI_URL": url,
+        "SCRAPER_API_KEY": "stub",
+        "DEALSOURCR_JOBS_DB": str(tmp_path / "jobs.sqlite"),
+        "DEALSOURCR_HISTORY_DB": str(tmp_path / "history.sqlite"),
+        "DEALSOURCR_CACHE_DIR": str(tmp_path / "cache"),
+        "HOME_CO_UK_OUTPUT_DIR": str(out),
+        "HOME_CO_UK_PARSE_WORKERS": "0",
+    }
+
+    def run(timestamp, *outcodes):
+        done = subprocess.run([sys.executable, RENTAL, "--resume", timestamp, *outcodes], env=env, check=True,
+                              capture_output=True, text=True, timeout=120)
+        with open(out / f"home_co_uk_rental_{timestamp}.json", encoding="utf-8") as f:
+            return {record["postcode"]: record for record in json.load(f)}, done.stdout
+
+    first, _ = run("20250101_000000", "BR1", "BR2")
+    second, log = run("20250102_000000", "BR1", "BR2", "CF10")
+    assert "Unchanged: BR1" in log and "Unchanged: BR2" in log and "Unchanged: CF10" not in log
+    assert sorted(second) == ["BR1", "BR2", "CF10"]
+    assert second["BR1"] == first["BR1"]
+    # An older run resumed later has no earlier snapshot to carry over from, so it scrapes in full
+    older, log = run("20241231_000000", "BR1")
+    assert sorted(older) == ["BR1"]
+    assert "Unchanged" not in log
@@ -0,0 +1,183 @@
+import asyncio
+import contextlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from distributed import ROOT, Coordinator, RemoteQueue
+from job_queue import JobQueue, drain
+
+SOURCE = "home_co_uk_sale"
+FIXTURE = os.path.join(ROOT, "benchmarks", "fixtures", "home_co_uk_sale", "br1.html")
+
+
+class Recorder:
+    """Coordinator-side writer that keeps every result in memory and rejects records marked bad."""
+
+    def __init__(self):
+        self.written = []
+
+    def write(self, postcode, result):
+        if result.get("bad"):
+            raise ValueError(f"bad record for {postcode}")
+        self.written.append(postcode)
+
+
+@contextlib.contextmanager
+def coordinating(path, outcodes, writer, lease_seconds=60, max_attempts=5):
+    """Run a Coordinator on its own thread (it owns the SQLite connection); yields (url, counts)."""
+    ready = threading.Event()
+    stop = threading.Event()
+    state = {}
+
+    def serve():
+        queue = JobQueue(path, lease_seconds=lease_seconds, base_delay=0, max_attempts=max_attempts)
+        coordinator = Coordinator(SOURCE, writer, queue)
+        queue.enqueue(coordinator.queue_source, outcodes)
+        server = coordinator.server("127.0.0.1", 0)
+        server.timeout = 0.05
+        state["url"] = f"http://127.0.0.1:{server.server_port}/"
+        ready.set()
+        while not stop.is_set():
+            server.handle_request()
+        state["counts"] = queue.counts(coordinator.queue_source)
+        server.server_close()
+        queue.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    ready.wait()
+    counts = {}
+    try:
+        yield state["url"], counts
+    finally:
+        stop.set()
+        thread.join()
+        counts.update(state.get("counts", {}))
+
+
+def remote(url, worker):
+    return RemoteQueue(url, SOURCE, worker, poll=0.05)
+
+
+def test_stale_lease_is_refused(tmp_path):
+    writer = Recorder()
+    with coordinating(str(tmp_path / "jobs.sqlite"), ["BR1"], writer, lease_seconds=0.3) as (url, counts):
+        async def run():
+            stale, fresh = remote(url, "stale"), remote(url, "fresh")
+            assert await stale.claim(SOURCE) == ["BR1"]
+            await asyncio.sleep(0.5)
+            assert await fresh.claim(SOURCE) == ["BR1"]
+            stale.results["BR1"] = {"location": "BR1"}
+            with pytest.raises(RuntimeError, match="409"):
+                await stale.complete(SOURCE, "BR1")
+            with pytest.raises(RuntimeError, match="409"):
+                await stale.fail(SOURCE, "BR1", "late")
+            fresh.results["BR1"] = {"location": "BR1"}
+            assert await fresh.complete(SOURCE, "BR1")
+            stale.close()
+            fresh.close()
+
+        asyncio.run(run())
+    assert writer.written == ["BR1"]
+    assert counts == {"done": 1}
+
+
+def test_dead_worker_lease_is_reassigned(tmp_path):
+    writer = Recorder()
+    outcodes = ["BR1", "BR2", "CF10"]
+    with coordinating(str(tmp_path / "jobs.sqlite"), outcodes, writer, lease_seconds=0.3) as (url, counts):
+        async def run():
+            dead, live = remote(url, "dead"), remote(url, "live")
+            claimed = await dead.claim(SOURCE, limit=1)
+
+            async def handle(postcode):
+                live.results[postcode] = {"location": postcode}
+
+            await drain(live, SOURCE, handle, batch_size=2)
+            dead.close()
+            live.close()
+            return claimed
+
+        claimed = asyncio.run(run())
+    assert len(claimed) == 1
+    assert sorted(writer.written) == outcodes
+    assert counts == {"done": 3}
+
+
+def test_leases_are_renewed_while_a_batch_runs(tmp_path):
+    writer = Recorder()
+    stolen = []
+    with coordinating(str(tmp_path / "jobs.sqlite"), ["BR1", "BR2"], writer, lease_seconds=0.3) as (url, counts):
+        async def run():
+            slow, fast = remote(url, "slow"), remote(url, "fast")
+
+            async def slow_handle(postcode):
+                await asyncio.sleep(1.0)
+                slow.results[postcode] = {"location": postcode}
+
+            async def fast_handle(postcode):
+                stolen.append(postcode)
+                fast.results[postcode] = {"location": postcode}
+
+            async def fast_worker():
+                await asyncio.sleep(0.5)
+                await drain(fast, SOURCE, fast_handle)
+
+            await asyncio.gather(drain(slow, SOURCE, slow_handle), fast_worker())
+            slow.close()
+            fast.close()
+
+        asyncio.run(run())
+    assert stolen == []
+    assert sorted(writer.written) == ["BR1", "BR2"]
+    assert counts == {"done": 2}
+
+
+def test_rejected_result_fails_the_job(tmp_path):
+    writer = Recorder()
+    with coordinating(str(tmp_path / "jobs.sqlite"), ["BR1"], writer, max_attempts=2) as (url, counts):
+        async def run():
+            worker = remote(url, "worker")
+
+            async def handle(postcode):
+                worker.results[postcode] = {"location": postcode, "bad": True}
+
+            await drain(worker, SOURCE, handle)
+            worker.close()
+
+        asyncio.run(run())
+    assert writer.written == []
+    assert counts == {"failed": 1}
+
+
+def test_workers_scrape_every_outcode_once(tmp_path, stub):
+    with open(FIXTURE, encoding="utf-8") as f:
+        url = stub({"default.html": f.read()})
+    env = {
+        **os.environ,
+        "SCRAPERAPI_URL": url,
+        "SCRAPER_API_KEY": "stub",
+        "DEALSOURCR_JOBS_DB": str(tmp_path / "worker-jobs.sqlite"),
+        "DEALSOURCR_HISTORY_DB": str(tmp_path / "history.sqlite"),
+        "DEALSOURCR_CACHE_DIR": str(tmp_path / "cache"),
+        "HOME_CO_UK_PARSE_WORKERS": "0",
+    }
+    outcodes = [f"BR{i}" for i in range(1, 13)]
+    writer = Recorder()
+    with coordinating(str(tmp_path / "jobs.sqlite"), outcodes, writer) as (coordinator, counts):
+        workers = [
+            subprocess.Popen([sys.executable, os.path.join(ROOT, "distributed.py"), "worker", SOURCE,
+                              "--coordinator", coordinator, "--name", name, "--batch-size", "3"],
+                             env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            for name in ("w1", "w2")
+        ]
+        deadline = time.monotonic() + 120
+        for worker in workers:
+            assert worker.wait(max(1, deadline - time.monotonic())) == 0
+    assert sorted(writer.written) == sorted(outcodes)
+    assert counts == {"done": len(outcodes)}
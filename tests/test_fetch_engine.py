@@ -0,0 +1,92 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import pytest
+
+import fetch_engine
+from adaptive_limit import CreditBudget
+from fetch_engine import FetchEngine, FetchError, HostLimits
+from http_client import RetryPolicy
+from metrics import Metrics
+from stub_server import Faults
+
+PAGE = "<html><body><table class='t'><tr><td>1</td></tr></table></body></html>"
+
+
+def engine(attempts=3, max_concurrency=None, credits=None):
+    limits = HostLimits(concurrency=4, rate=1000, burst=1000, max_concurrency=max_concurrency)
+    retry = RetryPolicy(attempts, backoff=0.01, max_backoff=0.05, jitter=0.0)
+    return FetchEngine(limits=limits, retry=retry, metrics=Metrics(), credits=credits or CreditBudget())
+
+
+async def fetch_all(engine, url, n):
+    async with engine:
+        return await asyncio.gather(*(engine.get(url) for _ in range(n)))
+
+
+def test_retries_until_success(stub):
+    faults = Faults(fail_rate=0.5, fail_status=503, seed=7)
+    url = stub({"default.html": PAGE}, faults)
+    bodies = asyncio.run(fetch_all(engine(attempts=20), url, 10))
+    assert bodies == [PAGE] * 10
+    assert faults.failed > 0
+    assert faults.served == 10 + faults.failed
+
+
+def test_gives_up_after_attempts(stub):
+    faults = Faults(fail_rate=1.0, fail_status=502)
+    url = stub({"default.html": PAGE}, faults)
+    with pytest.raises(FetchError):
+        asyncio.run(fetch_all(engine(attempts=3), url, 1))
+    assert faults.served == 3
+
+
+def test_client_errors_are_not_retried(stub):
+    faults = Faults(fail_rate=1.0, fail_status=404)
+    url = stub({"default.html": PAGE}, faults)
+    with pytest.raises(FetchError):
+        asyncio.run(fetch_all(engine(attempts=3), url, 1))
+    assert faults.served == 1
+
+
+def test_retry_after_is_honoured(stub):
+    faults = Faults(fail_rate=1.0, fail_status=429, retry_after=0.4)
+    url = stub({"default.html": PAGE}, faults)
+    start = time.monotonic()
+    with pytest.raises(FetchError):
+        asyncio.run(fetch_all(engine(attempts=2), url, 1))
+    assert faults.served == 2
+    assert time.monotonic() - start >= 0.4
+
+
+def test_throttling_cuts_the_adaptive_limit(stub):
+    url = stub({"default.html": PAGE}, Faults(fail_rate=1.0, fail_status=429))
+    e = engine(attempts=1, max_concurrency=16)
+    with pytest.raises(FetchError):
+        asyncio.run(fetch_all(e, url, 1))
+    assert e.limits.adaptive(urlsplit(url).netloc).limit == 2
+
+
+def test_healthy_responses_grow_the_adaptive_limit(stub):
+    url = stub({"default.html": PAGE})
+    e = engine(max_concurrency=16)
+    asyncio.run(fetch_all(e, url, 40))
+    assert e.limits.adaptive(urlsplit(url).netloc).limit > 4
+
+
+def test_credit_budget_stops_requests(stub, monkeypatch):
+    faults = Faults()
+    url = stub({"default.html": PAGE}, faults)
+    monkeypatch.setattr(fetch_engine, "SCRAPERAPI_URL", url)
+    monkeypatch.setenv("SCRAPER_API_KEY", "stub")
+    e = engine(credits=CreditBudget(1))
+
+    async def run():
+        async with e:
+            assert await e.get_scraperapi("https://example.com/a") == PAGE
+            with pytest.raises(FetchError):
+                await e.get_scraperapi("https://example.com/b")
+
+    asyncio.run(run())
+    assert faults.served == 1
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from job_queue import JobQueue, drain
+
+
+def queues(tmp_path, lease_seconds=0.2):
+    path = str(tmp_path / "jobs.sqlite")
+    return (JobQueue(path, lease_seconds=lease_seconds, base_delay=0, worker="a"),
+            JobQueue(path, lease_seconds=lease_seconds, base_delay=0, worker="b"))
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    a, b = queues(tmp_path)
+    a.enqueue("s", ["BR1"])
+    assert a.claim("s") == ["BR1"]
+    assert b.claim("s") == []
+    time.sleep(0.3)
+    assert b.claim("s") == ["BR1"]
+    assert b.holds("s", "BR1", "b")
+    assert not b.holds("s", "BR1", "a")
+
+
+def test_only_the_lease_holder_finishes_a_job(tmp_path):
+    a, b = queues(tmp_path)
+    a.enqueue("s", ["BR1"])
+    a.claim("s")
+    time.sleep(0.3)
+    b.claim("s")
+    assert a.complete("s", "BR1") is False
+    assert a.fail("s", "BR1", "late") is None
+    assert a.renew("s", ["BR1"]) == 0
+    assert b.renew("s", ["BR1"]) == 1
+    assert b.complete("s", "BR1") is True
+    assert a.counts("s") == {"done": 1}
+
+
+def test_fail_backs_off_then_gives_up(tmp_path):
+    a, _ = queues(tmp_path)
+    a.max_attempts = 2
+    a.enqueue("s", ["BR1"])
+    a.claim("s")
+    assert a.fail("s", "BR1", "boom") == "pending"
+    a.claim("s")
+    assert a.fail("s", "BR1", "boom") == "failed"
+    assert a.postcodes("s", "failed") == ["BR1"]
+
+
+def test_drain_renews_leases_of_a_slow_batch(tmp_path):
+    a, b = queues(tmp_path)
+    a.enqueue("s", ["BR1", "BR2"])
+    stolen = []
+
+    async def slow(postcode):
+        await asyncio.sleep(0.5)
+        stolen.extend(b.claim("s"))
+
+    asyncio.run(drain(a, "s", slow))
+    assert stolen == []
+    assert a.counts("s") == {"done": 2}
@@ -0,0 +1,100 @@
+import itertools
+
+import pytest
+
+from labels import (
+    BEDROOM_LABELS, BEDROOM_WORDS, PROPERTY_TYPES,
+    amount, band_label, bedrooms, days, price_band, property_type, rent_band,
+)
+
+PRICES = [1, 50, 500, 750, 999, 1000, 12500, 250000, 1000000, 12345678]
+BANDS = [(low, high) for low, high in itertools.product(PRICES, PRICES) if low < high]
+
+
+def grouped(n):
+    return f"{n:,}"
+
+
+@pytest.mark.parametrize("low,high", BANDS)
+def test_band_label_round_trips(low, high):
+    assert price_band(band_label(low, high)) == (low, high)
+
+
+@pytest.mark.parametrize("price", PRICES)
+def test_open_band_label_round_trips(price):
+    assert price_band(band_label(0, price)) == (0, price)
+    assert price_band(band_label(price, None)) == (price, None)
+
+
+@pytest.mark.parametrize("low,high", BANDS)
+def test_site_band_labels_parse(low, high):
+    assert price_band(f"£{grouped(low)} - £{grouped(high)}") == (low, high)
+    assert price_band(f"Under £{grouped(high)}") == (0, high)
+    assert price_band(f"Over £{grouped(low)}") == (low, None)
+
+
+@pytest.mark.parametrize("low,high", BANDS)
+def test_rent_band_is_canonical_and_idempotent(low, high):
+    label, min_rent, max_rent = rent_band(f"£{grouped(low)} - £{grouped(high)} pcm")
+    assert (min_rent, max_rent) == (low, high)
+    assert label == band_label(low, high)
+    assert rent_band(label) == (label, low, high)
+
+
+@pytest.mark.parametrize("text", ["POA", "Other", "Under", "£500 pcm"])
+def test_rent_band_keeps_unusable_labels(text):
+    assert rent_band(text) == (text.replace("pcm", "").strip(), None, None)
+
+
+@pytest.mark.parametrize("count,label", sorted(BEDROOM_LABELS.items()))
+def test_bedroom_labels_round_trip(count, label):
+    assert bedrooms(label) == count
+    assert bedrooms(label.upper()) == count
+    assert bedrooms(f"  {label.lower()}  ") == count
+
+
+@pytest.mark.parametrize("count", range(0, 40))
+def test_bedroom_digits(count):
+    assert bedrooms(f"{count} bedrooms") == count
+    assert bedrooms(f"{count}+ beds") == count
+
+
+@pytest.mark.parametrize("word", sorted(BEDROOM_WORDS))
+def test_bedroom_words(word):
+    assert bedrooms(f"{word.capitalize()} bed flat") == BEDROOM_WORDS[word]
+
+
+@pytest.mark.parametrize("text", ["", "Bedrooms", "Someone", "Flat"])
+def test_unrecognised_bedrooms(text):
+    assert bedrooms(text) is None
+
+
+@pytest.mark.parametrize("key,canonical", sorted(PROPERTY_TYPES.items()))
+def test_property_type_variants(key, canonical):
+    assert property_type(key) == canonical
+    assert property_type(key.title()) == canonical
+    assert property_type(" " + key.replace(" ", "   ") + "\n") == canonical
+    assert property_type(canonical) == canonical
+
+
+@pytest.mark.parametrize("text", ["Houseboat", "Park home", "  Castle  "])
+def test_unknown_property_type_is_tidied(text):
+    assert property_type(text) == text.strip()
+    assert property_type(property_type(text)) == property_type(text)
+
+
+@pytest.mark.parametrize("value", PRICES)
+def test_amount_round_trips(value):
+    assert amount(f"£{grouped(value)}") == value
+    assert amount(f"£{grouped(value)} pcm") == value
+    assert amount(str(value)) == value
+
+
+@pytest.mark.parametrize("value", [0, 1, 7, 59, 120, 1000])
+def test_days(value):
+    assert days(f"{value} days") == value
+    assert days(f"{value} day") == value
+
+
+def test_days_without_number():
+    assert days("n/a") is None
@@ -1,22 +1,13 @@
-import json
+from outcode_registry import REFERENCE_FILE, REGISTRY_FILE, OutcodeRegistry
+from portal_urls import urls, write_urls
 
-INPUT_FILE = 'uk_postcode_england_wales.json'
+INPUT_FILE = REFERENCE_FILE
 OUTPUT_FILE = 'zoopla_urls.txt'
 
 def generate_urls(input_file, output_file):
-    with open(input_file, 'r') as f:
-        data = json.load(f)
-
-    urls = [
-        f"https://www.zoopla.co.uk/for-sale/property/{entry['postcode']}/?q={entry['postcode']}&search_source=home"
-        for entry in data
-    ]
-
-    with open(output_file, 'w') as f:
-        for url in urls:
-            f.write(url + '\n')
-
-    print(f"✅ {len(urls)} URLs written to {output_file}")
+    registry = OutcodeRegistry.open(REGISTRY_FILE, input_file)
+    count = write_urls(output_file, urls("zoopla_sale", registry=registry))
+    print(f"✅ {count} URLs written to {output_file}")
 
 if __name__ == '__main__':
     generate_urls(INPUT_FILE, OUTPUT_FILE)